@@ -231,6 +231,9 @@ notifications_db_config = {
 }
 
 USE_DASHBOARD_DB = is_boolean_or_string_true(os.environ.get("USE_DASHBOARD_DB", False))
+# The status history of the tests reads the tests.series index of the dashboard db.
+# Enable it once backfill_test_series has filled in the series of the existing tests
+USE_TEST_SERIES = is_boolean_or_string_true(os.environ.get("USE_TEST_SERIES", False))
 if USE_DASHBOARD_DB:
     DATABASES = {
         "default": dashboard_db_config,
@@ -314,6 +317,28 @@ CORS_ALLOW_ALL_ORIGINS = is_boolean_or_string_true(
 )
 
 CACHE_TIMEOUT = int(get_json_env_var("CACHE_TIMEOUT", "180"))
+# Entries older than CACHE_TIMEOUT are served stale while one worker recomputes
+# them, until CACHE_HARD_TIMEOUT
+CACHE_HARD_TIMEOUT = int(get_json_env_var("CACHE_HARD_TIMEOUT", "3600"))
+# The time windows of the hardware pages are widened to whole buckets of this
+# many seconds, so that nearby requests share cache entries. 0 disables it.
+HARDWARE_TIME_BUCKET_SECONDS = int(
+    get_json_env_var("HARDWARE_TIME_BUCKET_SECONDS", "900")
+)
+# Cached values are compressed from this many bytes, and not cached at all when
+# larger than CACHE_MAX_VALUE_SIZE bytes once compressed
+CACHE_COMPRESS_MIN_SIZE = int(get_json_env_var("CACHE_COMPRESS_MIN_SIZE", "16384"))
+CACHE_MAX_VALUE_SIZE = int(
+    get_json_env_var("CACHE_MAX_VALUE_SIZE", str(64 * 1024 * 1024))
+)
+# Each worker keeps up to LOCAL_CACHE_MAX_SIZE bytes of cached values in memory,
+# for LOCAL_CACHE_TIMEOUT seconds at most. Either set to 0 disables it.
+LOCAL_CACHE_MAX_SIZE = int(
+    get_json_env_var("LOCAL_CACHE_MAX_SIZE", str(32 * 1024 * 1024))
+)
+LOCAL_CACHE_TIMEOUT = int(get_json_env_var("LOCAL_CACHE_TIMEOUT", "10"))
+# Changing it invalidates every query cache entry
+CACHE_KEY_VERSION = str(get_json_env_var("CACHE_KEY_VERSION", "1"))
 
 if DEBUG:
     CORS_ALLOWED_ORIGIN_REGEXES = [
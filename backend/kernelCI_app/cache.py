@@ -1,22 +1,568 @@
-from typing import Optional
+from datetime import date, datetime
+from enum import Enum
+import functools
+import gzip
+import hashlib
+import json
+import threading
+import logging
+import os
+import pickle
+import time
+import re
+import uuid
+import zlib
+from typing import Any, Callable, Iterable, Literal, NamedTuple, Optional, TypedDict
 from django.core.cache import cache
 from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.http.response import HttpResponseBase
+from django.utils.cache import (
+    get_conditional_response,
+    patch_response_headers,
+    patch_vary_headers,
+)
+from pydantic import BaseModel
+import redis
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+from kernelCI_app.helpers.cacheValues import (
+    decode_cache_value,
+    encode_cache_value,
+    split_payload,
+)
+from kernelCI_app.helpers.localCache import LocalCache
+
+logger = logging.getLogger(__name__)
 
 timeout = settings.CACHE_TIMEOUT
 DISCORD_NOTIFICATION_COOLDOWN = 600
 
 DISCORD_NOTIFICATION_KEY = "discord_notification"
 
-_commit_lookup = {}
-_build_lookup = {}
-_test_lookup = {}
+# Bump when the shape of cached values changes, so that a deploy doesn't read
+# entries written by the previous version. CACHE_KEY_VERSION does the same
+# without a code change.
+CACHE_SCHEMA_VERSION = 8
+CACHE_KEY_PREFIX = f"v{CACHE_SCHEMA_VERSION}.{settings.CACHE_KEY_VERSION}"
+
+CACHE_STATS_KEY = "cache_stats"
+CACHE_STATS_FLUSH_INTERVAL = 10  # seconds
+
+# Channel where the tags of invalidated entries are published, for the
+# processes that keep cached data of their own
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+REDIS_SOCKET_TIMEOUT = 5  # seconds
+
+# Single-flight recomputation of expired entries
+RECOMPUTE_LOCK_TIMEOUT = 120  # seconds, longer than the slowest query
+# Seconds waiting for another worker before computing. Each waiting request holds
+# a sync gunicorn worker, so a slow query must not tie up all of them
+RECOMPUTE_WAIT_TIMEOUT = 3
+RECOMPUTE_POLL_INTERVAL = 0.1  # seconds
+
+# Values larger than this are split in several keys, so that reading or writing
+# one doesn't block redis for long
+CACHE_CHUNK_SIZE = 1024 * 1024
+
+LOCAL_CACHE_RECONNECT_INTERVAL = 5  # seconds
+
+# Cached responses at least this large are stored gzipped as well
+RESPONSE_COMPRESS_MIN_SIZE = 1024
+# Compressed once per miss and served on every hit
+RESPONSE_GZIP_LEVEL = 6
+
+type CacheResult = Literal["hit", "miss"]
+type CacheStat = Literal[
+    "hit", "local_hit", "miss", "stored", "stored_bytes", "raw_bytes", "too_large"
+]
+CACHE_STATS: tuple[CacheStat, ...] = (
+    "hit",
+    "local_hit",
+    "miss",
+    "stored",
+    "stored_bytes",
+    "raw_bytes",
+    "too_large",
+)
+type TagValues = Optional[str | Iterable[str]]
+
+# Counted locally and added to the shared counters in the cache periodically
+_cache_stats: dict[tuple[str, CacheStat], int] = {}
+_cache_stats_lock = threading.Lock()
+_cache_stats_last_flush = time.monotonic()
+
+_redis_client: Optional[redis.Redis] = None
+
+# In-process tier in front of the cache, created by each worker on first use
+_local_cache: Optional[LocalCache] = None
+_local_cache_pid: Optional[int] = None
+_local_cache_lock = threading.Lock()
+
+
+def _canonical_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=_canonical_json)
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(
+        value, sort_keys=True, separators=(",", ":"), default=_canonical_default
+    )
+
+
+def _create_cache_params_hash(params: dict) -> str:
+    """
+    Digest of a canonical serialization of the params, which is the same in
+    every process (unlike the builtin `hash`), so that all workers share entries.
+    """
+    return hashlib.sha256(_canonical_json(params).encode("utf-8")).hexdigest()
+
+
+def get_cache_key(key: str, params: Optional[dict] = None) -> str:
+    if params is None:
+        return f"{CACHE_KEY_PREFIX}:{key}"
+    return f"{CACHE_KEY_PREFIX}:{key}:{_create_cache_params_hash(params)}"
+
+
+def _record_cache_lookup(family: str, value: Any) -> None:
+    result: CacheResult = "miss" if value is None else "hit"
+    _record_cache_stats(family, {result: 1})
+
+
+def _record_cache_stats(family: str, counts: dict[CacheStat, int]) -> None:
+    global _cache_stats_last_flush
+
+    with _cache_stats_lock:
+        for stat, count in counts.items():
+            _cache_stats[(family, stat)] = _cache_stats.get((family, stat), 0) + count
+        if time.monotonic() - _cache_stats_last_flush < CACHE_STATS_FLUSH_INTERVAL:
+            return
+        _cache_stats_last_flush = time.monotonic()
+        pending = dict(_cache_stats)
+        _cache_stats.clear()
+
+    _flush_cache_stats(pending)
+
+
+def _flush_cache_stats(pending: dict[tuple[str, CacheStat], int]) -> None:
+    try:
+        for (family, stat), count in pending.items():
+            stats_key = f"{CACHE_STATS_KEY}:{family}:{stat}"
+            cache.add(stats_key, 0, timeout=None)
+            cache.incr(stats_key, count)
+
+        families_key = f"{CACHE_STATS_KEY}:families"
+        families = set(cache.get(families_key) or [])
+        new_families = {family for family, _ in pending} - families
+        if new_families:
+            cache.set(families_key, sorted(families | new_families), timeout=None)
+    except Exception:
+        # The stats are best effort, they must never break a request
+        return
+
+
+def get_cache_stats() -> dict[str, dict[CacheStat, int]]:
+    """
+    Hits, misses and stored sizes of each key family, added up across all
+    processes. `local_hit` counts the hits served by the in-process tier, which
+    are included in `hit`. `raw_bytes` is the size of the stored values before
+    compression.
+    """
+    families = cache.get(f"{CACHE_STATS_KEY}:families") or []
+    stats_keys = [
+        f"{CACHE_STATS_KEY}:{family}:{stat}"
+        for family in families
+        for stat in CACHE_STATS
+    ]
+    counts = cache.get_many(stats_keys)
+    return {
+        family: {
+            stat: counts.get(f"{CACHE_STATS_KEY}:{family}:{stat}", 0)
+            for stat in CACHE_STATS
+        }
+        for family in families
+    }
+
+
+def get_redis_client() -> redis.Redis:
+    """Client of the cache's Redis, for the commands that django's cache api lacks."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.CACHES["default"]["LOCATION"],
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+    return _redis_client
+
+
+def _listen_for_invalidations(local_cache: LocalCache) -> None:
+    """Evicts the local entries with the tags published by invalidate_cache_tags."""
+    while True:
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            # The invalidations published while unsubscribed were missed
+            local_cache.clear()
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    local_cache.invalidate_tags(json.loads(message["data"]))
+        except (redis.RedisError, ValueError) as e:
+            logger.warning("Error listening for cache invalidations: %s", e)
+            local_cache.clear()
+            time.sleep(LOCAL_CACHE_RECONNECT_INTERVAL)
+
+
+def _get_local_cache() -> Optional[LocalCache]:
+    """The in-process tier, or None if LOCAL_CACHE_MAX_SIZE or LOCAL_CACHE_TIMEOUT is 0."""
+    global _local_cache, _local_cache_pid
+    if settings.LOCAL_CACHE_MAX_SIZE <= 0 or settings.LOCAL_CACHE_TIMEOUT <= 0:
+        return None
+
+    with _local_cache_lock:
+        # A forked process doesn't inherit the listener thread
+        if _local_cache is None or _local_cache_pid != os.getpid():
+            _local_cache = LocalCache(
+                max_size=settings.LOCAL_CACHE_MAX_SIZE,
+                timeout=settings.LOCAL_CACHE_TIMEOUT,
+            )
+            _local_cache_pid = os.getpid()
+            threading.Thread(
+                target=_listen_for_invalidations,
+                args=(_local_cache,),
+                name="cache-invalidation-listener",
+                daemon=True,
+            ).start()
+        return _local_cache
+
+
+def make_cache_tags(
+    *,
+    commit_hash: TagValues = None,
+    checkout_id: TagValues = None,
+    build_id: TagValues = None,
+    test_id: TagValues = None,
+    hardware_id: TagValues = None,
+    issue_id: TagValues = None,
+) -> set[str]:
+    """Tags such as `commit:<hash>` that an entry depends on, from one or many values."""
+    tags = set()
+    for kind, values in (
+        ("commit", commit_hash),
+        ("checkout", checkout_id),
+        ("build", build_id),
+        ("test", test_id),
+        ("hardware", hardware_id),
+        ("issue", issue_id),
+    ):
+        if values is None:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        tags.update(f"{kind}:{value}" for value in values if value)
+    return tags
+
+
+def _get_tag_key(tag: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:tag:{tag}"
+
+
+def _get_tag_versions(tags: set[str], timeout: Optional[int]) -> dict[str, str]:
+    """
+    Current version of each tag, which invalidate_cache_tags replaces. A tag
+    without one gets a new version that lives at least `timeout` (default:
+    CACHE_HARD_TIMEOUT), as long as the entries computed from it; if it
+    expires anyway, those entries only become stale.
+    """
+    if not tags:
+        return {}
+    if timeout is None:
+        timeout = settings.CACHE_HARD_TIMEOUT
+
+    tags = sorted(tags)
+    pipeline = get_redis_client().pipeline(transaction=False)
+    for tag in tags:
+        tag_key = _get_tag_key(tag)
+        pipeline.set(tag_key, uuid.uuid4().hex, nx=True, ex=timeout)
+        # GT only ever extends the ttl
+        pipeline.expire(tag_key, timeout, gt=True)
+        pipeline.get(tag_key)
+    versions = pipeline.execute()[2::3]
+    return {tag: version.decode("utf-8") for tag, version in zip(tags, versions)}
+
+
+def _try_get_tag_versions(
+    key: str, tags: set[str], timeout: Optional[int]
+) -> Optional[dict[str, str]]:
+    """Tag versions to store an entry with, None if it can't be cached."""
+    try:
+        return _get_tag_versions(tags, timeout)
+    except redis.RedisError as e:
+        # An entry without its tag versions would outlive the data it was computed from
+        logger.warning(
+            "Error getting the tags of cache key %s, not caching it: %s", key, e
+        )
+        return None
+
+
+class CacheEntry(TypedDict):
+    payload: Optional[bytes]
+    """The encoded value, None if it is split in chunks"""
+    chunks: int
+    """Number of chunk keys holding the encoded value, 0 if it is in the payload"""
+    chunk_id: Optional[str]
+    """Random id of the write in the names of its chunk keys, so that an entry never
+    reads the chunks of a concurrent write of the same key. None without chunks"""
+    fresh_until: Optional[float]
+    """Unix time after which the value is stale and gets recomputed, None for never"""
+    tags: dict[str, str]
+    """Version of each tag of the entry when it was computed. The entry is stale once
+    one of them is invalidated, and is evicted from the in-process tier by them"""
+
+
+# Returned by _read_value when the entry, or one of its chunks, is gone
+_MISSING = object()
+
+
+def _get_hard_timeout(
+    timeout: Optional[int], hard_timeout: Optional[int]
+) -> Optional[int]:
+    if timeout is None:
+        return None
+    if hard_timeout is None:
+        hard_timeout = settings.CACHE_HARD_TIMEOUT
+    return max(timeout, hard_timeout)
+
+
+def _is_fresh(entry: CacheEntry) -> bool:
+    return entry["fresh_until"] is None or entry["fresh_until"] > time.time()
+
+
+def _set_local_entry(local_cache: LocalCache, hash_key: str, entry: CacheEntry) -> None:
+    # Chunked entries are too large to be worth keeping in every process
+    if entry["chunks"] or not _is_fresh(entry):
+        return
+    local_cache.set(
+        hash_key,
+        entry,
+        size=len(entry["payload"]),
+        tags=list(entry["tags"]),
+        timeout=(
+            None if entry["fresh_until"] is None else entry["fresh_until"] - time.time()
+        ),
+    )
 
 
-def _create_cache_params_hash(params: dict):
-    params_list = list(params.items())
-    params_list.sort(key=lambda x: x[0])
-    params_string = ",".join([str(i[1]) for i in params_list])
-    return hash(params_string)
+def _mark_invalidated(entries: dict[str, CacheEntry]) -> dict[str, CacheEntry]:
+    """
+    Makes stale the fresh entries with a tag invalidated since they were computed,
+    so that they are still served while they are recomputed.
+    """
+    tags = sorted(
+        {tag for entry in entries.values() if _is_fresh(entry) for tag in entry["tags"]}
+    )
+    if not tags:
+        return entries
+
+    versions = get_redis_client().mget([_get_tag_key(tag) for tag in tags])
+    current_versions = {
+        tag: version.decode("utf-8")
+        for tag, version in zip(tags, versions)
+        if version is not None
+    }
+    return {
+        hash_key: (
+            {**entry, "fresh_until": 0}
+            if any(
+                current_versions.get(tag) != version
+                for tag, version in entry["tags"].items()
+            )
+            else entry
+        )
+        for hash_key, entry in entries.items()
+    }
+
+
+def _get_entries(key: str, hash_keys: list[str]) -> dict[str, CacheEntry]:
+    """
+    Gets the entries from the in-process tier first, then the others from the
+    cache in a single round trip, keeping them in the in-process tier. The tags
+    of the ones from the cache are checked in a second round trip.
+    """
+    local_cache = _get_local_cache()
+    if local_cache is None:
+        return _mark_invalidated(cache.get_many(hash_keys))
+
+    entries: dict[str, CacheEntry] = {}
+    for hash_key in hash_keys:
+        entry = local_cache.get(hash_key)
+        if entry is not None:
+            entries[hash_key] = entry
+    if entries:
+        _record_cache_stats(key, {"local_hit": len(entries)})
+
+    missing = [hash_key for hash_key in hash_keys if hash_key not in entries]
+    if missing:
+        remote_entries = _mark_invalidated(cache.get_many(missing))
+        for hash_key, entry in remote_entries.items():
+            _set_local_entry(local_cache, hash_key, entry)
+        entries.update(remote_entries)
+    return entries
+
+
+def _get_chunk_keys(hash_key: str, chunk_id: str, chunks: int) -> list[str]:
+    return [f"{hash_key}:chunk:{chunk_id}:{index}" for index in range(chunks)]
+
+
+def _read_value(hash_key: str, entry: Optional[CacheEntry]) -> Any:
+    """
+    Decoded value of the entry, or _MISSING if it or one of its chunks is gone,
+    or if it can't be decoded.
+    """
+    if entry is None:
+        return _MISSING
+    if not entry["chunks"]:
+        payload = entry["payload"]
+    else:
+        chunk_keys = _get_chunk_keys(hash_key, entry["chunk_id"], entry["chunks"])
+        chunks = cache.get_many(chunk_keys)
+        if len(chunks) != len(chunk_keys):
+            return _MISSING
+        payload = b"".join(chunks[chunk_key] for chunk_key in chunk_keys)
+
+    try:
+        return decode_cache_value(payload)
+    except (zlib.error, pickle.UnpicklingError, ValueError, EOFError) as e:
+        # Recomputed and overwritten like a missing entry
+        logger.warning("Error decoding cache key %s: %s", hash_key, e)
+        return _MISSING
+
+
+def _encode_entries(
+    key: str,
+    values: dict[str, tuple[Any, set[str]]],
+    fresh_until: Optional[float],
+    tag_versions: dict[str, str],
+) -> dict[str, dict[str, CacheEntry | bytes]]:
+    """
+    Encodes each value into its entry and chunks, by hash key. Values larger than
+    CACHE_MAX_VALUE_SIZE once encoded are left out.
+    """
+    encoded_entries = {}
+    stats: dict[CacheStat, int] = {}
+    for hash_key, (value, tags) in values.items():
+        payload, raw_size = encode_cache_value(value, settings.CACHE_COMPRESS_MIN_SIZE)
+        if len(payload) > settings.CACHE_MAX_VALUE_SIZE:
+            logger.warning(
+                "Not caching a %s value of %d bytes, larger than CACHE_MAX_VALUE_SIZE",
+                key,
+                len(payload),
+            )
+            stats["too_large"] = stats.get("too_large", 0) + 1
+            continue
+
+        stats["stored"] = stats.get("stored", 0) + 1
+        stats["stored_bytes"] = stats.get("stored_bytes", 0) + len(payload)
+        stats["raw_bytes"] = stats.get("raw_bytes", 0) + raw_size
+
+        entry_tags = {tag: tag_versions[tag] for tag in sorted(tags)}
+        chunks = split_payload(payload, CACHE_CHUNK_SIZE)
+        if len(chunks) <= 1:
+            entry: CacheEntry = {
+                "payload": payload,
+                "chunks": 0,
+                "chunk_id": None,
+                "fresh_until": fresh_until,
+                "tags": entry_tags,
+            }
+            encoded_entries[hash_key] = {hash_key: entry}
+            continue
+
+        # The chunks of the previous writes expire with their hard timeout
+        entry = {
+            "payload": None,
+            "chunks": len(chunks),
+            "chunk_id": uuid.uuid4().hex,
+            "fresh_until": fresh_until,
+            "tags": entry_tags,
+        }
+        chunk_keys = _get_chunk_keys(hash_key, entry["chunk_id"], len(chunks))
+        encoded_entries[hash_key] = {hash_key: entry, **dict(zip(chunk_keys, chunks))}
+
+    _record_cache_stats(key, stats)
+    return encoded_entries
+
+
+def _store_entries(
+    *,
+    key: str,
+    values: dict[str, tuple[Any, set[str]]],
+    timeout: Optional[int],
+    hard_timeout: Optional[int],
+    tag_versions: Optional[dict[str, str]] = None,
+) -> None:
+    """
+    Stores the values, given with their tags by hash key, in a single round trip.
+    `tag_versions` are the versions of the tags read before computing the values,
+    they are read now if not given.
+    """
+    if timeout is not None and timeout <= 0:
+        return
+
+    # The entries are kept stale after `timeout` until `hard_timeout`
+    hard_timeout = _get_hard_timeout(timeout, hard_timeout)
+    if tag_versions is None:
+        tag_versions = _try_get_tag_versions(
+            key, {tag for _, tags in values.values() for tag in tags}, hard_timeout
+        )
+        if tag_versions is None:
+            return
+
+    fresh_until = None if timeout is None else time.time() + timeout
+    encoded_entries = _encode_entries(key, values, fresh_until, tag_versions)
+
+    cache.set_many(
+        {
+            stored_key: stored_value
+            for stored_values in encoded_entries.values()
+            for stored_key, stored_value in stored_values.items()
+        },
+        hard_timeout,
+    )
+
+    local_cache = _get_local_cache()
+    if local_cache is not None:
+        for hash_key, stored_values in encoded_entries.items():
+            _set_local_entry(local_cache, hash_key, stored_values[hash_key])
+
+
+def _store_entry(
+    *,
+    key: str,
+    hash_key: str,
+    value: Any,
+    tags: set[str],
+    timeout: Optional[int],
+    hard_timeout: Optional[int],
+    tag_versions: Optional[dict[str, str]] = None,
+) -> None:
+    _store_entries(
+        key=key,
+        values={hash_key: (value, tags)},
+        timeout=timeout,
+        hard_timeout=hard_timeout,
+        tag_versions=tag_versions,
+    )
 
 
 def set_query_cache(
@@ -24,46 +570,486 @@ def set_query_cache(
     key,
     params=None,
     rows,
-    commit_hash=None,
-    build_id=None,
-    test_id=None,
+    commit_hash: TagValues = None,
+    checkout_id: TagValues = None,
+    build_id: TagValues = None,
+    test_id: TagValues = None,
+    hardware_id: TagValues = None,
     timeout=timeout,
+    hard_timeout: Optional[int] = None,
 ):
-    if params is not None:
-        params_hash = _create_cache_params_hash(params)
-        hash_key = "%s-%s" % (key, params_hash)
-    else:
-        hash_key = "%s" % key
+    """
+    Caches the rows, tagged by the ids they depend on so that
+    `invalidate_cache_tags` makes them stale when those are ingested again.
+    """
+    _store_entry(
+        key=key,
+        hash_key=get_cache_key(key, params),
+        value=rows,
+        tags=make_cache_tags(
+            commit_hash=commit_hash,
+            checkout_id=checkout_id,
+            build_id=build_id,
+            test_id=test_id,
+            hardware_id=hardware_id,
+        ),
+        timeout=timeout,
+        hard_timeout=hard_timeout,
+    )
+
+
+def _get_lock_name(hash_key: str) -> str:
+    return f"{hash_key}:lock"
+
+
+def _acquire_recompute_lock(hash_key: str) -> Optional[Lock]:
+    lock = get_redis_client().lock(
+        _get_lock_name(hash_key), timeout=RECOMPUTE_LOCK_TIMEOUT
+    )
+    return lock if lock.acquire(blocking=False) else None
+
+
+def _release_recompute_lock(lock: Optional[Lock]) -> None:
+    if lock is None:
+        return
+    try:
+        lock.release()
+    except LockError:
+        # The computation outlived the lock, someone else may hold it now
+        return
+
+
+def _wait_for_recompute(hash_key: str) -> Optional[CacheEntry]:
+    """
+    Waits for the worker holding the lock to store the entry, for a few seconds
+    at most, after which the caller computes it too.
+    """
+    client = get_redis_client()
+    deadline = time.monotonic() + RECOMPUTE_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(RECOMPUTE_POLL_INTERVAL)
+        entry = cache.get(hash_key)
+        if entry is not None:
+            return entry
+        if not client.exists(_get_lock_name(hash_key)):
+            # Released without storing an entry, unless it did so just now
+            return cache.get(hash_key)
+    return None
+
 
-    _add_to_lookup(hash_key, commit_hash, _commit_lookup)
-    _add_to_lookup(hash_key, build_id, _build_lookup)
-    _add_to_lookup(hash_key, test_id, _test_lookup)
+def get_or_set_query_cache[
+    T
+](
+    *,
+    key: str,
+    params: Optional[dict] = None,
+    compute: Callable[[], T],
+    cacheable: Optional[Callable[[T], bool]] = None,
+    tags: Optional[set[str]] = None,
+    timeout: Optional[int] = timeout,
+    hard_timeout: Optional[int] = None,
+) -> T:
+    """
+    Returns the cached value of `compute()`, recomputing it once it is older than
+    `timeout`. Only one worker recomputes an entry at a time (single-flight): the
+    others get the stale value meanwhile, or wait for the new one if there is none.
+    Stale values are dropped after `hard_timeout` (default: CACHE_HARD_TIMEOUT).
+    """
+    return _get_or_set_entry(
+        key=key,
+        params=params,
+        compute=lambda tag_versions: compute(),
+        cacheable=cacheable,
+        tags=tags,
+        timeout=timeout,
+        hard_timeout=hard_timeout,
+    )
+
+
+def _get_or_set_entry[
+    T
+](
+    *,
+    key: str,
+    params: Optional[dict],
+    compute: Callable[[Optional[dict[str, str]]], T],
+    cacheable: Optional[Callable[[T], bool]],
+    tags: Optional[set[str]],
+    timeout: Optional[int],
+    hard_timeout: Optional[int],
+) -> T:
+    """
+    get_or_set_query_cache, passing to `compute` the tag versions that its value
+    is stored with, so that it can store other entries consistent with it. They
+    are None when the value isn't stored.
+    """
+    if timeout is not None and timeout <= 0:
+        return compute(None)
+
+    hash_key = get_cache_key(key, params)
+    entry = _get_entries(key, [hash_key]).get(hash_key)
+    if entry is not None and _is_fresh(entry):
+        value = _read_value(hash_key, entry)
+        if value is not _MISSING:
+            _record_cache_lookup(key, entry)
+            return value
+        entry = None
+
+    lock = _acquire_recompute_lock(hash_key)
+    if lock is None:
+        entry = entry or _wait_for_recompute(hash_key)
+        value = _read_value(hash_key, entry)
+        if value is not _MISSING:
+            _record_cache_lookup(key, entry)
+            return value
+
+    _record_cache_lookup(key, None)
+    try:
+        # Read before computing, so that an invalidation during the computation
+        # makes the new entry stale
+        tag_versions = _try_get_tag_versions(
+            key, tags or set(), _get_hard_timeout(timeout, hard_timeout)
+        )
+        value = compute(tag_versions)
+        if tag_versions is not None and (cacheable is None or cacheable(value)):
+            _store_entry(
+                key=key,
+                hash_key=hash_key,
+                value=value,
+                tags=tags or set(),
+                timeout=timeout,
+                hard_timeout=hard_timeout,
+                tag_versions=tag_versions,
+            )
+        return value
+    finally:
+        _release_recompute_lock(lock)
+
+
+def get_or_set_query_cache_many[
+    K, V
+](
+    *,
+    key: str,
+    items: Iterable[K],
+    compute: Callable[[list[K]], dict[K, V]],
+    get_tags: Optional[Callable[[K], set[str]]] = None,
+    timeout: Optional[int] = timeout,
+    hard_timeout: Optional[int] = None,
+) -> dict[K, V]:
+    """
+    Caches a value per item, so that requests for overlapping lists of items
+    share entries. The entries are fetched with a single MGET, and `compute` is
+    called once with the missing or stale items only. It must return a value for
+    each of them, so that items without data are cached as well.
+    """
+    items = list(dict.fromkeys(items))
+    if timeout is not None and timeout <= 0:
+        return compute(items)
 
-    return cache.set(hash_key, rows, timeout)
+    hash_keys = {item: get_cache_key(key, {"item": item}) for item in items}
+    entries = _get_entries(key, list(hash_keys.values()))
+
+    values: dict[K, V] = {}
+    missing: list[K] = []
+    for item, hash_key in hash_keys.items():
+        entry = entries.get(hash_key)
+        value = _MISSING
+        if entry is not None and _is_fresh(entry):
+            value = _read_value(hash_key, entry)
+        if value is _MISSING:
+            missing.append(item)
+            _record_cache_lookup(key, None)
+        else:
+            values[item] = value
+            _record_cache_lookup(key, entry)
+
+    if missing:
+        missing_tags = {
+            item: get_tags(item) if get_tags is not None else set() for item in missing
+        }
+        tag_versions = _try_get_tag_versions(
+            key,
+            {tag for tags in missing_tags.values() for tag in tags},
+            _get_hard_timeout(timeout, hard_timeout),
+        )
+        computed = compute(missing)
+        if tag_versions is not None:
+            _store_entries(
+                key=key,
+                values={
+                    hash_keys[item]: (computed[item], missing_tags[item])
+                    for item in missing
+                },
+                timeout=timeout,
+                hard_timeout=hard_timeout,
+                tag_versions=tag_versions,
+            )
+        values.update(computed)
+
+    return values
+
+
+def invalidate_cache_tags(tags: Iterable[str]) -> int:
+    """
+    Makes stale the entries tagged with any of the tags, by giving the tags a new
+    version, so that they are served stale while they are recomputed instead of
+    every request waiting for them. The entries are evicted from the in-process
+    tiers, through the tags published on CACHE_INVALIDATION_CHANNEL.
+    Returns the number of tags that cached entries were computed from.
+    """
+    tags = sorted(set(tags))
+    if not tags:
+        return 0
+
+    client = get_redis_client()
+    pipeline = client.pipeline(transaction=False)
+    for tag in tags:
+        # XX skips the tags without entries, KEEPTTL keeps them as long as those
+        pipeline.set(_get_tag_key(tag), uuid.uuid4().hex, xx=True, keepttl=True)
+    invalidated = sum(1 for result in pipeline.execute() if result)
+
+    # The other processes evict theirs when they get the published tags
+    if _local_cache is not None and _local_cache_pid == os.getpid():
+        _local_cache.invalidate_tags(tags)
+    client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(tags))
+    return invalidated
 
 
 def get_query_cache(key, params: Optional[dict] = None):
-    if params is not None:
-        params_hash = _create_cache_params_hash(params)
-        return cache.get("%s-%s" % (key, params_hash))
-    return cache.get("%s" % key)
+    """Value of a fresh entry, or None. Prefer get_or_set_query_cache."""
+    hash_key = get_cache_key(key, params)
+    entry = _get_entries(key, [hash_key]).get(hash_key)
+    value = None
+    if entry is not None and _is_fresh(entry):
+        value = _read_value(hash_key, entry)
+    value = None if value is _MISSING else value
+    _record_cache_lookup(key, value)
+    return value
+
+
+def _is_cacheable_response(response: HttpResponseBase) -> bool:
+    return (
+        response.status_code == 200 and not response.streaming and not response.cookies
+    )
+
+
+type GetRequestParams[T] = Callable[[T], Optional[dict]]
+
+
+class ResponseVersion(NamedTuple):
+    """Identifies a cached response. It is cached on its own to be checked cheaply."""
+
+    digest: str
+    """sha256 of the raw content"""
+    encodings: tuple[str, ...]
+
+
+class CachedResponse(NamedTuple):
+    response: HttpResponseBase
+    encodings: dict[str, bytes]
+    """The content of the response, compressed by each Content-Encoding"""
+    version: ResponseVersion
+
+
+def _encode_response(response: HttpResponseBase) -> CachedResponse:
+    encodings = {}
+    if len(response.content) >= RESPONSE_COMPRESS_MIN_SIZE:
+        encodings["gzip"] = gzip.compress(
+            response.content, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0
+        )
+    version = ResponseVersion(
+        hashlib.sha256(response.content).hexdigest(), tuple(encodings)
+    )
+    return CachedResponse(response, encodings, version)
+
+
+def _accepts_encoding(request: HttpRequest, encoding: str) -> bool:
+    """Whether the encoding is in the Accept-Encoding of the request, with q > 0."""
+    for accepted in request.headers.get("Accept-Encoding", "").split(","):
+        name, *params = accepted.split(";")
+        if name.strip().lower() != encoding:
+            continue
+        for param in params:
+            quality = re.fullmatch(r"\s*q\s*=\s*([0-9.]+)\s*", param)
+            if quality is not None and float(quality.group(1)) == 0:
+                return False
+        return True
+    return False
+
+
+def _select_encoding(request: HttpRequest, encodings: Iterable[str]) -> Optional[str]:
+    for encoding in encodings:
+        if _accepts_encoding(request, encoding):
+            return encoding
+    return None
+
+
+def _get_etag(version: ResponseVersion, encoding: Optional[str]) -> str:
+    # Each encoding is a different representation, with its own strong ETag
+    if encoding is None:
+        return f'"{version.digest}"'
+    return f'"{version.digest}-{encoding}"'
+
+
+def _get_encoded_response(
+    request: HttpRequest, cached_response: CachedResponse
+) -> HttpResponseBase:
+    """The cached response, with the first encoding the request accepts."""
+    response = cached_response.response
+    encoding = _select_encoding(request, cached_response.encodings)
+    if encoding is not None:
+        content = cached_response.encodings[encoding]
+        response.content = content
+        response["Content-Encoding"] = encoding
+        response["Content-Length"] = str(len(content))
+    response["ETag"] = _get_etag(cached_response.version, encoding)
+    return response
+
+
+def _get_not_modified_response(
+    request: HttpRequest, version: Optional[ResponseVersion], timeout: Optional[int]
+) -> Optional[HttpResponseBase]:
+    """A 304 response if the request has the ETag of this version, else None."""
+    if version is None or request.method not in ("GET", "HEAD"):
+        return None
+
+    etag = _get_etag(version, _select_encoding(request, version.encodings))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        return None
+    response["ETag"] = etag
+    patch_response_headers(response, timeout)
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
+
+
+def _get_view_cache_params(
+    request: HttpRequest,
+    get_query_params: Optional[GetRequestParams[QueryDict]],
+    get_body_params: Optional[GetRequestParams[bytes]],
+) -> Optional[dict]:
+    """
+    Params identifying a request, or None if its response can't be cached. HEAD
+    requests share the entries of GET ones, like with django's cache_page.
+    """
+    params = {"path": request.path, "accept": request.headers.get("Accept", "")}
+    is_get = request.method in ("GET", "HEAD")
+    if is_get and get_query_params is None:
+        return {**params, "path": request.get_full_path()}
+    if is_get:
+        query_params = get_query_params(request.GET)
+        return None if query_params is None else {**params, "query": query_params}
+    if request.method == "POST" and get_body_params is not None:
+        body_params = get_body_params(request.body)
+        return None if body_params is None else {**params, "body": body_params}
+    return None
+
+
+def _encode_cacheable_response(
+    response: HttpResponseBase, timeout: Optional[int]
+) -> Optional[CachedResponse]:
+    """The response encoded to be cached, or None if it can't be cached."""
+    # DRF responses are rendered lazily, they must be rendered to be pickled
+    if callable(getattr(response, "render", None)):
+        response.render()
+    if not _is_cacheable_response(response):
+        return None
+    patch_response_headers(response, timeout)
+    # The same entry is served with different encodings
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return _encode_response(response)
+
+
+def cache_view(
+    view,
+    *,
+    timeout=timeout,
+    hard_timeout: Optional[int] = None,
+    get_query_params: Optional[GetRequestParams[QueryDict]] = None,
+    get_body_params: Optional[GetRequestParams[bytes]] = None,
+    get_tags: Optional[Callable[..., set[str]]] = None,
+):
+    """
+    Caches the GET and HEAD responses of the view, like django's cache_page, with the
+    single-flight recomputation and stale responses of get_or_set_query_cache.
+
+    GET requests are keyed by their full path, or by the path and the canonical
+    params that `get_query_params` makes of the query string. POST responses are
+    cached too if `get_body_params` is given, keyed by the params it makes of the
+    body. Both return None to skip the cache (e.g. for invalid params).
+    `get_tags` gets the url kwargs and returns the cache tags.
+
+    Large responses are cached gzipped as well, and served gzipped as is to the
+    requests that accept it. The responses have an ETag, the digest of their
+    content: a GET with it in If-None-Match gets a 304, checked against a small
+    separate entry when the request has one.
+    """
+    family = f"view:{view.__name__}"
+    version_family = f"{family}:version"
+
+    @functools.wraps(view)
+    def cached_view(request: HttpRequest, *args, **kwargs):
+        params = _get_view_cache_params(request, get_query_params, get_body_params)
+        if params is None:
+            return view(request, *args, **kwargs)
+
+        if "If-None-Match" in request.headers:
+            not_modified = _get_not_modified_response(
+                request, get_query_cache(version_family, params), timeout
+            )
+            if not_modified is not None:
+                return not_modified
+
+        tags = get_tags(**kwargs) if get_tags is not None else None
+
+        def compute(
+            tag_versions: Optional[dict[str, str]],
+        ) -> CachedResponse | HttpResponseBase:
+            response = view(request, *args, **kwargs)
+            cached_response = _encode_cacheable_response(response, timeout)
+            if cached_response is None:
+                return response
+            if tag_versions is not None:
+                # With the versions of the response entry, so that both of them are
+                # made stale by an invalidation during the view
+                _store_entry(
+                    key=version_family,
+                    hash_key=get_cache_key(version_family, params),
+                    value=cached_response.version,
+                    tags=tags or set(),
+                    timeout=timeout,
+                    hard_timeout=hard_timeout,
+                    tag_versions=tag_versions,
+                )
+            return cached_response
+
+        result = _get_or_set_entry(
+            key=family,
+            params=params,
+            compute=compute,
+            cacheable=lambda result: isinstance(result, CachedResponse),
+            tags=tags,
+            timeout=timeout,
+            hard_timeout=hard_timeout,
+        )
+        if not isinstance(result, CachedResponse):
+            return result
+        not_modified = _get_not_modified_response(request, result.version, timeout)
+        if not_modified is not None:
+            return not_modified
+        return _get_encoded_response(request, result)
+
+    return cached_view
 
 
 def set_notification_cache(*, notification: str) -> None:
-    notification_hash = hash(notification)
-    hash_key = f"{DISCORD_NOTIFICATION_KEY}-{notification_hash}"
+    hash_key = get_cache_key(DISCORD_NOTIFICATION_KEY, {"notification": notification})
     return cache.set(hash_key, notification, DISCORD_NOTIFICATION_COOLDOWN)
 
 
 def get_notification_cache(*, notification: str) -> str:
-    notification_hash = hash(notification)
-    hash_key = f"{DISCORD_NOTIFICATION_KEY}-{notification_hash}"
-    return cache.get(hash_key)
-
-
-def _add_to_lookup(cache_key, property_key, lookup):
-    if property_key is None:
-        return
-    if lookup[property_key] is None:
-        lookup[property_key] = set()
-    lookup[property_key].append(cache_key)
+    hash_key = get_cache_key(DISCORD_NOTIFICATION_KEY, {"notification": notification})
+    value = cache.get(hash_key)
+    _record_cache_lookup(DISCORD_NOTIFICATION_KEY, value)
+    return value
@@ -0,0 +1,68 @@
+import pickle
+from typing import Any, NamedTuple
+import zlib
+
+# First byte of an encoded value, telling how the rest of it is stored
+RAW_FORMAT = b"r"
+ZLIB_FORMAT = b"z"
+# Fast level, the rows are repetitive enough to compress well anyway
+ZLIB_LEVEL = 1
+
+
+class ColumnarRows(NamedTuple):
+    """A list of dicts with the same keys, storing the keys only once."""
+
+    columns: tuple[str, ...]
+    rows: list[tuple]
+
+
+class EncodedValue(NamedTuple):
+    payload: bytes
+    raw_size: int
+    """Size of the value before compression"""
+
+
+def to_columnar(value: Any) -> Any:
+    """Stores lists of dict rows (as returned by dict_fetchall) as columnar rows."""
+    if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+        return value
+
+    columns = tuple(value[0])
+    rows = []
+    for row in value:
+        if not isinstance(row, dict) or tuple(row) != columns:
+            return value
+        rows.append(tuple(row.values()))
+    return ColumnarRows(columns, rows)
+
+
+def from_columnar(value: Any) -> Any:
+    if not isinstance(value, ColumnarRows):
+        return value
+    return [dict(zip(value.columns, row)) for row in value.rows]
+
+
+def encode_cache_value(value: Any, compress_min_size: int) -> EncodedValue:
+    """Pickles the value, compressing it if it is at least `compress_min_size` bytes."""
+    pickled = pickle.dumps(to_columnar(value), protocol=pickle.HIGHEST_PROTOCOL)
+    if len(pickled) < compress_min_size:
+        return EncodedValue(RAW_FORMAT + pickled, len(pickled))
+    return EncodedValue(ZLIB_FORMAT + zlib.compress(pickled, ZLIB_LEVEL), len(pickled))
+
+
+def decode_cache_value(payload: bytes) -> Any:
+    value_format = payload[:1]
+    data = memoryview(payload)[1:]
+    if value_format == ZLIB_FORMAT:
+        data = zlib.decompress(data)
+    elif value_format != RAW_FORMAT:
+        raise ValueError(f"Unknown cache value format {value_format!r}")
+    return from_columnar(pickle.loads(data))
+
+
+def split_payload(payload: bytes, chunk_size: int) -> list[bytes]:
+    chunks = []
+    for start in range(0, len(payload), chunk_size):
+        end = start + chunk_size
+        chunks.append(payload[start:end])
+    return chunks
@@ -1,3 +1,6 @@
+from django.conf import settings
+
+
 def dict_fetchall(cursor) -> list[dict]:
     """
     Return all rows from a cursor as a dict.
@@ -6,3 +9,93 @@ def dict_fetchall(cursor) -> list[dict]:
     """
     columns = [col[0] for col in cursor.description]
     return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# The dashboard database has the generated columns of the models, the kcidb one
+# doesn't, so the same values are computed from the source columns there
+
+
+def get_test_kind_column(table: str = "tests") -> str:
+    """SQL expression of the kind of a test: 'boot', 'test', or NULL without a path."""
+    if settings.USE_DASHBOARD_DB:
+        return f"{table}.kind"
+    return f"""(CASE
+        WHEN {table}.path = 'boot' OR {table}.path LIKE 'boot.%%' THEN 'boot'
+        WHEN {table}.path IS NOT NULL THEN 'test'
+    END)"""
+
+
+def get_build_is_dummy_column(table: str = "builds") -> str:
+    """SQL expression telling whether a build is a maestro dummy build."""
+    if settings.USE_DASHBOARD_DB:
+        return f"{table}.is_dummy"
+    return f"({table}.id LIKE 'maestro:dummy_%%')"
+
+
+# Columns identifying the tree of a checkout. The dashboard database numbers the
+# trees, so the checkouts are grouped and joined by their tree_id instead, which
+# the checkouts_set_tree_id trigger sets on every checkout
+TREE_IDENTITY_COLUMNS = (
+    "tree_name",
+    "git_repository_branch",
+    "git_repository_url",
+    "origin",
+)
+
+
+def get_checkout_tree_columns(table: str = "checkouts") -> str:
+    """SQL columns identifying the tree of a checkout, for PARTITION BY or DISTINCT ON."""
+    if settings.USE_DASHBOARD_DB:
+        return f"{table}.tree_id"
+    return ", ".join(f"{table}.{column}" for column in TREE_IDENTITY_COLUMNS)
+
+
+def get_checkout_tree_join(left: str, right: str) -> str:
+    """
+    SQL condition telling whether the rows of `left` and `right` are of the same
+    tree, both of them having the columns of `get_checkout_tree_columns`.
+    """
+    if settings.USE_DASHBOARD_DB:
+        return f"{left}.tree_id = {right}.tree_id"
+    # The columns can be NULL, which a plain = would never match
+    return " AND ".join(
+        f"{left}.{column} IS NOT DISTINCT FROM {right}.{column}"
+        for column in TREE_IDENTITY_COLUMNS
+    )
+
+
+# Values identifying the series of a test: the same test, on the same platform, in the
+# builds of the same config of a tree. Their md5 is stored in `tests.series`
+TEST_SERIES_VALUES = (
+    "{checkouts}.origin",
+    "{checkouts}.git_repository_url",
+    "{checkouts}.git_repository_branch",
+    "{builds}.config_name",
+    "{tests}.path",
+    "{tests}.environment_misc ->> 'platform'",
+)
+
+
+def _get_test_series_hash(values: list[str]) -> str:
+    # json keeps NULLs and the boundaries between the values apart, unlike a concatenation
+    return f"md5(json_build_array({', '.join(values)})::text)"
+
+
+def get_test_series_column(
+    tests: str = "tests", builds: str = "builds", checkouts: str = "checkouts"
+) -> str:
+    """SQL expression of the series of a test, from the joined build and checkout."""
+    return _get_test_series_hash(
+        [
+            value.format(tests=tests, builds=builds, checkouts=checkouts)
+            for value in TEST_SERIES_VALUES
+        ]
+    )
+
+
+def get_test_series_query() -> str:
+    """
+    SQL expression of the series of a test from parameters, in the order of
+    `TEST_SERIES_VALUES`. It hashes them exactly like `get_test_series_column`.
+    """
+    return _get_test_series_hash(["%s::text"] * len(TEST_SERIES_VALUES))
@@ -4,6 +4,9 @@ from datetime import datetime, timezone
 import json
 from typing import Any, Dict, List, Literal, Optional, Set
 
+from django.conf import settings
+
+from kernelCI_app.cache import make_cache_tags
 from kernelCI_app.constants.general import (
     UNCATEGORIZED_STRING,
     MAESTRO_DUMMY_BUILD_PREFIX,
@@ -42,12 +45,14 @@ from kernelCI_app.typeModels.hardwareDetails import (
     HardwareDetailsPostBody,
     Tree,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.issues import Issue, IssueDict
 from kernelCI_app.utils import (
     convert_issues_dict_to_list_typed,
     create_issue_typed,
     extract_error_message,
     is_boot,
+    quantize_time_window,
 )
 from pydantic import ValidationError
 from kernelCI_app.typeModels.hardwareDetails import (
@@ -61,19 +66,72 @@ def unstable_parse_post_body(*, instance, request) -> None:
     post_body = HardwareDetailsPostBody(**body)
 
     instance.origin = post_body.origin
-    instance.end_datetime = datetime.fromtimestamp(
-        int(post_body.endTimestampInSeconds), timezone.utc
+    start_timestamp, end_timestamp = quantize_time_window(
+        int(post_body.startTimestampInSeconds),
+        int(post_body.endTimestampInSeconds),
+        settings.HARDWARE_TIME_BUCKET_SECONDS,
     )
-
-    instance.start_datetime = datetime.fromtimestamp(
-        int(post_body.startTimestampInSeconds), timezone.utc
+    instance.time_window = TimeWindow(
+        start_timestamp_in_seconds=start_timestamp,
+        end_timestamp_in_seconds=end_timestamp,
     )
+    instance.end_datetime = datetime.fromtimestamp(end_timestamp, timezone.utc)
+
+    instance.start_datetime = datetime.fromtimestamp(start_timestamp, timezone.utc)
 
     instance.selected_commits = post_body.selectedCommits
 
     instance.filters = FilterParams(body, process_body=True)
 
 
+def _normalize_post_body_filters(filters: Optional[Dict]) -> Dict:
+    """
+    Sorts the values of the list filters, whose order doesn't matter. Filters with
+    a comparison operator only use their first value, which is kept as is.
+    """
+    normalized = {}
+    for key, values in (filters or {}).items():
+        filter_term = key.removeprefix(FilterParams.filter_param_prefix)
+        if isinstance(values, list) and not FilterParams.filter_reg.match(filter_term):
+            unique_values = {
+                json.dumps(value, sort_keys=True): value for value in values
+            }
+            values = [unique_values[value_key] for value_key in sorted(unique_values)]
+        normalized[key] = values
+    return normalized
+
+
+def get_hardware_details_cache_params(body: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Canonical form of a hardware details post body for the response cache, so
+    that equivalent bodies share an entry. The timestamps are quantized like in
+    unstable_parse_post_body. Returns None for an invalid body,
+    leaving its error response to the view.
+    """
+    try:
+        data = json.loads(body)
+        post_body = HardwareDetailsPostBody(**data)
+        start_timestamp, end_timestamp = quantize_time_window(
+            int(post_body.startTimestampInSeconds),
+            int(post_body.endTimestampInSeconds),
+            settings.HARDWARE_TIME_BUCKET_SECONDS,
+        )
+    except (ValidationError, json.JSONDecodeError, ValueError, TypeError):
+        return None
+
+    return {
+        "origin": post_body.origin,
+        "start_timestamp": start_timestamp,
+        "end_timestamp": end_timestamp,
+        "selected_commits": dict(sorted(post_body.selectedCommits.items())),
+        "filter": _normalize_post_body_filters(post_body.filter),
+    }
+
+
+def get_hardware_details_cache_tags(*, hardware_id: str) -> Set[str]:
+    return make_cache_tags(hardware_id=hardware_id)
+
+
 def set_trees_status_summary(
     *, trees: List[Tree], tree_status_summary: defaultdict
 ) -> None:
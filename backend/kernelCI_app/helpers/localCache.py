@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Iterable, NamedTuple, Optional
+
+
+class LocalEntry(NamedTuple):
+    value: Any
+    size: int
+    tags: frozenset[str]
+    expires_at: float
+    """Monotonic time after which the entry is dropped"""
+
+
+class LocalCache:
+    """
+    Thread safe LRU kept in the process memory, bounded by the total size of its
+    values as given to `set`. Each entry is kept for at most `timeout` seconds, and
+    can be evicted by the tags it was stored with.
+    """
+
+    def __init__(self, *, max_size: int, timeout: float) -> None:
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries: OrderedDict[str, LocalEntry] = OrderedDict()
+        self._tag_keys: dict[str, set[str]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """The value of the key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        *,
+        size: int,
+        tags: Iterable[str] = (),
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Stores the value for `timeout` seconds, capped by the timeout of the cache."""
+        if size > self.max_size:
+            return
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if timeout <= 0:
+            return
+
+        entry = LocalEntry(value, size, frozenset(tags), time.monotonic() + timeout)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += size
+            for tag in entry.tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            while self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drops the entries stored with any of the tags, returns how many."""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tag_keys.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tag_keys.clear()
+            self._size = 0
+
+    def _remove(self, key: str) -> None:
+        # Must be called with the lock held
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        for tag in entry.tags:
+            tag_keys = self._tag_keys[tag]
+            tag_keys.discard(key)
+            if not tag_keys:
+                del self._tag_keys[tag]
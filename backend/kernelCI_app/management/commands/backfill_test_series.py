@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from kernelCI_app.helpers.database import get_test_series_column
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = """Sets the series of the tests that don't have one yet, such as the tests
+    written before the column existed or copied by update_db. The tests are walked
+    in id order and updated in batches, each one in its own transaction, so the
+    command can be stopped and run again at any time."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Dashboard database to update (default: default)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Tests updated per transaction (default: {DEFAULT_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, database: str, batch_size: int, **options):
+        # Tests whose build or checkout is missing keep a NULL series, walking the ids
+        # instead of selecting the NULLs again makes sure that each batch moves on
+        select_query = """
+            SELECT id FROM tests
+            WHERE id > %(last_id)s AND series IS NULL
+            ORDER BY id
+            LIMIT %(batch_size)s
+        """
+        update_query = f"""
+            UPDATE tests
+            SET series = {get_test_series_column()}
+            FROM builds
+            JOIN checkouts ON checkouts.id = builds.checkout_id
+            WHERE tests.id = ANY(%(test_ids)s) AND builds.id = tests.build_id
+        """
+
+        last_id = ""
+        total_updated = 0
+        while True:
+            with transaction.atomic(using=database), connections[
+                database
+            ].cursor() as cursor:
+                cursor.execute(
+                    select_query, {"last_id": last_id, "batch_size": batch_size}
+                )
+                test_ids = [test_id for (test_id,) in cursor.fetchall()]
+                if not test_ids:
+                    break
+                cursor.execute(update_query, {"test_ids": test_ids})
+                total_updated += cursor.rowcount
+
+            last_id = test_ids[-1]
+            self.stdout.write(f"Updated {total_updated} tests, up to id {last_id}")
+
+        self.stdout.write(f"Backfill completed, {total_updated} tests updated")
@@ -0,0 +1,130 @@
+import os
+import resource
+import statistics
+import tempfile
+import time
+from typing import Optional
+from django.core.management.base import BaseCommand
+from django.db import connection
+from kernelCI_app.management.commands.helpers.kcidbng_ingester import (
+    create_prepare_pool,
+    ingest_submissions_parallel,
+    load_trees_name,
+    verify_spool_dirs,
+)
+from kernelCI_app.management.commands.helpers.synthetic_submissions import (
+    add_generation_arguments,
+    count_rows,
+    generate_spool,
+    get_generation_config,
+)
+from kernelCI_app.management.commands.helpers.argument_types import (
+    check_positive_int,
+)
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+class Command(BaseCommand):
+    help = """Measures the ingestion throughput: generates a synthetic spool and
+    ingests it with ingest_submissions_parallel into the configured database.
+    Use it against a local database only, the synthetic rows are kept."""
+
+    def add_arguments(self, parser):
+        add_generation_arguments(parser)
+        parser.add_argument(
+            "--max-workers",
+            type=check_positive_int,
+            default=5,
+            help="Maximum number of workers to process files in parallel (default: 5)",
+        )
+        parser.add_argument(
+            "--db-writers",
+            type=check_positive_int,
+            default=1,
+            help="Number of threads writing to the database concurrently (default: 1)",
+        )
+        parser.add_argument(
+            "--stream-threshold",
+            type=check_positive_int,
+            help="Size in MB above which files are streamed (default: never stream)",
+        )
+        parser.add_argument(
+            "--prepare-mode",
+            choices=["thread", "process"],
+            default="thread",
+            help="Where files are decoded and validated (default: thread)",
+        )
+
+    def handle(
+        self,
+        *args,
+        max_workers: int,
+        db_writers: int,
+        stream_threshold: Optional[int],
+        prepare_mode: str,
+        trees_file: Optional[str],
+        **options,
+    ):
+        trees_name = load_trees_name(trees_file) if trees_file else {}
+        config = get_generation_config(options, trees_name or None)
+        if stream_threshold is not None:
+            stream_threshold = stream_threshold * 1024 * 1024
+
+        self.stdout.write(f"Ingesting into {connection.settings_dict['NAME']}")
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            verify_spool_dirs(spool_dir)
+            filenames = generate_spool(spool_dir, config)
+            spool_size = sum(
+                os.path.getsize(os.path.join(spool_dir, filename))
+                for filename in filenames
+            )
+            rows = count_rows(config)
+            self.stdout.write(
+                f"Generated {len(filenames)} files, {rows} rows,"
+                f" {spool_size / 1024 / 1024:.1f} MB"
+            )
+
+            prepare_pool = (
+                create_prepare_pool(max_workers) if prepare_mode == "process" else None
+            )
+            try:
+                start_time = time.perf_counter()
+                summary = ingest_submissions_parallel(
+                    spool_dir,
+                    trees_name,
+                    max_workers,
+                    db_writers,
+                    stream_threshold,
+                    prepare_pool,
+                )
+                elapsed = time.perf_counter() - start_time
+            finally:
+                if prepare_pool is not None:
+                    prepare_pool.shutdown()
+
+        file_seconds = summary["file_seconds"]
+        # In KB on Linux. Children only include the prepare processes that exited
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        children_peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+        self.stdout.write(
+            f"Ingested {summary['succeeded']} files ({summary['failed']} failed)"
+            f" in {elapsed:.2f}s"
+        )
+        self.stdout.write(f"Throughput: {len(filenames) / elapsed:.2f} files/s")
+        self.stdout.write(f"Throughput: {rows / elapsed:.0f} rows/s")
+        self.stdout.write(
+            f"Latency per file: p50 {percentile(file_seconds, 50):.2f}s,"
+            f" p99 {percentile(file_seconds, 99):.2f}s"
+        )
+        self.stdout.write(f"Peak RSS: {peak_rss / 1024:.0f} MB")
+        if prepare_mode == "process":
+            self.stdout.write(
+                f"Peak RSS of a prepare process: {children_peak_rss / 1024:.0f} MB"
+            )
@@ -0,0 +1,104 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+import tempfile
+import time
+from typing import Optional
+from django.core.management.base import BaseCommand
+from kernelCI_app.management.commands.helpers.kcidbng_ingester import (
+    create_prepare_pool,
+    load_trees_name,
+    prepare_file_data,
+    prepare_file_rows,
+)
+from kernelCI_app.management.commands.helpers.synthetic_submissions import (
+    add_generation_arguments,
+    count_rows,
+    generate_spool,
+    get_generation_config,
+)
+from kernelCI_app.management.commands.helpers.argument_types import (
+    check_positive_int,
+)
+
+PREPARE_MODES = ["thread", "process"]
+
+
+class Command(BaseCommand):
+    help = """Measures how fast submission files are prepared (decoded, validated and
+    standardized) in the thread and process prepare modes of monitor_submissions,
+    using a synthetic spool. Nothing is written to the database."""
+
+    def add_arguments(self, parser):
+        add_generation_arguments(parser)
+        parser.add_argument(
+            "--max-workers",
+            type=check_positive_int,
+            default=5,
+            help="Number of threads or processes preparing files (default: 5)",
+        )
+        parser.add_argument(
+            "--modes",
+            nargs="+",
+            choices=PREPARE_MODES,
+            default=PREPARE_MODES,
+            help="Prepare modes to measure (default: all)",
+        )
+
+    def handle(
+        self,
+        *args,
+        max_workers: int,
+        modes: list[str],
+        trees_file: Optional[str],
+        **options,
+    ):
+        trees_name = load_trees_name(trees_file) if trees_file else {}
+        config = get_generation_config(options, trees_name or None)
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            filenames = generate_spool(spool_dir, config)
+            files = len(filenames)
+            rows = count_rows(config)
+            self.stdout.write(
+                f"Preparing {files} files ({rows} rows) with {max_workers} workers"
+            )
+
+            for mode in modes:
+                elapsed = self.run_mode(
+                    mode, spool_dir, filenames, trees_name, max_workers
+                )
+                self.stdout.write(
+                    f"{mode}: {elapsed:.2f}s, {files / elapsed:.2f} files/s,"
+                    f" {rows / elapsed:.0f} rows/s"
+                )
+
+    def run_mode(
+        self,
+        mode: str,
+        spool_dir: str,
+        filenames: list[str],
+        trees_name: dict[str, str],
+        max_workers: int,
+    ) -> float:
+        """Returns the time taken to prepare all files, excluding the pool startup."""
+        pool: Executor
+        if mode == "process":
+            pool = create_prepare_pool(max_workers)
+            prepare = prepare_file_rows
+            # Spawns and sets up all processes before starting the clock
+            list(pool.map(time.sleep, [0.5] * max_workers))
+        else:
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            prepare = prepare_file_data
+
+        with pool:
+            start_time = time.perf_counter()
+            futures = [
+                pool.submit(prepare, filename, trees_name, spool_dir)
+                for filename in filenames
+            ]
+            for future in futures:
+                data, metadata = future.result()
+                if data is None:
+                    error = metadata.get("error") if metadata else "empty file"
+                    self.stderr.write(f"Failed to prepare file: {error}")
+            return time.perf_counter() - start_time
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from kernelCI_app.cache import get_cache_stats
+
+
+class Command(BaseCommand):
+    help = """Shows the hits, misses and stored sizes of each query cache key family,
+    added up across all the workers sharing the cache. The local hit rate is the
+    part of the lookups served by the in-process tier."""
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        if not stats:
+            self.stdout.write("No cache lookups recorded yet")
+            return
+
+        self.stdout.write(
+            f"{'family':<32} {'hits':>10} {'misses':>10} {'hit rate':>9} {'local':>9}"
+            f" {'stored':>8} {'avg size':>10} {'ratio':>6} {'too large':>9}"
+        )
+        for family, counts in sorted(stats.items()):
+            lookups = counts["hit"] + counts["miss"]
+            hit_rate = counts["hit"] / lookups if lookups else 0
+            local_hit_rate = counts["local_hit"] / lookups if lookups else 0
+            stored = counts["stored"]
+            average_size = counts["stored_bytes"] // stored if stored else 0
+            ratio = (
+                counts["raw_bytes"] / counts["stored_bytes"]
+                if counts["stored_bytes"]
+                else 0
+            )
+            self.stdout.write(
+                f"{family:<32} {counts['hit']:>10} {counts['miss']:>10}"
+                f" {hit_rate:>9.1%} {local_hit_rate:>9.1%} {stored:>8}"
+                f" {average_size:>10} {ratio:>6.1f} {counts['too_large']:>9}"
+            )
@@ -0,0 +1,181 @@
+import json
+from typing import Any, Iterator, NamedTuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+
+class IndexProbe(NamedTuple):
+    module: str
+    """Query module whose joins or filters the probe reproduces"""
+    indexes: tuple[str, ...]
+    """Names (or name prefixes, for the foreign key indexes) the plan must use"""
+    query: str
+    params: dict[str, Any]
+
+
+PROBES = [
+    IndexProbe(
+        module="tree",
+        indexes=("checkouts_origin_start_idx",),
+        query="""
+            SELECT id FROM checkouts
+            WHERE origin = %(origin)s AND start_time >= NOW() - INTERVAL '7 days'
+        """,
+        params={"origin": "maestro"},
+    ),
+    IndexProbe(
+        module="tree",
+        indexes=("checkouts_commit_hash_idx", "checkouts_commit_tags_idx"),
+        query="""
+            SELECT id FROM checkouts
+            WHERE git_commit_hash = %(commit_hash)s
+                OR git_commit_tags @> ARRAY[%(commit_hash)s]::TEXT[]
+        """,
+        params={"commit_hash": "v6.15"},
+    ),
+    IndexProbe(
+        module="tree",
+        indexes=("checkouts_tree_start_idx",),
+        query="""
+            SELECT id FROM checkouts
+            WHERE tree_id = %(tree_id)s
+            ORDER BY start_time DESC
+            LIMIT 1
+        """,
+        params={"tree_id": 1},
+    ),
+    IndexProbe(
+        module="tree",
+        indexes=("builds_checkout_id", "tests_build_id"),
+        query="""
+            SELECT tests.id FROM builds
+            JOIN tests ON tests.build_id = builds.id
+            WHERE builds.checkout_id = %(checkout_id)s
+        """,
+        params={"checkout_id": "maestro:0"},
+    ),
+    IndexProbe(
+        module="test",
+        indexes=("tests_series_start_idx",),
+        query="""
+            SELECT id FROM tests
+            WHERE series = %(series)s AND start_time <= NOW()
+            ORDER BY start_time DESC
+            LIMIT 10
+        """,
+        params={"series": "0" * 32},
+    ),
+    IndexProbe(
+        module="hardware",
+        indexes=("tests_compatible_idx", "tests_platform_idx"),
+        query="""
+            SELECT id FROM tests
+            WHERE environment_compatible @> ARRAY[%(hardware)s]::TEXT[]
+                OR environment_misc ->> 'platform' = %(hardware)s
+        """,
+        params={"hardware": "raspberrypi,4-model-b"},
+    ),
+    IndexProbe(
+        module="hardware",
+        indexes=("tests_origin_start_idx",),
+        query="""
+            SELECT id FROM tests
+            WHERE origin = %(origin)s AND start_time >= NOW() - INTERVAL '7 days'
+        """,
+        params={"origin": "maestro"},
+    ),
+    IndexProbe(
+        module="issues",
+        indexes=("incidents_issue_id",),
+        query="SELECT id FROM incidents WHERE issue_id = ANY(%(issue_ids)s)",
+        params={"issue_ids": ["maestro:0"]},
+    ),
+    IndexProbe(
+        module="issues",
+        indexes=("incidents_test_id", "incidents_build_id"),
+        query="""
+            SELECT id FROM incidents
+            WHERE test_id = %(test_id)s OR build_id = %(build_id)s
+        """,
+        params={"test_id": "maestro:0", "build_id": "maestro:0"},
+    ),
+    IndexProbe(
+        module="notifications",
+        indexes=("builds_start_time_brin_idx",),
+        query="SELECT id FROM builds WHERE start_time >= NOW() - INTERVAL '1 day'",
+        params={},
+    ),
+    IndexProbe(
+        module="notifications",
+        indexes=("tests_start_time_brin_idx",),
+        query="SELECT id FROM tests WHERE start_time >= NOW() - INTERVAL '1 day'",
+        params={},
+    ),
+    IndexProbe(
+        module="update_db",
+        indexes=("builds_timestamp_brin_idx",),
+        query="""
+            SELECT id FROM builds
+            WHERE _timestamp >= %(start)s AND _timestamp <= %(end)s
+        """,
+        params={"start": "2025-01-01", "end": "2025-01-02"},
+    ),
+    IndexProbe(
+        module="update_db",
+        indexes=("tests_timestamp_brin_idx",),
+        query="""
+            SELECT id FROM tests
+            WHERE _timestamp >= %(start)s AND _timestamp <= %(end)s
+        """,
+        params={"start": "2025-01-01", "end": "2025-01-02"},
+    ),
+    IndexProbe(
+        module="notifications",
+        indexes=("tests_platform_idx",),
+        query="SELECT id FROM tests WHERE environment_misc->>'platform' = %(platform)s",
+        params={"platform": "rpi4"},
+    ),
+]
+
+
+def get_plan_indexes(plan: dict[str, Any]) -> Iterator[str]:
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for subplan in plan.get("Plans", []):
+        yield from get_plan_indexes(subplan)
+
+
+class Command(BaseCommand):
+    help = """Checks with EXPLAIN that the joins and filters of the query modules can
+    use the indexes of the schema. Sequential scans are disabled while planning,
+    so that the check doesn't depend on the size of the tables."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database to check (default: default)",
+        )
+
+    def handle(self, *args, database: str, **options):
+        connection = connections[database]
+        missing = 0
+        with transaction.atomic(using=database), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            for probe in PROBES:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {probe.query}", probe.params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used_indexes = set(get_plan_indexes(plan[0]["Plan"]))
+
+                for index in probe.indexes:
+                    used = any(name.startswith(index) for name in used_indexes)
+                    missing += not used
+                    self.stdout.write(
+                        f"{probe.module:<16} {index:<32} {'used' if used else 'NOT USED'}"
+                    )
+
+        if missing:
+            raise CommandError(f"{missing} indexes are not used by their queries")
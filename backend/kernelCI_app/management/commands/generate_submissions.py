@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from kernelCI_app.management.commands.helpers.kcidbng_ingester import (
+    load_trees_name,
+)
+from kernelCI_app.management.commands.helpers.synthetic_submissions import (
+    add_generation_arguments,
+    count_rows,
+    generate_spool,
+    get_generation_config,
+)
+
+
+class Command(BaseCommand):
+    help = """Generates synthetic kcidb v5.3 submission files in a spool directory,
+    to measure the ingestion with monitor_submissions or benchmark_ingestion."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--spool-dir",
+            type=str,
+            required=True,
+            help="Directory where the submission files are written",
+        )
+        add_generation_arguments(parser)
+
+    def handle(self, *args, spool_dir: str, trees_file: str, **options):
+        tree_urls = load_trees_name(trees_file) if trees_file else None
+        config = get_generation_config(options, tree_urls)
+
+        filenames = generate_spool(spool_dir, config)
+        self.stdout.write(
+            f"Generated {len(filenames)} files with {count_rows(config)} rows in {spool_dir}"
+        )
@@ -0,0 +1,22 @@
+import argparse
+
+
+def check_positive_int(value) -> int:
+    ivalue = int(value)
+    if ivalue <= 0:
+        raise argparse.ArgumentTypeError("%s has to be greater than 0" % value)
+    return ivalue
+
+
+def check_non_negative_int(value) -> int:
+    ivalue = int(value)
+    if ivalue < 0:
+        raise argparse.ArgumentTypeError("%s can't be negative" % value)
+    return ivalue
+
+
+def check_ratio(value) -> float:
+    fvalue = float(value)
+    if not 0 <= fvalue <= 1:
+        raise argparse.ArgumentTypeError("%s has to be between 0 and 1" % value)
+    return fvalue
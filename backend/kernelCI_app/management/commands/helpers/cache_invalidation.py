@@ -0,0 +1,194 @@
+import logging
+from queue import Empty, Full, Queue
+import threading
+from typing import Any, Iterable, Optional, TypedDict
+
+from django.db import connection
+
+from kernelCI_app.cache import invalidate_cache_tags, make_cache_tags
+
+logger = logging.getLogger("ingester")
+
+# Submissions whose cached queries are waiting to be invalidated. If the thread
+# that invalidates them falls behind, e.g. while Redis is down, the ids of new
+# commits are dropped instead of piling up, and those entries expire with their timeout
+INVALIDATION_QUEUE_SIZE = 1000
+
+
+class SubmissionIds(TypedDict):
+    commit_hashes: set[str]
+    """Commit hashes of the checkouts, and their git tags, which also name commits"""
+    hardware_ids: set[str]
+    issue_ids: set[str]
+    checkout_ids: set[str]
+    """Checkouts whose commit hash isn't known from the submission"""
+    build_ids: set[str]
+    """Builds whose commit hash isn't known from the submission"""
+    incident_test_ids: set[str]
+    """Tests referenced by incidents, which may not be in the submission"""
+
+
+def get_test_hardware(test: dict[str, Any]) -> set[str]:
+    # Raw kcidb tests have a nested environment, filtered ones have it flattened
+    environment = test.get("environment") or {}
+    misc = test.get("environment_misc", environment.get("misc")) or {}
+    compatible = test.get("environment_compatible", environment.get("compatible"))
+    return {misc.get("platform"), *(compatible or [])}
+
+
+def make_submission_ids() -> SubmissionIds:
+    return {
+        "commit_hashes": set(),
+        "hardware_ids": set(),
+        "issue_ids": set(),
+        "checkout_ids": set(),
+        "build_ids": set(),
+        "incident_test_ids": set(),
+    }
+
+
+def merge_submission_ids(ids: SubmissionIds, other: SubmissionIds) -> None:
+    for kind, id_set in other.items():
+        ids[kind].update(id_set)
+
+
+def collect_submission_ids(submissions: Iterable[dict[str, Any]]) -> SubmissionIds:
+    """
+    Ids that the cached queries depending on the submissions are tagged with, and
+    the ids of the rows needed to find the rest of them.
+    """
+    ids = make_submission_ids()
+    for data in submissions:
+        for checkout in data.get("checkouts") or []:
+            ids["checkout_ids"].add(checkout["id"])
+            ids["commit_hashes"].add(checkout.get("git_commit_hash"))
+            ids["commit_hashes"].update(checkout.get("git_commit_tags") or [])
+        for build in data.get("builds") or []:
+            ids["checkout_ids"].add(build.get("checkout_id"))
+        for test in data.get("tests") or []:
+            ids["build_ids"].add(test.get("build_id"))
+            ids["hardware_ids"].update(get_test_hardware(test))
+        for issue in data.get("issues") or []:
+            ids["issue_ids"].add(issue["id"])
+        for incident in data.get("incidents") or []:
+            ids["issue_ids"].add(incident.get("issue_id"))
+            ids["build_ids"].add(incident.get("build_id"))
+            ids["incident_test_ids"].add(incident.get("test_id"))
+
+    for id_set in ids.values():
+        id_set.discard(None)
+    return ids
+
+
+def query_related_ids(ids: SubmissionIds) -> None:
+    """
+    Adds the commit hashes and tags of the checkouts, builds and incident tests to
+    `ids`, and the hardware of the incident tests, from the rows already in the database.
+    """
+    query = """
+        SELECT checkouts.git_commit_hash, checkouts.git_commit_tags, NULL, NULL
+        FROM checkouts
+        WHERE checkouts.id = ANY(%(checkout_ids)s)
+        UNION
+        SELECT checkouts.git_commit_hash, checkouts.git_commit_tags, NULL, NULL
+        FROM builds
+        JOIN checkouts ON checkouts.id = builds.checkout_id
+        WHERE builds.id = ANY(%(build_ids)s)
+        UNION
+        SELECT
+            checkouts.git_commit_hash,
+            checkouts.git_commit_tags,
+            tests.environment_misc ->> 'platform',
+            tests.environment_compatible
+        FROM tests
+        JOIN builds ON builds.id = tests.build_id
+        JOIN checkouts ON checkouts.id = builds.checkout_id
+        WHERE tests.id = ANY(%(test_ids)s)
+    """
+    params = {
+        "checkout_ids": list(ids["checkout_ids"]),
+        "build_ids": list(ids["build_ids"]),
+        "test_ids": list(ids["incident_test_ids"]),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        for commit_hash, commit_tags, platform, compatible in cursor.fetchall():
+            ids["commit_hashes"].update({commit_hash, *(commit_tags or [])})
+            ids["hardware_ids"].update({platform, *(compatible or [])})
+
+    ids["commit_hashes"].discard(None)
+    ids["hardware_ids"].discard(None)
+
+
+def get_submission_cache_tags(ids: SubmissionIds) -> set[str]:
+    # Only the kinds that queries are tagged with, see docs/query_cache.md
+    if ids["checkout_ids"] or ids["build_ids"] or ids["incident_test_ids"]:
+        query_related_ids(ids)
+
+    return make_cache_tags(
+        commit_hash=ids["commit_hashes"],
+        hardware_id=ids["hardware_ids"],
+        issue_id=ids["issue_ids"],
+    )
+
+
+invalidation_queue: Queue[SubmissionIds] = Queue(maxsize=INVALIDATION_QUEUE_SIZE)
+invalidation_thread: Optional[threading.Thread] = None
+invalidation_thread_lock = threading.Lock()
+
+
+def get_queued_ids() -> SubmissionIds:
+    """Blocks for the next queued ids, merged with the ones queued after them."""
+    ids = invalidation_queue.get()
+    try:
+        while True:
+            merge_submission_ids(ids, invalidation_queue.get_nowait())
+    except Empty:
+        pass
+    return ids
+
+
+def invalidation_worker() -> None:
+    """
+    Invalidates the queued ids in the background, so that the database writers
+    never wait for Redis. The ids queued while an invalidation runs are invalidated
+    together in the next one.
+    """
+    while True:
+        ids = get_queued_ids()
+        try:
+            invalidated = invalidate_cache_tags(get_submission_cache_tags(ids))
+        except Exception as e:
+            logger.warning("Error invalidating the cache of the submissions: %s", e)
+            # The connection may be the one at fault, the next query opens a new one
+            connection.close()
+            continue
+        if invalidated:
+            logger.debug("Invalidated %d cache tags", invalidated)
+
+
+def start_invalidation_thread() -> None:
+    global invalidation_thread
+    with invalidation_thread_lock:
+        if invalidation_thread is None:
+            # Pending invalidations are dropped on exit, like the ones dropped
+            # when the queue is full
+            invalidation_thread = threading.Thread(
+                target=invalidation_worker, name="cache-invalidation", daemon=True
+            )
+            invalidation_thread.start()
+
+
+def invalidate_submission_caches(submissions: list[dict[str, Any]]) -> None:
+    """
+    Queues the invalidation of the cached queries that depend on the committed
+    submissions. It is best effort: the ingestion goes on without a cache, and the
+    entries expire anyway.
+    """
+    if not submissions:
+        return
+    start_invalidation_thread()
+    try:
+        invalidation_queue.put_nowait(collect_submission_ids(submissions))
+    except Full:
+        logger.warning("Cache invalidation queue is full, dropping an invalidation")
@@ -0,0 +1,212 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger("ingester")
+
+METRICS_PREFIX = "kcidb_ingest"
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+type Labels = tuple[tuple[str, str], ...]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.type = "counter"
+        self.lock = threading.Lock()
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation)
+        self.type = "gauge"
+        self.function = function
+
+    def set(self, value: float, **labels: str) -> None:
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        if self.function is not None:
+            yield self.name, (), self.function()
+            return
+        yield from super().samples()
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...]):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.type = "histogram"
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # Per label set: counts per bucket (plus +Inf), and the sum of observations
+        self.values: dict[Labels, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        with self.lock:
+            values = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self.values.items()
+            ]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", (*labels, ("le", str(bound))), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list[Counter | Gauge | Histogram] = []
+
+    def register[T: (Counter, Gauge, Histogram)](self, metric: T) -> T:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Only reachable from the host by default, a collector elsewhere needs --metrics-host
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+files_total = registry.register(
+    Counter("files_total", "Spool files processed, by result (ok, failed, empty, gone)")
+)
+rows_total = registry.register(
+    Counter(
+        "rows_total", "Rows written, by table and result (inserted, updated, rejected)"
+    )
+)
+stage_seconds = registry.register(
+    Histogram(
+        "stage_seconds",
+        "Time spent in each stage (parse, validate, log_excerpt, db_write, archive)",
+        LATENCY_BUCKETS,
+    )
+)
+queued_bytes = registry.register(
+    Gauge("queued_bytes", "Size of the files read and not yet committed")
+)
+db_writers = registry.register(Gauge("db_writers", "Database writer threads running"))
+db_writer_busy_seconds = registry.register(
+    Counter(
+        "db_writer_busy_seconds_total",
+        "Time the database writers spent writing, divide its rate by db_writers"
+        + " for their utilization",
+    )
+)
+log_excerpt_cache_total = registry.register(
+    Counter(
+        "log_excerpt_cache_total", "Log excerpt cache lookups, by result (hit, miss)"
+    )
+)
+
+
+def register_queue_depth(function: Callable[[], float]) -> None:
+    registry.register(
+        Gauge("queue_depth", "Items waiting in the database queue", function)
+    )
+
+
+@contextmanager
+def time_stage(timings: dict[str, float], stage: str) -> Iterator[None]:
+    """Adds the time spent in the block to `timings[stage]`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+
+
+def observe_prepare(timings: dict[str, float], cache_stats: dict[str, int]) -> None:
+    """Records the stage timings and cache lookups of a prepared file."""
+    for stage, seconds in timings.items():
+        stage_seconds.observe(seconds, stage=stage)
+    for result, count in cache_stats.items():
+        log_excerpt_cache_total.inc(count, result=result)
+
+
+def write_metrics_file(path: str) -> None:
+    """Writes the metrics atomically, so a collector never reads a partial file."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(registry.render())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error("Error writing metrics to %s: %s", path, e)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802 (name required by BaseHTTPRequestHandler)
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+def start_metrics_server(
+    port: int, host: str = DEFAULT_METRICS_HOST
+) -> ThreadingHTTPServer:
+    """Serves the metrics on http://<host>:<port>/ from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
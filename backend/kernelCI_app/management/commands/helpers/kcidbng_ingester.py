@@ -1,30 +1,65 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import gzip
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+import functools
 import hashlib
 import json
 import logging
+import multiprocessing
 import os
 from queue import Queue, Empty
-import requests
-import tempfile
 import threading
 import time
 import traceback
-from typing import Any, Literal, Optional
+from typing import Any, Callable, Literal, Optional, TypedDict
 import yaml
 import kcidb_io
+from django.conf import settings
+from django.db import connection, transaction
 
+from kernelCI_app.management.commands.helpers import ingestion_metrics as metrics
+from kernelCI_app.management.commands.helpers.cache_invalidation import (
+    invalidate_submission_caches,
+)
+from kernelCI_app.management.commands.helpers.log_excerpt_store import (
+    LogExcerptStore,
+    LogExcerptUploader,
+)
+from kernelCI_app.management.commands.helpers.prepare_process import (
+    init_prepare_process,
+)
 from kernelCI_app.management.commands.helpers.process_submissions import (
+    filter_submission_data,
     insert_submission_data,
 )
+from kernelCI_app.management.commands.helpers.spool_watcher import list_spool_files
+from kernelCI_app.management.commands.helpers.submission_stream import (
+    StreamingNotSupportedError,
+    iter_submission_chunks,
+    scan_submission,
+)
 
 VERBOSE = 0
 LOGEXCERPT_THRESHOLD = 256  # 256 bytes threshold for logexcerpt
 CONVERT_LOG_EXCERPT = False  # If True, convert log_excerpt to output_files url
 
-CACHE_LOGS = {}
+# Chunks of a streamed file that can be waiting for/being written at the same time
+STREAM_PENDING_CHUNKS = 2
+
+# Default limit for the submissions read and not yet committed, in bytes of json
+QUEUE_BUDGET_SIZE = 512 * 1024 * 1024
+
+# Small submissions queued together are written in a single transaction, up to
+# this many rows, waiting at most MICRO_BATCH_DELAY seconds for more to arrive
+MICRO_BATCH_ROWS = 5000
+MICRO_BATCH_DELAY = 0.05
+
 CACHE_LOGS_SIZE_LIMIT = 100000  # Arbitrary limit for cache_logs size, adjust as needed
-cache_logs_lock = threading.Lock()
+CACHE_LOGS_FILE = os.environ.get("LOG_EXCERPT_CACHE_FILE")
+LOG_EXCERPT_UPLOAD_WORKERS = int(os.environ.get("LOG_EXCERPT_UPLOAD_WORKERS", 8))
 
 STORAGE_TOKEN = os.environ.get("STORAGE_TOKEN", None)
 STORAGE_BASE_URL = os.environ.get(
@@ -35,9 +70,46 @@ TREES_FILE = "/app/trees.yaml"
 
 logger = logging.getLogger("ingester")
 
-# Thread-safe queue for database operations
+# Thread-safe queue for database operations, consumed by the db_worker threads.
+# Its size is bounded by the QueueBudget of the producers.
 db_queue = Queue()
-db_lock = threading.Lock()
+metrics.register_queue_depth(db_queue.qsize)
+
+
+class QueueBudget:
+    """
+    Bounds the size of the submissions held in memory between being read and being
+    committed to the database, so that a slow database makes the file producers
+    wait instead of piling up parsed submissions.
+
+    Sizes are the bytes the submissions take in their json files, which is known
+    before the file is read.
+    """
+
+    def __init__(self, capacity: Optional[int] = QUEUE_BUDGET_SIZE):
+        self.capacity = capacity
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def _fits(self, size: int) -> bool:
+        # An item larger than the whole budget is let through alone instead of
+        # blocking forever
+        return (
+            self.capacity is None or self.used == 0 or self.used + size <= self.capacity
+        )
+
+    def acquire(self, size: int) -> None:
+        """Blocks until `size` bytes fit in the budget."""
+        with self.condition:
+            self.condition.wait_for(lambda: self._fits(size))
+            self.used += size
+        metrics.queued_bytes.inc(size)
+
+    def release(self, size: int) -> None:
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+        metrics.queued_bytes.inc(-size)
 
 
 def move_file_to_failed_dir(filename, failed_dir):
@@ -80,56 +152,47 @@ def standardize_trees_name(input_data: dict[str, Any], trees_name):
     return input_data
 
 
-def upload_logexcerpt(logexcerpt, id):
-    """
-    Upload logexcerpt to storage and return a reference(URL)
-    """
-    upload_url = f"{STORAGE_BASE_URL}/upload"
-    if VERBOSE:
-        logger.info("Uploading logexcerpt for %s to %s", id, upload_url)
-    # make temporary file with logexcerpt data
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".logexcerpt") as temp_file:
-        logexcerpt_filename = temp_file.name
-        logexcerpt_compressed = gzip.compress(logexcerpt.encode("utf-8"))
-        temp_file.write(logexcerpt_compressed)
-        temp_file.flush()
-    with open(logexcerpt_filename, "rb") as f:
-        hdr = {
-            "Authorization": f"Bearer {STORAGE_TOKEN}",
-        }
-        files = {"file0": ("logexcerpt.txt.gz", f), "path": f"logexcerpt/{id}"}
-        try:
-            r = requests.post(upload_url, headers=hdr, files=files)
-        except Exception as e:
-            logger.error("Error uploading logexcerpt for %s: %s", id, e)
-            os.remove(logexcerpt_filename)
-            return logexcerpt  # Return original logexcerpt if upload fails
-    os.remove(logexcerpt_filename)
-    if r.status_code != 200:
-        logger.error(
-            "Failed to upload logexcerpt for %s: %d : %s", id, r.status_code, r.text
-        )
-        return logexcerpt  # Return original logexcerpt if upload fails
+# Created on first use, so that each prepare process opens its own
+_log_excerpt_store: Optional[LogExcerptStore] = None
+_log_excerpt_uploader: Optional[LogExcerptUploader] = None
+log_excerpt_lock = threading.Lock()
+
+
+def get_log_excerpt_store() -> LogExcerptStore:
+    global _log_excerpt_store
+    with log_excerpt_lock:
+        if _log_excerpt_store is None:
+            path = CACHE_LOGS_FILE or os.path.join(
+                settings.BACKEND_VOLUME_DIR, "log_excerpts.sqlite3"
+            )
+            _log_excerpt_store = LogExcerptStore(path, CACHE_LOGS_SIZE_LIMIT)
+        return _log_excerpt_store
+
 
-    return f"{STORAGE_BASE_URL}/logexcerpt/{id}/logexcerpt.txt.gz"
+def get_log_excerpt_uploader() -> LogExcerptUploader:
+    global _log_excerpt_uploader
+    with log_excerpt_lock:
+        if _log_excerpt_uploader is None:
+            _log_excerpt_uploader = LogExcerptUploader(
+                STORAGE_BASE_URL, STORAGE_TOKEN, LOG_EXCERPT_UPLOAD_WORKERS
+            )
+        return _log_excerpt_uploader
 
 
 def get_from_cache(log_hash):
     """
     Check if log_hash is in the cache
     """
-    with cache_logs_lock:
-        return CACHE_LOGS.get(log_hash)
+    return get_log_excerpt_store().get(log_hash)
 
 
 def set_in_cache(log_hash, url):
     """
     Set log_hash in the cache with the given URL
     """
-    with cache_logs_lock:
-        CACHE_LOGS[log_hash] = url
-        if VERBOSE:
-            logger.info("Cached log excerpt with hash %s at %s", log_hash, url)
+    get_log_excerpt_store().set(log_hash, url)
+    if VERBOSE:
+        logger.info("Cached log excerpt with hash %s at %s", log_hash, url)
 
 
 def set_log_excerpt_ofile(item: dict[str, Any], url):
@@ -152,45 +215,55 @@ def set_log_excerpt_ofile(item: dict[str, Any], url):
 
 
 def process_log_excerpt_from_item(
-    item: dict[str, Any], item_type: Literal["build", "test"]
-) -> None:
+    item: dict[str, Any],
+    item_type: Literal["build", "test"],
+    cache_stats: dict[str, int],
+) -> Optional[tuple[str, Future]]:
     """
     Process log_excerpt from a single build or test (item).
-    If log_excerpt is large, upload it to storage and replace with a reference.
+    If log_excerpt is large and was already uploaded, replaces it with a reference.
+    Otherwise, returns its hash and the future of its upload.
     """
     id = item.get("id", "unknown")
     log_excerpt = item["log_excerpt"]
 
-    if isinstance(log_excerpt, str) and len(log_excerpt) > LOGEXCERPT_THRESHOLD:
-        log_hash = hashlib.sha256(log_excerpt.encode("utf-8")).hexdigest()
+    if not isinstance(log_excerpt, str) or len(log_excerpt) <= LOGEXCERPT_THRESHOLD:
+        return None
+
+    log_hash = hashlib.sha256(log_excerpt.encode("utf-8")).hexdigest()
+    # check if log_excerpt already uploaded (by hash as key)
+    cached_url = get_from_cache(log_hash)
+    cache_result = "hit" if cached_url else "miss"
+    cache_stats[cache_result] = cache_stats.get(cache_result, 0) + 1
+    if cached_url:
         if VERBOSE:
             logger.info(
-                "Uploading log_excerpt for %s id %s hash %s with size %d bytes",
+                "Log excerpt for %s %s already uploaded, using cached URL",
                 item_type,
                 id,
-                log_hash,
-                len(log_excerpt),
             )
-        # check if log_excerpt already uploaded (by hash as key)
-        cached_url = get_from_cache(log_hash)
-        if cached_url:
-            if VERBOSE:
-                logger.info(
-                    "Log excerpt for %s %s already uploaded, using cached URL",
-                    item_type,
-                    id,
-                )
-            set_log_excerpt_ofile(item, cached_url)
-        else:
-            cached_url = upload_logexcerpt(log_excerpt, log_hash)
-            set_in_cache(log_hash, cached_url)
-            set_log_excerpt_ofile(item, cached_url)
+        set_log_excerpt_ofile(item, cached_url)
+        return None
 
+    if VERBOSE:
+        logger.info(
+            "Uploading log_excerpt for %s id %s hash %s with size %d bytes",
+            item_type,
+            id,
+            log_hash,
+            len(log_excerpt),
+        )
+    return log_hash, get_log_excerpt_uploader().submit(log_excerpt, log_hash)
 
-def extract_log_excerpt(input_data: dict[str, Any]) -> dict[str, Any]:
+
+def extract_log_excerpt(
+    input_data: dict[str, Any], cache_stats: Optional[dict[str, int]] = None
+) -> dict[str, Any]:
     """
     Extract log_excerpt from builds and tests, if it is large,
     upload to storage and replace with a reference.
+    Uploads run concurrently, items whose upload fails keep their log_excerpt.
+    The cache hits and misses are counted in `cache_stats`, if given.
 
     Returns:
         input_data: dict with log_excerpt replaced by URL if it was large
@@ -199,16 +272,25 @@ def extract_log_excerpt(input_data: dict[str, Any]) -> dict[str, Any]:
         logger.warning("STORAGE_TOKEN is not set, log_excerpts will not be uploaded")
         return input_data
 
-    builds: list[dict[str, Any]] = input_data.get("builds", [])
-    tests: list[dict[str, Any]] = input_data.get("tests", [])
-
-    for build in builds:
-        if build.get("log_excerpt"):
-            process_log_excerpt_from_item(item=build, item_type="build")
+    if cache_stats is None:
+        cache_stats = {}
+    uploads: list[tuple[dict[str, Any], str, Future]] = []
+    for item_type, items in (("build", "builds"), ("test", "tests")):
+        for item in input_data.get(items, []):
+            if not item.get("log_excerpt"):
+                continue
+            upload = process_log_excerpt_from_item(
+                item=item, item_type=item_type, cache_stats=cache_stats
+            )
+            if upload is not None:
+                uploads.append((item, *upload))
 
-    for test in tests:
-        if test.get("log_excerpt"):
-            process_log_excerpt_from_item(item=test, item_type="test")
+    for item, log_hash, upload in uploads:
+        url = upload.result()
+        if url is None:
+            continue
+        set_in_cache(log_hash, url)
+        set_log_excerpt_ofile(item, url)
 
     return input_data
 
@@ -231,16 +313,22 @@ def prepare_file_data(filename, trees_name, spool_dir):
     if VERBOSE:
         logger.info("Processing file %s, size: %d", filename, fsize)
 
+    # Returned with the metadata, since this can run in another process
+    timings: dict[str, float] = {}
+    cache_stats: dict[str, int] = {}
     try:
-        with open(full_filename, "r") as f:
-            data = json.loads(f.read())
+        with metrics.time_stage(timings, "parse"):
+            with open(full_filename, "r") as f:
+                data = json.loads(f.read())
 
         # These operations can be done in parallel (especially extract_log_excerpt)
         if CONVERT_LOG_EXCERPT:
-            data = extract_log_excerpt(data)
-        data = standardize_trees_name(data, trees_name)
-        kcidb_io.schema.V5_3.validate(data)
-        kcidb_io.schema.V5_3.upgrade(data)
+            with metrics.time_stage(timings, "log_excerpt"):
+                data = extract_log_excerpt(data, cache_stats)
+        with metrics.time_stage(timings, "validate"):
+            data = standardize_trees_name(data, trees_name)
+            kcidb_io.schema.V5_3.validate(data)
+            kcidb_io.schema.V5_3.upgrade(data)
 
         processing_time = time.time() - start_time
         return data, {
@@ -248,6 +336,8 @@ def prepare_file_data(filename, trees_name, spool_dir):
             "full_filename": full_filename,
             "fsize": fsize,
             "processing_time": processing_time,
+            "timings": timings,
+            "log_excerpt_cache": cache_stats,
         }
     except Exception as e:
         logger.error("Error preparing data from %s: %s", filename, e)
@@ -259,9 +349,50 @@ def prepare_file_data(filename, trees_name, spool_dir):
         }
 
 
+def prepare_file_rows(filename, trees_name, spool_dir):
+    """
+    Process pool version of `prepare_file_data`. Also filters the rows, so only
+    the fields written to the database are sent back to the writers.
+    """
+    data, metadata = prepare_file_data(filename, trees_name, spool_dir)
+    if data is not None:
+        data = filter_submission_data(data)
+        metadata["filtered"] = True
+    return data, metadata
+
+
+def get_prepare_options() -> dict[str, Any]:
+    """Module options that the commands may change at runtime."""
+    return {
+        "VERBOSE": VERBOSE,
+        "CONVERT_LOG_EXCERPT": CONVERT_LOG_EXCERPT,
+        "TREES_FILE": TREES_FILE,
+    }
+
+
+def create_prepare_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Creates a pool of processes for the CPU-bound part of the ingestion (decoding,
+    validation, tree names and log excerpt hashing), so it isn't limited by the GIL.
+
+    Processes are spawned rather than forked, since forking a process with running
+    threads (e.g. the database writers) can leave locks held in the child. Spawned
+    processes import this module anew, so the options set by the command until now
+    are passed to them. The log excerpt index is the same SQLite file in all of them.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_prepare_process,
+        initargs=(get_prepare_options(),),
+    )
+
+
 def process_submission_item(data: dict[str, Any], metadata: dict[str, Any]):
-    with db_lock:
-        insert_submission_data(data, metadata)
+    table_counts = insert_submission_data(data, metadata)
+    for table, counts in table_counts.items():
+        for result, count in counts.items():
+            metrics.rows_total.inc(count, table=table, result=result)
 
     if VERBOSE and "processing_time" in metadata:
         ing_speed = metadata["fsize"] / metadata["processing_time"] / 1024
@@ -271,33 +402,167 @@ def process_submission_item(data: dict[str, Any], metadata: dict[str, Any]):
 def db_worker(stop_event: threading.Event):
     """
     Worker thread that processes the database queue.
-    This is the only thread that interacts with the database.
+    These are the only threads that interact with the database. Each one uses its
+    own database connection, so independent submissions are committed concurrently.
 
     Args:
         stop_event: threading.Event (flag) to signal the worker to stop processing
     """
 
+    metrics.db_writers.inc()
+    try:
+        consume_db_queue(stop_event)
+    finally:
+        metrics.db_writers.inc(-1)
+        # Django opens one connection per thread, close it before the thread exits
+        connection.close()
+
+
+def count_submission_rows(data: Optional[dict[str, Any]]) -> int:
+    if not data:
+        return 0
+    return sum(len(items) for items in data.values() if isinstance(items, list))
+
+
+def merge_submissions(items: list[tuple[Any, dict[str, Any]]]) -> dict[str, list]:
+    """
+    Merges the data of several queue items into a single filtered submission.
+    Rows with the same id are deduplicated by insert_items, keeping the one from
+    the latest item, as if they had been written one after the other.
+    """
+    merged: dict[str, list] = {}
+    for data, metadata in items:
+        if data is None:
+            continue
+        if not metadata.get("filtered", False):
+            data = filter_submission_data(data)
+        for table, rows in data.items():
+            merged.setdefault(table, []).extend(rows)
+    return merged
+
+
+def write_submissions(items: list[tuple[Any, dict[str, Any]]]) -> Optional[Exception]:
+    """
+    Writes the data of the queue items, in a single transaction if there are
+    several of them. Returns the error if they couldn't be written.
+    """
+    try:
+        if len(items) == 1:
+            data, metadata = items[0]
+            if data is not None:
+                process_submission_item(data, metadata)
+            return None
+
+        with transaction.atomic():
+            process_submission_item(
+                merge_submissions(items),
+                {"filename": f"batch of {len(items)} files", "filtered": True},
+            )
+        return None
+    except Exception as e:
+        return e
+
+
+def complete_queue_item(metadata: dict[str, Any], error: Optional[Exception]) -> None:
+    """
+    Reports the result of a queue item to its `committed` future, so that its file
+    is only archived once the data is in the database.
+    """
+    if error is not None:
+        logger.error(
+            "Error processing %s in db_worker: %s", metadata.get("filename"), error
+        )
+    elif VERBOSE:
+        logger.info(
+            "Processed file %s with size %s bytes",
+            metadata["filename"],
+            metadata["fsize"],
+        )
+
+    if committed := metadata.get("committed"):
+        if error is None:
+            committed.set_result(None)
+        else:
+            committed.set_exception(error)
+    # Lets the producer of streamed chunks read the next one
+    if release := metadata.get("release"):
+        release()
+
+
+def write_queue_items(items: list[tuple[Any, dict[str, Any]]]) -> None:
+    """
+    Writes a micro-batch of queue items in a single transaction. If the batch fails,
+    its items are written one by one, so only the files at fault are rejected.
+    The cached queries that depend on the committed items are then queued for
+    invalidation, which runs in the background.
+    """
+    start_time = time.perf_counter()
+    errors: list[Optional[Exception]] = [None] * len(items)
+    try:
+        error = write_submissions(items)
+        if error is not None and len(items) > 1:
+            logger.warning(
+                "Error writing a batch of %d submissions, writing them one by one: %s",
+                len(items),
+                error,
+            )
+            errors = [write_submissions([item]) for item in items]
+        elif error is not None:
+            errors = [error]
+    finally:
+        elapsed = time.perf_counter() - start_time
+        metrics.stage_seconds.observe(elapsed, stage="db_write")
+        metrics.db_writer_busy_seconds.inc(elapsed)
+        for (_, metadata), item_error in zip(items, errors):
+            complete_queue_item(metadata, item_error)
+
+    invalidate_submission_caches(
+        [
+            data
+            for (data, _), item_error in zip(items, errors)
+            if data is not None and item_error is None
+        ]
+    )
+
+
+def get_queue_batch(first_item) -> tuple[list[tuple[Any, dict[str, Any]]], bool]:
+    """
+    Collects the items queued after `first_item` until the batch reaches
+    MICRO_BATCH_ROWS rows or MICRO_BATCH_DELAY seconds pass.
+
+    Returns the batch and whether a poison pill was found (already marked as done).
+    """
+    batch = [first_item]
+    rows = count_submission_rows(first_item[0])
+    deadline = time.monotonic() + MICRO_BATCH_DELAY
+    while rows < MICRO_BATCH_ROWS:
+        try:
+            item = db_queue.get(timeout=max(deadline - time.monotonic(), 0))
+        except Empty:
+            break
+        if item is None:
+            db_queue.task_done()
+            return batch, True
+        batch.append(item)
+        rows += count_submission_rows(item[0])
+    return batch, False
+
+
+def consume_db_queue(stop_event: threading.Event):
     while not stop_event.is_set() or not db_queue.empty():
         try:
             item = db_queue.get(timeout=0.1)
             if item is None:
                 db_queue.task_done()  # Important: mark the poison pill as done
                 break
+            batch, stop = get_queue_batch(item)
             try:
-                data, metadata = item
-                if data is not None:
-                    process_submission_item(data, metadata)
-                if VERBOSE:
-                    logger.info(
-                        "Processed file %s with size %s bytes",
-                        metadata["filename"],
-                        metadata["fsize"],
-                    )
-
-            except Exception as e:
-                logger.error("Error processing item in db_worker: %s", e)
+                write_queue_items(batch)
             finally:
-                db_queue.task_done()  # Always mark task as done, even if processing failed
+                for _ in batch:
+                    db_queue.task_done()  # Always mark task as done, even if processing failed
+            if stop:
+                break
 
         except Empty:
             continue  # Timeout occurred, continue to check stop_event
@@ -305,33 +570,201 @@ def db_worker(stop_event: threading.Event):
             logger.error("Unexpected error in db_worker: %s", e)
 
 
-def process_file(filename, trees_name, spool_dir):
+def wait_for_stream_chunks(stream_slots: threading.BoundedSemaphore) -> None:
+    """Blocks until every queued chunk of a streamed file has been written."""
+    for _ in range(STREAM_PENDING_CHUNKS):
+        stream_slots.acquire()
+    for _ in range(STREAM_PENDING_CHUNKS):
+        stream_slots.release()
+
+
+def queue_file_chunks(
+    filename, full_filename, fsize, trees_name, budget: QueueBudget
+) -> None:
+    """
+    Queues the chunks of a file for the database and waits until all of them are
+    written. Raises the error of the first chunk that couldn't be written.
+    """
+    timings: dict[str, float] = {}
+    cache_stats: dict[str, int] = {}
+    # Parsing and validation are done together when streaming
+    with metrics.time_stage(timings, "validate"):
+        table_offsets = scan_submission(full_filename)
+    stream_slots = threading.BoundedSemaphore(STREAM_PENDING_CHUNKS)
+    chunk_commits: list[Future] = []
+
+    def release_chunk(chunk_size: int) -> None:
+        budget.release(chunk_size)
+        stream_slots.release()
+
+    current_table = None
+    chunks = iter_submission_chunks(full_filename, table_offsets)
+    for chunk_index, (table, rows, chunk_size) in enumerate(chunks):
+        # Keeps the dependency order between tables
+        if table != current_table:
+            wait_for_stream_chunks(stream_slots)
+            current_table = table
+
+        chunk_data = {table: rows}
+        if CONVERT_LOG_EXCERPT:
+            with metrics.time_stage(timings, "log_excerpt"):
+                chunk_data = extract_log_excerpt(chunk_data, cache_stats)
+        chunk_data = standardize_trees_name(chunk_data, trees_name)
+
+        stream_slots.acquire()
+        budget.acquire(chunk_size)
+        committed = Future()
+        chunk_commits.append(committed)
+        db_queue.put(
+            (
+                chunk_data,
+                {
+                    "filename": filename,
+                    "full_filename": full_filename,
+                    "fsize": fsize,
+                    "chunk": chunk_index,
+                    "committed": committed,
+                    "release": functools.partial(release_chunk, chunk_size),
+                },
+            )
+        )
+
+    metrics.observe_prepare(timings, cache_stats)
+    wait_for_stream_chunks(stream_slots)
+    for committed in chunk_commits:
+        committed.result()
+
+
+def stream_file(filename, trees_name, spool_dir, budget: QueueBudget) -> bool:
     """
-    Process a single file in a thread, then queue it for database insertion.
+    Streaming version of `process_file` for large files. The file is validated in
+    a first pass and then read again, queueing chunks of rows for the database so
+    that memory usage depends on the chunk size instead of the file size.
+    The file is archived once every chunk is committed.
+
+    Each chunk is committed in its own transaction: if a chunk fails, the chunks
+    committed before it stay in the database and the file is moved to the failed
+    directory. Retrying it re-ingests the whole file, whose rows are upserted, so
+    the rows already written are only updated again.
+
+    Raises:
+        StreamingNotSupportedError: if the file must be processed as a whole.
     """
+    full_filename = os.path.join(spool_dir, filename)
     failed_dir = os.path.join(spool_dir, "failed")
     archive_dir = os.path.join(spool_dir, "archive")
+    fsize = os.path.getsize(full_filename)
 
-    data, metadata = prepare_file_data(filename, trees_name, spool_dir)
+    if VERBOSE:
+        logger.info("Streaming file %s, size: %d", filename, fsize)
 
-    if "error" in metadata:
+    try:
+        queue_file_chunks(filename, full_filename, fsize, trees_name, budget)
+    except StreamingNotSupportedError:
+        raise
+    except Exception as e:
+        logger.error("Error streaming data from %s: %s", filename, e)
+        logger.error(traceback.format_exc())
         try:
-            move_file_to_failed_dir(metadata["full_filename"], failed_dir)
+            move_file_to_failed_dir(full_filename, failed_dir)
         except Exception:
             pass
         return False
 
-    if data is None:
-        # Empty file, already deleted
-        return True
+    try:
+        os.rename(full_filename, os.path.join(archive_dir, filename))
+    except Exception as e:
+        logger.error("Error archiving file %s: %s", filename, e)
+        return False
+
+    return True
+
+
+def prepare_file(
+    filename, trees_name, spool_dir, prepare_pool: Optional[ProcessPoolExecutor]
+):
+    """Prepares a file in this thread, or in the process pool if given."""
+    if prepare_pool is None:
+        return prepare_file_data(filename, trees_name, spool_dir)
 
-    db_queue.put((data, metadata))
+    future = prepare_pool.submit(prepare_file_rows, filename, trees_name, spool_dir)
+    return future.result()
 
-    # Archive the file after queuing (we can do this optimistically)
+
+def write_file(
+    filename,
+    trees_name,
+    spool_dir,
+    prepare_pool: Optional[ProcessPoolExecutor],
+    budget: QueueBudget,
+    on_done: Callable[[Optional[dict[str, Any]]], None],
+) -> None:
+    """
+    Prepares a whole file and queues its data for the database, without waiting for
+    it to be written. `on_done` is called with its metadata once it is committed,
+    with an "error" if it failed, or with None if the file was empty.
+    """
+    full_filename = os.path.join(spool_dir, filename)
+    fsize = os.path.getsize(full_filename)
+
+    # Reserved before reading the file, so files waiting for the database stay on disk.
+    # The database writer releases it once the data is committed
+    budget.acquire(fsize)
     try:
-        os.rename(
-            metadata["full_filename"], os.path.join(archive_dir, metadata["filename"])
+        data, metadata = prepare_file(filename, trees_name, spool_dir, prepare_pool)
+        if metadata is None or "error" in metadata:
+            budget.release(fsize)
+            on_done(metadata)
+            return
+        metrics.observe_prepare(metadata["timings"], metadata["log_excerpt_cache"])
+    except FileNotFoundError:
+        budget.release(fsize)
+        raise
+    except Exception as e:
+        budget.release(fsize)
+        logger.error("Error writing data from %s: %s", filename, e)
+        on_done({"filename": filename, "full_filename": full_filename, "error": str(e)})
+        return
+
+    def on_committed(committed: Future) -> None:
+        if error := committed.exception():
+            on_done({**metadata, "error": str(error)})
+        else:
+            on_done(metadata)
+
+    committed = Future()
+    committed.add_done_callback(on_committed)
+    db_queue.put(
+        (
+            data,
+            {
+                **metadata,
+                "committed": committed,
+                "release": functools.partial(budget.release, fsize),
+            },
         )
+    )
+
+
+def finish_file(metadata: dict[str, Any], spool_dir: str) -> bool:
+    """Moves a processed file to the archive, or to the failed directory on error."""
+    if "error" in metadata:
+        try:
+            move_file_to_failed_dir(
+                metadata["full_filename"], os.path.join(spool_dir, "failed")
+            )
+        except Exception:
+            pass
+        return False
+
+    try:
+        timings: dict[str, float] = {}
+        with metrics.time_stage(timings, "archive"):
+            os.rename(
+                metadata["full_filename"],
+                os.path.join(spool_dir, "archive", metadata["filename"]),
+            )
+        metrics.observe_prepare(timings, {})
     except Exception as e:
         logger.error("Error archiving file %s: %s", metadata["filename"], e)
         return False
@@ -339,75 +772,324 @@ def process_file(filename, trees_name, spool_dir):
     return True
 
 
+type FileResult = Literal["ok", "failed", "empty", "gone"]
+
+
+def start_file(
+    filename,
+    trees_name,
+    spool_dir,
+    stream_threshold=None,
+    prepare_pool: Optional[ProcessPoolExecutor] = None,
+    budget: Optional[QueueBudget] = None,
+) -> Future:
+    """
+    Prepares a single file in this thread and queues it for database insertion,
+    returning as soon as it is queued so that the caller can take the next file.
+    The file is archived once its data is committed, or moved to the failed
+    directory if it can't be prepared or written.
+    Files larger than `stream_threshold` bytes are streamed in chunks, which only
+    returns once every chunk is committed.
+
+    Returns a future set to whether the file was ingested, once it is archived.
+    """
+    if budget is None:
+        budget = QueueBudget(capacity=None)
+    done = Future()
+
+    def on_result(result: FileResult) -> None:
+        metrics.files_total.inc(result=result)
+        done.set_result(result != "failed")
+
+    try:
+        ingest_file(
+            filename,
+            trees_name,
+            spool_dir,
+            stream_threshold,
+            prepare_pool,
+            budget,
+            on_result,
+        )
+    except FileNotFoundError:
+        # The same file can be reported twice, e.g. by the initial listing and by
+        # an event, and the second time it has already been archived
+        logger.debug("File %s is no longer in the spool, skipping", filename)
+        on_result("gone")
+    return done
+
+
+def process_file(*args, **kwargs) -> bool:
+    """Blocking version of `start_file`, returns once the file is archived."""
+    return start_file(*args, **kwargs).result()
+
+
+def ingest_file(
+    filename,
+    trees_name,
+    spool_dir,
+    stream_threshold: Optional[int],
+    prepare_pool: Optional[ProcessPoolExecutor],
+    budget: QueueBudget,
+    on_result: Callable[[FileResult], None],
+) -> None:
+    full_filename = os.path.join(spool_dir, filename)
+    if (
+        stream_threshold is not None
+        and os.path.getsize(full_filename) > stream_threshold
+    ):
+        try:
+            ingested = stream_file(filename, trees_name, spool_dir, budget)
+            on_result("ok" if ingested else "failed")
+            return
+        except StreamingNotSupportedError as e:
+            logger.warning("Can't stream %s, loading it whole: %s", filename, e)
+
+    def on_done(metadata: Optional[dict[str, Any]]) -> None:
+        # Called from the database writer once the file is committed
+        if metadata is None:
+            # Empty file, already deleted
+            on_result("empty")
+        else:
+            on_result("ok" if finish_file(metadata, spool_dir) else "failed")
+
+    write_file(filename, trees_name, spool_dir, prepare_pool, budget, on_done)
+
+
+class IngestionSummary(TypedDict):
+    succeeded: int
+    failed: int
+    file_seconds: list[float]
+    """Time each file took, from the start of its processing until it was archived"""
+
+
+def timed_start_file(*args) -> Future:
+    """`start_file`, with a future set to the result and the time the file took."""
+    start_time = time.perf_counter()
+    timed = Future()
+
+    def on_done(done: Future) -> None:
+        timed.set_result((done.result(), time.perf_counter() - start_time))
+
+    start_file(*args).add_done_callback(on_done)
+    return timed
+
+
 def ingest_submissions_parallel(
-    spool_dir: str, trees_name: dict[str, str], max_workers: int = 5
-):
+    spool_dir: str,
+    trees_name: dict[str, str],
+    max_workers: int = 5,
+    db_writers: int = 1,
+    stream_threshold: Optional[int] = None,
+    prepare_pool: Optional[ProcessPoolExecutor] = None,
+    queue_budget_size: Optional[int] = QUEUE_BUDGET_SIZE,
+) -> IngestionSummary:
     """
     Ingest submissions in parallel using ThreadPoolExecutor for I/O operations
-    and a single database worker thread.
+    and a pool of `db_writers` database worker threads.
+    Files larger than `stream_threshold` bytes are streamed in chunks.
+    If `prepare_pool` is given, files are prepared in it instead of in the threads.
+    At most `queue_budget_size` bytes of files are read and not yet committed.
     """
+    summary: IngestionSummary = {"succeeded": 0, "failed": 0, "file_seconds": []}
 
     # Get list of JSON files to process
-    json_files = [
-        f
-        for f in os.listdir(spool_dir)
-        if os.path.isfile(os.path.join(spool_dir, f)) and f.endswith(".json")
-    ]
+    json_files = list_spool_files(spool_dir)
     if not json_files:
-        return
+        return summary
 
     logger.info("Found %d files to process", len(json_files))
 
-    # Start database worker thread
-    # This thread will constantly consume the db_queue and send data to the database
+    # Start database worker threads
+    # These threads will constantly consume the db_queue and send data to the database
     stop_event = threading.Event()
-    db_thread = threading.Thread(target=db_worker, args=(stop_event,))
-    db_thread.start()
+    db_threads = [
+        threading.Thread(target=db_worker, args=(stop_event,))
+        for _ in range(db_writers)
+    ]
+    for db_thread in db_threads:
+        db_thread.start()
 
-    stat_ok = 0
-    stat_fail = 0
+    budget = QueueBudget(queue_budget_size)
 
     try:
-        # Process files in parallel
+        # Process files in parallel. The workers take the next file as soon as
+        # the previous one is queued, so the writers can batch the queued files
+        file_futures: dict[Future, str] = {}
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submit all files for processing
             future_to_file = {
-                executor.submit(process_file, filename, trees_name, spool_dir): filename
+                executor.submit(
+                    timed_start_file,
+                    filename,
+                    trees_name,
+                    spool_dir,
+                    stream_threshold,
+                    prepare_pool,
+                    budget,
+                ): filename
                 for filename in json_files
             }
 
-            # Collect results
             for future in as_completed(future_to_file):
                 filename = future_to_file[future]
                 try:
-                    result = future.result()
-                    if result:
-                        stat_ok += 1
-                    else:
-                        stat_fail += 1
+                    file_futures[future.result()] = filename
                 except Exception as e:
                     logger.error("Exception processing %s: %s", filename, e)
-                    stat_fail += 1
+                    summary["failed"] += 1
+
+        # Collect results, once the files are committed and archived
+        for future in as_completed(file_futures):
+            result, file_seconds = future.result()
+            summary["succeeded" if result else "failed"] += 1
+            summary["file_seconds"].append(file_seconds)
 
         # Wait for all database operations to complete
         db_queue.join()
 
     finally:
-        # Signal database worker to stop
+        # Signal database workers to stop
         stop_event.set()
-        db_queue.put(None)  # Poison pill
-        db_thread.join()
+        for _ in db_threads:
+            db_queue.put(None)  # Poison pill, one per worker
+        for db_thread in db_threads:
+            db_thread.join()
 
-    if stat_ok + stat_fail > 0:
+    processed = summary["succeeded"] + summary["failed"]
+    if processed > 0:
         logger.info(
             "Processed %d files: %d succeeded, %d failed",
-            stat_ok + stat_fail,
-            stat_ok,
-            stat_fail,
+            processed,
+            summary["succeeded"],
+            summary["failed"],
         )
     else:
         logger.info("No files processed, nothing to do")
 
+    return summary
+
+
+class PipelineStats(TypedDict):
+    waiting: int
+    """Files claimed by the pipeline whose preparation hasn't started yet"""
+    in_flight: int
+    """Files being prepared, queued for the database or being written"""
+    queued_bytes: int
+    """Size of the files read and not yet committed"""
+
+
+class IngestionPipeline:
+    """
+    Long-lived version of `ingest_submissions_parallel`: the prepare workers and
+    database writers stay alive and files are fed one by one as they show up,
+    instead of being collected and processed in lumps.
+    """
+
+    def __init__(
+        self,
+        spool_dir: str,
+        trees_name: dict[str, str],
+        max_workers: int = 5,
+        db_writers: int = 1,
+        stream_threshold: Optional[int] = None,
+        prepare_pool: Optional[ProcessPoolExecutor] = None,
+        queue_budget_size: Optional[int] = QUEUE_BUDGET_SIZE,
+    ):
+        self.spool_dir = spool_dir
+        self.trees_name = trees_name
+        self.stream_threshold = stream_threshold
+        self.prepare_pool = prepare_pool
+        # Workers blocked by the budget leave the next files unread in the spool
+        self.budget = QueueBudget(queue_budget_size)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.stop_event = threading.Event()
+        self.db_threads = [
+            threading.Thread(target=db_worker, args=(self.stop_event,))
+            for _ in range(db_writers)
+        ]
+        for db_thread in self.db_threads:
+            db_thread.start()
+
+        self.lock = threading.Lock()
+        # Files submitted and not yet archived/failed, avoids processing a file twice
+        # when it is reported again (e.g. by a rescan) while still being processed
+        self.claimed_files: set[str] = set()
+        self.processing = 0
+        self.stat_ok = 0
+        self.stat_fail = 0
+
+    def submit(self, filename: str) -> bool:
+        """Queues a spool file for ingestion. Returns False if it was already queued."""
+        with self.lock:
+            if filename in self.claimed_files:
+                return False
+            self.claimed_files.add(filename)
+
+        self.executor.submit(self._process, filename)
+        return True
+
+    def _process(self, filename: str) -> None:
+        with self.lock:
+            self.processing += 1
+
+        try:
+            done = start_file(
+                filename,
+                self.trees_name,
+                self.spool_dir,
+                self.stream_threshold,
+                self.prepare_pool,
+                self.budget,
+            )
+        except Exception as e:
+            logger.error("Exception processing %s: %s", filename, e)
+            self._finish(filename, False)
+            return
+
+        # The worker moves on to the next file, this one is finished by the writer
+        done.add_done_callback(lambda future: self._finish(filename, future.result()))
+
+    def _finish(self, filename: str, result: bool) -> None:
+        with self.lock:
+            self.processing -= 1
+            self.claimed_files.discard(filename)
+            if result:
+                self.stat_ok += 1
+            else:
+                self.stat_fail += 1
+
+    def get_stats(self) -> PipelineStats:
+        with self.lock:
+            claimed = len(self.claimed_files)
+            processing = self.processing
+
+        # Files stay in flight until they are committed, so this includes the
+        # files queued for the database and the ones being written
+        return {
+            "waiting": claimed - processing,
+            "in_flight": processing,
+            "queued_bytes": self.budget.used,
+        }
+
+    def close(self) -> None:
+        """Finishes every submitted file and stops the workers."""
+        self.executor.shutdown(wait=True)
+        db_queue.join()
+
+        self.stop_event.set()
+        for _ in self.db_threads:
+            db_queue.put(None)  # Poison pill, one per worker
+        for db_thread in self.db_threads:
+            db_thread.join()
+
+        logger.info(
+            "Processed %d files: %d succeeded, %d failed",
+            self.stat_ok + self.stat_fail,
+            self.stat_ok,
+            self.stat_fail,
+        )
+
 
 def verify_dir(dir):
     if not os.path.exists(dir):
@@ -436,14 +1118,9 @@ def verify_spool_dirs(spool_dir):
 
 def cache_logs_maintenance():
     """
-    Periodically clean up the cache logs to prevent memory leak and slow down.
-    If CACHE_LOGS grow over 100k entries, clear it.
+    Periodically evicts the least recently used log excerpts from the cache,
+    keeping it under CACHE_LOGS_SIZE_LIMIT entries.
     """
-
-    # Limit the size of the cache to prevent memory leaks
-    # (we don't really need lock, as workers idle, but just in case)
-    with cache_logs_lock:
-        if len(CACHE_LOGS) > CACHE_LOGS_SIZE_LIMIT:
-            CACHE_LOGS.clear()
-            if VERBOSE:
-                logger.info("Cache logs cleared")
+    evicted = get_log_excerpt_store().evict()
+    if VERBOSE and evicted:
+        logger.info("Evicted %d log excerpts from the cache", evicted)
@@ -0,0 +1,156 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import gzip
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("ingester")
+
+# Inserts between evictions, so the store isn't trimmed on every new excerpt
+EVICT_INTERVAL = 1000
+UPLOAD_TIMEOUT = 60  # seconds
+
+
+class LogExcerptStore:
+    """
+    Index of the log excerpts already uploaded, from their sha256 to their URL.
+
+    Backed by SQLite so it can be kept in a file that survives restarts and is
+    shared by the prepare processes. When it grows over `max_entries`, the least
+    recently used excerpts are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.inserts = 0
+
+        self.connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS log_excerpts (
+                hash TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS log_excerpts_last_used"
+            " ON log_excerpts (last_used)"
+        )
+
+    def get(self, log_hash: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "UPDATE log_excerpts SET last_used = ? WHERE hash = ? RETURNING url",
+                (time.time(), log_hash),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, log_hash: str, url: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO log_excerpts (hash, url, last_used)"
+                " VALUES (?, ?, ?)",
+                (log_hash, url, time.time()),
+            )
+            self.inserts += 1
+            if self.inserts >= EVICT_INTERVAL:
+                self._evict()
+
+    def evict(self) -> int:
+        """Removes the least recently used excerpts over the limit."""
+        with self.lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        self.inserts = 0
+        cursor = self.connection.execute(
+            """DELETE FROM log_excerpts WHERE hash IN (
+                SELECT hash FROM log_excerpts ORDER BY last_used DESC
+                LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM log_excerpts"
+            ).fetchone()[0]
+
+
+class LogExcerptUploader:
+    """
+    Uploads log excerpts to the storage with at most `max_workers` requests at a
+    time, sharing a pool of connections. Excerpts are gzipped in memory, and the
+    same excerpt being uploaded by several items is only sent once.
+    """
+
+    def __init__(self, base_url: str, token: str, max_workers: int):
+        self.base_url = base_url
+        self.token = token
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="logexcerpt-upload"
+        )
+        self.lock = threading.Lock()
+        self.pending: dict[str, Future] = {}
+
+    def submit(self, log_excerpt: str, log_hash: str) -> Future:
+        """
+        Schedules the upload of an excerpt, returning a future with its URL,
+        or None if the upload failed.
+        """
+        with self.lock:
+            if future := self.pending.get(log_hash):
+                return future
+            future = self.executor.submit(self._upload, log_excerpt, log_hash)
+            self.pending[log_hash] = future
+
+        future.add_done_callback(lambda _: self._forget(log_hash))
+        return future
+
+    def _forget(self, log_hash: str) -> None:
+        with self.lock:
+            self.pending.pop(log_hash, None)
+
+    def _upload(self, log_excerpt: str, log_hash: str) -> Optional[str]:
+        upload_url = f"{self.base_url}/upload"
+        files = {
+            "file0": ("logexcerpt.txt.gz", gzip.compress(log_excerpt.encode("utf-8"))),
+            "path": f"logexcerpt/{log_hash}",
+        }
+        try:
+            r = self.session.post(
+                upload_url,
+                headers={"Authorization": f"Bearer {self.token}"},
+                files=files,
+                timeout=UPLOAD_TIMEOUT,
+            )
+        except Exception as e:
+            logger.error("Error uploading logexcerpt %s: %s", log_hash, e)
+            return None
+
+        if r.status_code != 200:
+            logger.error(
+                "Failed to upload logexcerpt %s: %d : %s",
+                log_hash,
+                r.status_code,
+                r.text,
+            )
+            return None
+
+        return f"{self.base_url}/logexcerpt/{log_hash}/logexcerpt.txt.gz"
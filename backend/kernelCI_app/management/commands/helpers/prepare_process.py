@@ -0,0 +1,15 @@
+from typing import Any
+
+import django
+
+
+def init_prepare_process(options: dict[str, Any]) -> None:
+    """
+    Initializer of the spawned prepare processes. It is unpickled before django is
+    set up, so this module must not import the models, unlike kcidbng_ingester.
+    """
+    django.setup()
+    from kernelCI_app.management.commands.helpers import kcidbng_ingester
+
+    for name, value in options.items():
+        setattr(kcidbng_ingester, name, value)
@@ -1,15 +1,42 @@
 import logging
+import random
+import time
 from django.utils import timezone
-from typing import Any, Literal
+from typing import Any, Callable, Literal, Optional, TypedDict
 
-from django.db import IntegrityError
-from pydantic import ValidationError
+from django.conf import settings
+from django.db import DatabaseError, connection, connections, models, transaction
 
+from kernelCI_app.helpers.database import get_test_series_column
 from kernelCI_app.models import Builds, Checkouts, Incidents, Issues, Tests
 
 
 logger = logging.getLogger(__name__)
 
+# Rows written per INSERT statement. Keeps the statement size (and the amount of
+# work lost when a batch has to be retried row by row) bounded for large submissions.
+INSERT_BATCH_SIZE = 1000
+
+# Concurrent writers can still deadlock or hit serialization failures on rows touched
+# by more than one submission, those statements are safe to retry.
+RETRYABLE_SQLSTATES = {
+    "40001",  # serialization_failure
+    "40P01",  # deadlock_detected
+}
+MAX_WRITE_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05  # seconds, doubled on every attempt
+
+type TableNames = Literal["issues", "checkouts", "builds", "tests", "incidents"]
+
+# Ordered by dependency, submissions are inserted following this order
+TABLE_MODELS: dict[TableNames, type[models.Model]] = {
+    "issues": Issues,
+    "checkouts": Checkouts,
+    "builds": Builds,
+    "tests": Tests,
+    "incidents": Incidents,
+}
+
 
 def get_model_fields(model_fields) -> set[str]:
     """
@@ -80,125 +107,358 @@ def flatten_dict_specific(target: dict[str, Any], target_fields: list[str]):
     return flattened_dict
 
 
-def save_issue(issue) -> None:
+def filter_issue(issue: dict[str, Any]) -> dict[str, Any]:
     flattened_issue = flatten_dict_specific(issue, ["culprit"])
-    filtered_issue = {
-        key: value for key, value in flattened_issue.items() if key in ISSUE_FIELDS
-    }
-    valid_issue = Issues(**filtered_issue)
-    valid_issue.field_timestamp = timezone.now()
-    valid_issue.save()
-    return
+    return {key: value for key, value in flattened_issue.items() if key in ISSUE_FIELDS}
 
 
-def save_checkout(checkout) -> None:
-    filtered_checkout = {
-        key: value for key, value in checkout.items() if key in CHECKOUT_FIELDS
-    }
-    valid_checkout = Checkouts(**filtered_checkout)
-    valid_checkout.field_timestamp = timezone.now()
-    valid_checkout.save()
-    return
+def filter_checkout(checkout: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in checkout.items() if key in CHECKOUT_FIELDS}
 
 
-def save_build(build: dict[str, Any]) -> None:
-    filtered_build = {key: value for key, value in build.items() if key in BUILD_FIELDS}
-    valid_build = Builds(**filtered_build)
-    valid_build.field_timestamp = timezone.now()
-    valid_build.save()
-    return
+def filter_build(build: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in build.items() if key in BUILD_FIELDS}
 
 
-def save_test(test: dict[str, Any]) -> None:
+def filter_test(test: dict[str, Any]) -> dict[str, Any]:
     flattened_test = flatten_dict_specific(test, ["environment", "number"])
-    filtered_test = {
-        key: value for key, value in flattened_test.items() if key in TEST_FIELDS
-    }
-    valid_test = Tests(**filtered_test)
-    valid_test.field_timestamp = timezone.now()
-    valid_test.save()
-    return
+    return {key: value for key, value in flattened_test.items() if key in TEST_FIELDS}
+
+
+def filter_incident(incident: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in incident.items() if key in INCIDENT_FIELDS}
+
 
+ITEM_FILTERS: dict[TableNames, Callable[[dict[str, Any]], dict[str, Any]]] = {
+    "issues": filter_issue,
+    "checkouts": filter_checkout,
+    "builds": filter_build,
+    "tests": filter_test,
+    "incidents": filter_incident,
+}
 
-def save_incident(incident) -> None:
-    filtered_incident = {
-        key: value for key, value in incident.items() if key in INCIDENT_FIELDS
+
+def filter_submission_data(data: dict[str, Any]) -> dict[TableNames, list[Any]]:
+    """
+    Flattens and filters the items of every table of a submission to the fields
+    of their model, dropping everything else (including non-table keys).
+    Items that aren't dicts are kept as is, to be reported when inserted.
+
+    Doesn't need the database, so it can run away from the writers
+    (e.g. in another process) to reduce their work and the data sent to them.
+    """
+    return {
+        item_type: [
+            ITEM_FILTERS[item_type](item) if isinstance(item, dict) else item
+            for item in items
+        ]
+        for item_type in TABLE_MODELS
+        if (items := data.get(item_type))
     }
-    valid_incident = Incidents(**filtered_incident)
-    valid_incident.field_timestamp = timezone.now()
-    valid_incident.save()
-    return
+
+
+class InsertCounts(TypedDict):
+    inserted: int
+    updated: int
+    rejected: int
+
+
+# Columns filled in from other tables, which a submission never sets
+DERIVED_FIELDS: dict[type[models.Model], set[str]] = {
+    Checkouts: {"tree"},
+    Tests: {"series"},
+}
+
+
+def get_upsert_fields(model: type[models.Model]) -> list[models.Field]:
+    """
+    Columns written on insert/update. Generated columns are computed by the database,
+    and the derived ones by the checkouts_set_tree_id trigger and `update_test_series`.
+    """
+    derived_fields = DERIVED_FIELDS.get(model, set())
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if not field.generated and field.name not in derived_fields
+    ]
+
+
+def get_upsert_query(model: type[models.Model], fields: list[models.Field], rows: int):
+    """
+    Builds a multi-row `INSERT ... ON CONFLICT DO UPDATE` for `rows` rows.
+    `xmax = 0` is only true for freshly inserted tuples, which lets us tell
+    inserts and updates apart without an extra SELECT.
+    """
+    quote_name = connection.ops.quote_name
+
+    table = quote_name(model._meta.db_table)
+    pk_column = quote_name(model._meta.pk.column)
+    columns = [quote_name(field.column) for field in fields]
+
+    row_placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    update_clause = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for field, column in zip(fields, columns)
+        if not field.primary_key
+    )
+
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES {", ".join([row_placeholder] * rows)}
+        ON CONFLICT ({pk_column}) DO UPDATE SET {update_clause}
+        RETURNING (xmax = 0) AS inserted
+    """
+
+
+def upsert_rows(
+    model: type[models.Model], fields: list[models.Field], rows: list[list[Any]]
+) -> tuple[int, int]:
+    """Executes a single upsert statement and returns the (inserted, updated) counts."""
+    query = get_upsert_query(model, fields, len(rows))
+    params = [value for row in rows for value in row]
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+
+    inserted = sum(1 for (was_inserted,) in results if was_inserted)
+    return inserted, len(results) - inserted
+
+
+def is_retryable_error(error: DatabaseError) -> bool:
+    return getattr(error.__cause__, "sqlstate", None) in RETRYABLE_SQLSTATES
+
+
+def run_write_with_retry[
+    T
+](table: str, write: Callable[[], T], *, using: str = "default") -> T:
+    """
+    Runs `write` in its own savepoint, retrying with a jittered exponential
+    backoff when the database aborts it due to a deadlock or serialization failure.
+    """
+    for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+        try:
+            with transaction.atomic(using=using):
+                return write()
+        except DatabaseError as e:
+            if not is_retryable_error(e) or attempt == MAX_WRITE_ATTEMPTS:
+                raise
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            logger.warning(
+                f"Retrying write to {table} "
+                f"(attempt {attempt} of {MAX_WRITE_ATTEMPTS}): {e}"
+            )
+            time.sleep(delay + random.uniform(0, delay))
+
+
+def upsert_rows_with_retry(
+    model: type[models.Model], fields: list[models.Field], rows: list[list[Any]]
+) -> tuple[int, int]:
+    return run_write_with_retry(
+        model._meta.db_table, lambda: upsert_rows(model, fields, rows)
+    )
+
+
+def upsert_batch(
+    item_type: TableNames,
+    model: type[models.Model],
+    fields: list[models.Field],
+    rows: list[list[Any]],
+    counts: InsertCounts,
+) -> None:
+    """
+    Writes a batch of rows in a single statement. If the database rejects the batch
+    (e.g. a value too long for its column), falls back to row-by-row upserts so that
+    only the offending rows are rejected.
+    """
+    try:
+        inserted, updated = upsert_rows_with_retry(model, fields, rows)
+        counts["inserted"] += inserted
+        counts["updated"] += updated
+        return
+    except DatabaseError as e:
+        logger.warning(
+            f"Batch of {len(rows)} {item_type} failed, retrying row by row: {e}"
+        )
+
+    pk_index = fields.index(model._meta.pk)
+    for row in rows:
+        try:
+            inserted, updated = upsert_rows_with_retry(model, fields, [row])
+            counts["inserted"] += inserted
+            counts["updated"] += updated
+        except DatabaseError as e:
+            logger.error(f"Database error for {item_type} item {row[pk_index]}: {e}")
+            counts["rejected"] += 1
 
 
 def insert_items(
-    item_type: Literal["issues", "checkouts", "builds", "tests", "incidents"],
+    item_type: TableNames,
     items: list[dict[str, Any]],
-):
+    *,
+    filtered: bool = False,
+) -> InsertCounts:
+    """
+    Inserts or updates all items of a table in batches of INSERT_BATCH_SIZE rows.
+
+    Items are filtered and flattened into model instances and converted to their
+    database values before reaching the database, so malformed items are rejected
+    individually. Repeated ids within the same submission are collapsed, keeping
+    the last occurrence, as sequential saves would.
+    `filtered` skips the filtering for items already passed through
+    `filter_submission_data`.
+
+    Rows are written sorted by id so that concurrent writers always lock
+    overlapping rows in the same order, avoiding deadlocks between them.
+    """
     logger.info(f"Processing {len(items)} {item_type}")
-    item_counter = 0
-    success_counter = 0
+    counts: InsertCounts = {"inserted": 0, "updated": 0, "rejected": 0}
+
+    model = TABLE_MODELS[item_type]
+    filter_item = ITEM_FILTERS[item_type]
+    fields = get_upsert_fields(model)
+    pk_index = fields.index(model._meta.pk)
+    field_timestamp = timezone.now()
 
+    rows_by_id: dict[Any, list[Any]] = {}
     for item in items:
         if not isinstance(item, dict):
             logger.warning(
                 f"{item_type.capitalize()} data is not a dict, its type is: {type(item)}"
             )
+            counts["rejected"] += 1
             continue
-        item_counter += 1
 
         try:
-            # TODO: pass the timestamp at insertion
-            match item_type:
-                case "issues":
-                    save_issue(item)
-                case "checkouts":
-                    save_checkout(item)
-                case "builds":
-                    save_build(item)
-                case "tests":
-                    save_test(item)
-                case "incidents":
-                    save_incident(item)
-                case _:
-                    raise ValueError(f"Unknown item type: {item_type}")
-            success_counter += 1
-        except ValidationError as ve:
-            logger.error(f"Validation error for {item_type} item: {ve}")
-            continue
-        # TODO: catch whenever there is a problem with the schema and deal with it
-        except IntegrityError as ie:
-            logger.error(f"Integrity error for {item_type} item: {ie}")
-            continue
+            instance = model(**(item if filtered else filter_item(item)))
+            instance.field_timestamp = field_timestamp
+            row = [
+                field.get_db_prep_save(getattr(instance, field.attname), connection)
+                for field in fields
+            ]
         except Exception as e:
             logger.error(f"{e.__class__.__name__} error for {item_type} item: {e}")
+            counts["rejected"] += 1
             continue
 
-    print(f"Processed {item_counter} {item_type}, {success_counter} succeeded")
-    return success_counter
+        # Text primary keys default to an empty string when missing from the item
+        row_id = row[pk_index]
+        if not row_id:
+            logger.error(f"{item_type.capitalize()} item has no id")
+            counts["rejected"] += 1
+            continue
+        if row_id in rows_by_id:
+            counts["updated"] += 1
+        rows_by_id[row_id] = row
+
+    rows = [rows_by_id[row_id] for row_id in sorted(rows_by_id)]
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        end = start + INSERT_BATCH_SIZE
+        upsert_batch(item_type, model, fields, rows[start:end], counts)
+
+    logger.info(
+        "Processed %d %s: %d inserted, %d updated, %d rejected",
+        len(items),
+        item_type,
+        counts["inserted"],
+        counts["updated"],
+        counts["rejected"],
+    )
+    return counts
+
+
+def get_submitted_ids(items: Any) -> list[Any]:
+    if not isinstance(items, list):
+        return []
+    return [item["id"] for item in items if isinstance(item, dict) and item.get("id")]
+
+
+def set_test_series(
+    *,
+    test_ids: list[str],
+    build_ids: Optional[list[str]] = None,
+    using: str = "default",
+) -> int:
+    """
+    Sets the series of the tests, and of the tests of the builds, since it depends
+    on their config name. Returns how many tests changed series.
+
+    The tests of resubmitted checkouts are left as they are: a checkout can have
+    hundreds of thousands of tests, and the columns of the series that it holds
+    (origin, repository url and branch) don't change between submissions.
+    """
+    params = {"test_ids": test_ids, "build_ids": build_ids or []}
+    if not any(params.values()):
+        return 0
+
+    series = get_test_series_column()
+    # The ids are looked up separately so that each of them can use its own index
+    query = f"""
+        WITH targets AS (
+            SELECT id FROM tests WHERE id = ANY(%(test_ids)s)
+            UNION
+            SELECT id FROM tests WHERE build_id = ANY(%(build_ids)s)
+        )
+        UPDATE tests
+        SET series = {series}
+        FROM targets, builds
+        JOIN checkouts ON checkouts.id = builds.checkout_id
+        WHERE tests.id = targets.id
+            AND builds.id = tests.build_id
+            AND tests.series IS DISTINCT FROM {series}
+    """
+
+    def update() -> int:
+        with connections[using].cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.rowcount
+
+    return run_write_with_retry("tests", update, using=using)
 
 
-def insert_submission_data(data: dict[str, Any], metadata: dict[str, Any]):
+def update_test_series(data: dict[str, Any]) -> None:
+    """
+    Sets the series of the tests of the submission. It is best effort: the tests
+    left without a series are found by the backfill_test_series command.
+    """
+    if not settings.USE_DASHBOARD_DB:
+        # The kcidb schema doesn't have the column
+        return
+
+    try:
+        updated = set_test_series(
+            test_ids=get_submitted_ids(data.get("tests")),
+            build_ids=get_submitted_ids(data.get("builds")),
+        )
+        logger.debug("Updated the series of %d tests", updated)
+    except DatabaseError as e:
+        logger.warning(f"Error updating the series of the tests: {e}")
+
+
+def insert_submission_data(
+    data: dict[str, Any], metadata: dict[str, Any]
+) -> dict[TableNames, InsertCounts]:
     """
     Processes the data from a submission file.
+
+    Returns the count of inserted, updated and rejected rows per table.
+    If `metadata["filtered"]` is set, the data comes from `filter_submission_data`.
     """
     logger.info(
         "Processing submission data for %s", metadata.get("filename", "unknown")
     )
 
+    table_counts: dict[TableNames, InsertCounts] = {}
     try:
         # Note that the order of processing is important, as some data depends on others
         # Checkouts > Builds > Tests
         # Issues && Builds && Tests > Incidents
-        if issues := data.get("issues"):
-            insert_items("issues", issues)
-        if checkouts := data.get("checkouts"):
-            insert_items("checkouts", checkouts)
-        if builds := data.get("builds"):
-            insert_items("builds", builds)
-        if tests := data.get("tests"):
-            insert_items("tests", tests)
-        if incidents := data.get("incidents"):
-            insert_items("incidents", incidents)
+        for item_type in TABLE_MODELS:
+            if items := data.get(item_type):
+                table_counts[item_type] = insert_items(
+                    item_type, items, filtered=metadata.get("filtered", False)
+                )
+        update_test_series(data)
     except Exception as e:
         logger.error(f"Error processing submission data: {e}")
         raise e
@@ -206,3 +466,4 @@ def insert_submission_data(data: dict[str, Any], metadata: dict[str, Any]):
     logger.info(
         "Successfully parsed %s submission file", metadata.get("filename", "unknown")
     )
+    return table_counts
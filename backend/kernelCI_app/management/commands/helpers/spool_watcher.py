@@ -0,0 +1,120 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+
+logger = logging.getLogger("ingester")
+
+# Constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+INOTIFY_READ_SIZE = 64 * 1024
+
+
+def list_spool_files(spool_dir: str) -> list[str]:
+    """Lists the json files waiting on the spool directory."""
+    return [
+        f
+        for f in os.listdir(spool_dir)
+        if os.path.isfile(os.path.join(spool_dir, f)) and f.endswith(".json")
+    ]
+
+
+class PollingSpoolWatcher:
+    """Lists the whole spool directory every `interval` seconds."""
+
+    def __init__(self, spool_dir: str, interval: float):
+        self.spool_dir = spool_dir
+        self.interval = interval
+
+    def get_new_files(self, timeout: float) -> list[str]:
+        time.sleep(min(timeout, self.interval))
+        return list_spool_files(self.spool_dir)
+
+    def close(self) -> None:
+        return
+
+
+class InotifySpoolWatcher:
+    """
+    Reports json files as soon as they are closed for writing or moved into the
+    spool directory, using the Linux inotify API through libc.
+
+    If the kernel event queue overflows, events are lost, so the whole directory
+    is listed again.
+    """
+
+    def __init__(self, spool_dir: str):
+        self.spool_dir = spool_dir
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        watch = libc.inotify_add_watch(
+            self.fd, os.fsencode(spool_dir), IN_CLOSE_WRITE | IN_MOVED_TO
+        )
+        if watch < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), spool_dir)
+
+    def get_new_files(self, timeout: float) -> list[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            buffer = os.read(self.fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        filenames = []
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, name_len = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            name_start = offset + INOTIFY_EVENT_HEADER.size
+            offset = name_start + name_len
+            name = buffer[name_start:offset].rstrip(b"\0")
+
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflowed, rescanning spool directory")
+                return list_spool_files(self.spool_dir)
+
+            filename = os.fsdecode(name)
+            if filename.endswith(".json"):
+                filenames.append(filename)
+
+        return filenames
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_spool_watcher(
+    spool_dir: str, poll_interval: float
+) -> InotifySpoolWatcher | PollingSpoolWatcher:
+    """Watches the spool with inotify when available, falling back to polling."""
+    try:
+        watcher = InotifySpoolWatcher(spool_dir)
+        logger.info("Watching %s with inotify", spool_dir)
+        return watcher
+    except (OSError, AttributeError, TypeError) as e:
+        logger.warning(
+            "inotify unavailable (%s), polling %s every %s seconds",
+            e,
+            spool_dir,
+            poll_interval,
+        )
+        return PollingSpoolWatcher(spool_dir, poll_interval)
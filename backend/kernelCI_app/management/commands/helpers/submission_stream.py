@@ -0,0 +1,203 @@
+import codecs
+import json
+import re
+from itertools import islice
+from typing import Any, BinaryIO, Iterable, Iterator
+
+import kcidb_io
+
+STREAM_READ_SIZE = 1024 * 1024  # 1 MiB read from the file at a time
+STREAM_CHUNK_SIZE = 5000  # Rows validated and sent to the database at a time
+
+# Ordered by dependency, same order used by insert_submission_data
+SUBMISSION_TABLES = ("issues", "checkouts", "builds", "tests", "incidents")
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class StreamingNotSupportedError(Exception):
+    """The file can't be streamed and should be loaded as a whole instead."""
+
+
+class JsonStreamReader:
+    """
+    Incremental reader for a JSON object whose values are read one by one,
+    decoding arrays one element at a time.
+
+    Only the current element (and at most one read block after it) is kept in
+    memory, independently of the size of the file.
+    """
+
+    def __init__(self, file: BinaryIO, read_size: int = STREAM_READ_SIZE):
+        self.file = file
+        self.read_size = read_size
+        self.json_decoder = json.JSONDecoder()
+        self._reset(offset=0)
+
+    def _reset(self, *, offset: int) -> None:
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.buffer_offset = offset  # Byte offset of buffer[0] in the file
+        self.eof = False
+
+    def seek(self, offset: int) -> None:
+        """Moves the reader to a byte offset previously returned by `tell`."""
+        self.file.seek(offset)
+        self._reset(offset=offset)
+
+    def tell(self) -> int:
+        """Byte offset of the next character to be read."""
+        consumed = self.buffer[: self.pos]
+        return self.buffer_offset + len(consumed.encode("utf-8"))
+
+    def _fill(self) -> bool:
+        """Drops the consumed part of the buffer and reads more. False on EOF."""
+        if pos := self.pos:
+            self.buffer_offset = self.tell()
+            self.buffer = self.buffer[pos:]
+            self.pos = 0
+
+        data = self.file.read(self.read_size)
+        if not data:
+            self.buffer += self.text_decoder.decode(b"", final=True)
+            self.eof = True
+            return False
+
+        self.buffer += self.text_decoder.decode(data)
+        return True
+
+    def _peek(self) -> str:
+        """Returns the next non-whitespace character, or an empty string on EOF."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, expected: str) -> str:
+        char = self._peek()
+        if char not in expected:
+            raise ValueError(
+                f"Expected one of '{expected}' but found '{char}' at byte {self.tell()}"
+            )
+        self.pos += 1
+        return char
+
+    def decode_value(self) -> Any:
+        """Decodes the next JSON value entirely."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                # A value ending right at the end of the buffer can be a cut number
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Yields the keys of an object. After each key, the caller must consume
+        its value with `decode_value` or `iter_array` before resuming.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.decode_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key at byte {self.tell()}")
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def iter_array(self) -> Iterator[Any]:
+        """Yields the elements of an array, decoding one at a time."""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield self.decode_value()
+            if self._expect(",]") == "]":
+                return
+
+
+def iter_chunks(items: Iterable[Any], chunk_size: int) -> Iterator[list[Any]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def scan_submission(
+    full_filename: str, chunk_size: int = STREAM_CHUNK_SIZE
+) -> dict[str, int]:
+    """
+    First pass over a submission file: validates it chunk by chunk and returns
+    the byte offset where each table array starts.
+
+    Each chunk is validated as a submission of its own with the file's version,
+    which is equivalent to validating the whole file since the schema validates
+    each item independently. The file is rejected as a whole if any item is
+    invalid, before anything is written to the database.
+
+    Raises:
+        StreamingNotSupportedError: if the version comes after the tables in the file.
+        ValueError, jsonschema.exceptions.ValidationError: invalid file.
+    """
+    header: dict[str, Any] = {}
+    table_offsets: dict[str, int] = {}
+
+    with open(full_filename, "rb") as f:
+        reader = JsonStreamReader(f)
+        for key in reader.iter_object():
+            if key not in SUBMISSION_TABLES:
+                header[key] = reader.decode_value()
+                continue
+
+            if "version" not in header:
+                raise StreamingNotSupportedError(
+                    f"'{key}' found before the submission version"
+                )
+
+            table_offsets[key] = reader.tell()
+            for chunk in iter_chunks(reader.iter_array(), chunk_size):
+                kcidb_io.schema.V5_3.validate({**header, key: chunk})
+
+    # Validates the version and that there are no unknown top-level keys
+    kcidb_io.schema.V5_3.validate(header)
+
+    return table_offsets
+
+
+def iter_submission_chunks(
+    full_filename: str,
+    table_offsets: dict[str, int],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[tuple[str, list[dict[str, Any]], int]]:
+    """
+    Second pass over a file scanned by `scan_submission`: yields (table, rows, size)
+    chunks, in dependency order regardless of the order of the tables in the file.
+    `size` is the number of bytes the chunk takes in the file.
+    """
+    with open(full_filename, "rb") as f:
+        reader = JsonStreamReader(f)
+        for table in SUBMISSION_TABLES:
+            if table not in table_offsets:
+                continue
+
+            reader.seek(table_offsets[table])
+            chunk_start = reader.tell()
+            for chunk in iter_chunks(reader.iter_array(), chunk_size):
+                chunk_end = reader.tell()
+                yield table, chunk, chunk_end - chunk_start
+                chunk_start = chunk_end
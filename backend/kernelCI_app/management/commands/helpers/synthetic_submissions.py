@@ -0,0 +1,293 @@
+import json
+import os
+import random
+from typing import Any, Optional, TypedDict
+
+from kernelCI_app.management.commands.helpers.argument_types import (
+    check_non_negative_int,
+    check_positive_int,
+    check_ratio,
+)
+
+SYNTHETIC_ORIGIN = "synthetic"
+SYNTHETIC_START_TIME = "2025-01-01T00:00:00+00:00"
+# Used when no trees file is given
+DEFAULT_TREE_URLS = {
+    "https://git.kernel.org/pub/scm/linux/kernel/git/torvalds/linux.git": "mainline",
+    "https://git.kernel.org/pub/scm/linux/kernel/git/next/linux-next.git": "next",
+    "https://git.kernel.org/pub/scm/linux/kernel/git/stable/linux.git": "stable",
+}
+# Distinct issues across all files, so that issues are updated by later files
+SYNTHETIC_ISSUES = 10
+# Distinct excerpts shared by the items with duplicated log excerpts
+EXCERPT_POOL_SIZE = 16
+
+ARCHITECTURES = ["arm64", "x86_64", "riscv", "arm"]
+PLATFORMS = ["qemu", "rpi4", "juno", "beaglebone", "odroid"]
+
+
+class SyntheticSpoolConfig(TypedDict):
+    files: int
+    checkouts: int
+    """Checkouts per file"""
+    builds: int
+    """Builds per checkout"""
+    tests: int
+    """Tests per build"""
+    incidents: int
+    """Incidents per file"""
+    excerpt_size: int
+    """Size of the log excerpt of failed builds and tests, 0 for none"""
+    duplicate_ratio: float
+    """Ratio of builds/tests re-sent from the previous file, and of repeated log excerpts"""
+    tree_urls: dict[str, str]
+    seed: int
+
+
+def add_generation_arguments(parser) -> None:
+    """Arguments shared by the commands that generate a synthetic spool."""
+    parser.add_argument(
+        "--files",
+        type=check_positive_int,
+        default=20,
+        help="Number of submission files (default: 20)",
+    )
+    parser.add_argument(
+        "--checkouts",
+        type=check_positive_int,
+        default=1,
+        help="Checkouts per file (default: 1)",
+    )
+    parser.add_argument(
+        "--builds",
+        type=check_positive_int,
+        default=10,
+        help="Builds per checkout (default: 10)",
+    )
+    parser.add_argument(
+        "--tests",
+        type=check_non_negative_int,
+        default=500,
+        help="Tests per build (default: 500)",
+    )
+    parser.add_argument(
+        "--incidents",
+        type=check_non_negative_int,
+        default=10,
+        help="Incidents per file (default: 10)",
+    )
+    parser.add_argument(
+        "--excerpt-size",
+        type=check_non_negative_int,
+        default=1024,
+        help="Size in bytes of the log excerpt of failed builds and tests,"
+        + " 0 for none (default: 1024)",
+    )
+    parser.add_argument(
+        "--duplicate-ratio",
+        type=check_ratio,
+        default=0.1,
+        help="""Ratio of builds and tests re-sent from the previous file, and of
+         log excerpts repeated across items (default: 0.1)""",
+    )
+    parser.add_argument(
+        "--trees-file",
+        type=str,
+        help="Trees file whose URLs are used for the checkouts (default: a few known trees)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the generated data, the same seed generates the same files",
+    )
+
+
+def get_generation_config(
+    options: dict[str, Any], tree_urls: Optional[dict[str, str]] = None
+) -> SyntheticSpoolConfig:
+    return {
+        "files": options["files"],
+        "checkouts": options["checkouts"],
+        "builds": options["builds"],
+        "tests": options["tests"],
+        "incidents": options["incidents"],
+        "excerpt_size": options["excerpt_size"],
+        "duplicate_ratio": options["duplicate_ratio"],
+        "tree_urls": tree_urls or DEFAULT_TREE_URLS,
+        "seed": options["seed"],
+    }
+
+
+def count_rows(config: SyntheticSpoolConfig) -> int:
+    """Number of rows in the spool, counting duplicated rows once per file."""
+    builds = config["checkouts"] * config["builds"]
+    per_file = config["checkouts"] + builds + builds * config["tests"]
+    if config["incidents"]:
+        per_file += 1 + config["incidents"]  # The issue of the incidents
+    return config["files"] * per_file
+
+
+def make_log_excerpt(rng: random.Random, item_id: str, config: SyntheticSpoolConfig):
+    size = config["excerpt_size"]
+    if rng.random() < config["duplicate_ratio"]:
+        header = f"shared excerpt {rng.randrange(EXCERPT_POOL_SIZE)}\n"
+    else:
+        header = f"excerpt of {item_id}\n"
+    line = "[    1.234567] kernel: synthetic log line\n"
+    return (header + line * (size // len(line) + 1))[:size]
+
+
+def make_id(
+    rng: random.Random, kind: str, index: int, suffix: str, duplicate_ratio: float
+) -> str:
+    # A duplicated item reuses the id of the same item in the previous file
+    if index > 0 and rng.random() < duplicate_ratio:
+        index -= 1
+    return f"{SYNTHETIC_ORIGIN}:{kind}-{index}-{suffix}"
+
+
+def make_build(
+    rng: random.Random,
+    index: int,
+    suffix: str,
+    checkout_id: str,
+    config: SyntheticSpoolConfig,
+) -> dict[str, Any]:
+    build_id = make_id(rng, "build", index, suffix, config["duplicate_ratio"])
+    build = {
+        "id": build_id,
+        "checkout_id": checkout_id,
+        "origin": SYNTHETIC_ORIGIN,
+        "architecture": rng.choice(ARCHITECTURES),
+        "compiler": "gcc-12",
+        "config_name": "defconfig",
+        "status": rng.choices(["PASS", "FAIL"], weights=[9, 1])[0],
+        "start_time": SYNTHETIC_START_TIME,
+        "duration": rng.uniform(60, 1800),
+    }
+    if build["status"] == "FAIL" and config["excerpt_size"]:
+        build["log_excerpt"] = make_log_excerpt(rng, build_id, config)
+    return build
+
+
+def make_test(
+    rng: random.Random,
+    index: int,
+    suffix: str,
+    build_id: str,
+    config: SyntheticSpoolConfig,
+) -> dict[str, Any]:
+    test_id = make_id(rng, "test", index, suffix, config["duplicate_ratio"])
+    case = rng.randrange(1000)
+    test = {
+        "id": test_id,
+        "build_id": build_id,
+        "origin": SYNTHETIC_ORIGIN,
+        "path": f"kselftest.suite{case % 50}.case{case}",
+        "status": rng.choices(["PASS", "FAIL", "SKIP"], weights=[8, 1, 1])[0],
+        "start_time": SYNTHETIC_START_TIME,
+        "duration": rng.uniform(0.1, 60),
+        "environment": {
+            "comment": "synthetic",
+            "misc": {"platform": rng.choice(PLATFORMS)},
+        },
+    }
+    if test["status"] == "FAIL" and config["excerpt_size"]:
+        test["log_excerpt"] = make_log_excerpt(rng, test_id, config)
+    return test
+
+
+def make_incidents(
+    rng: random.Random, index: int, tests: list[dict[str, Any]], count: int
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    if not count or not tests:
+        return [], []
+
+    issue_id = f"{SYNTHETIC_ORIGIN}:issue-{index % SYNTHETIC_ISSUES}"
+    issue = {
+        "id": issue_id,
+        "version": 1,
+        "origin": SYNTHETIC_ORIGIN,
+        "comment": "Synthetic issue",
+        "culprit": {"code": True},
+    }
+    incidents = [
+        {
+            "id": f"{SYNTHETIC_ORIGIN}:incident-{index}-{incident_index}",
+            "origin": SYNTHETIC_ORIGIN,
+            "issue_id": issue_id,
+            "issue_version": 1,
+            "test_id": rng.choice(tests)["id"],
+            "present": True,
+        }
+        for incident_index in range(count)
+    ]
+    return [issue], incidents
+
+
+def generate_submission(index: int, config: SyntheticSpoolConfig) -> dict[str, Any]:
+    """Generates the valid kcidb v5.3 submission of the `index`-th file."""
+    rng = random.Random(f"{config['seed']}-{index}")
+    tree_urls = sorted(config["tree_urls"].items())
+
+    checkouts = []
+    builds = []
+    tests = []
+    for checkout_index in range(config["checkouts"]):
+        tree_url, tree_name = rng.choice(tree_urls)
+        checkout_id = f"{SYNTHETIC_ORIGIN}:checkout-{index}-{checkout_index}"
+        checkouts.append(
+            {
+                "id": checkout_id,
+                "origin": SYNTHETIC_ORIGIN,
+                "tree_name": tree_name,
+                "git_repository_url": tree_url,
+                "git_repository_branch": "master",
+                "git_commit_hash": f"{rng.getrandbits(160):040x}",
+                "start_time": SYNTHETIC_START_TIME,
+            }
+        )
+
+        for build_index in range(config["builds"]):
+            build_suffix = f"{checkout_index}-{build_index}"
+            build = make_build(rng, index, build_suffix, checkout_id, config)
+            builds.append(build)
+
+            for test_index in range(config["tests"]):
+                test_suffix = f"{build_suffix}-{test_index}"
+                tests.append(make_test(rng, index, test_suffix, build["id"], config))
+
+    issues, incidents = make_incidents(rng, index, tests, config["incidents"])
+
+    submission = {
+        "version": {"major": 5, "minor": 3},
+        "checkouts": checkouts,
+        "builds": builds,
+        "tests": tests,
+    }
+    if incidents:
+        submission["issues"] = issues
+        submission["incidents"] = incidents
+    return submission
+
+
+def write_submission(spool_dir: str, filename: str, submission: dict[str, Any]):
+    """
+    Writes the submission to a temporary file first and moves it into the spool,
+    so that the file only shows up complete.
+    """
+    tmp_filename = os.path.join(spool_dir, f".{filename}.tmp")
+    with open(tmp_filename, "w") as f:
+        json.dump(submission, f)
+    os.rename(tmp_filename, os.path.join(spool_dir, filename))
+
+
+def generate_spool(spool_dir: str, config: SyntheticSpoolConfig) -> list[str]:
+    """Writes the synthetic submission files to the spool, returning their names."""
+    filenames = []
+    for index in range(config["files"]):
+        filename = f"synthetic-{config['seed']}-{index}.json"
+        write_submission(spool_dir, filename, generate_submission(index, config))
+        filenames.append(filename)
+    return filenames
@@ -1,22 +1,36 @@
-import argparse
+from concurrent.futures import ProcessPoolExecutor
 from django.core.management.base import BaseCommand
 import logging
 import time
+from typing import Optional
+from kernelCI_app.management.commands.helpers.argument_types import (
+    check_positive_int,
+)
 from kernelCI_app.management.commands.helpers.kcidbng_ingester import (
+    QUEUE_BUDGET_SIZE,
+    IngestionPipeline,
     cache_logs_maintenance,
+    create_prepare_pool,
     ingest_submissions_parallel,
     load_trees_name,
     verify_spool_dirs,
 )
+from kernelCI_app.management.commands.helpers.ingestion_metrics import (
+    DEFAULT_METRICS_HOST,
+    start_metrics_server,
+    write_metrics_file,
+)
+from kernelCI_app.management.commands.helpers.spool_watcher import (
+    create_spool_watcher,
+    list_spool_files,
+)
 
 logger = logging.getLogger(__name__)
 
-
-def check_positive_int(value) -> bool:
-    ivalue = int(value)
-    if ivalue <= 0:
-        raise argparse.ArgumentTypeError("%s has to be greater than 0" % value)
-    return ivalue
+# How often the watch mode logs the pipeline state and runs maintenance tasks
+WATCH_REPORT_INTERVAL = 60  # seconds
+# How often the watch mode writes the metrics file
+METRICS_WRITE_INTERVAL = 15  # seconds
 
 
 class Command(BaseCommand):
@@ -36,11 +50,63 @@ class Command(BaseCommand):
             default=5,
             help="Maximum number of workers to process files in parallel (default: 5)",
         )
+        parser.add_argument(
+            "--db-writers",
+            type=check_positive_int,
+            default=1,
+            help="Number of threads writing to the database concurrently,"
+            + " each with its own connection (default: 1)",
+        )
         parser.add_argument(
             "--interval",
             type=int,
             default=5,
-            help="Check interval in seconds (default: 5)",
+            help="Check interval in seconds (default: 5)."
+            + " In watch mode, only used when falling back to polling",
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="""Keep the workers alive and ingest each file as soon as it is written
+             to the spool directory (using inotify, or polling if not available)""",
+        )
+        parser.add_argument(
+            "--stream-threshold",
+            type=check_positive_int,
+            help="""Size in MB above which files are streamed in chunks instead of
+             loaded whole, bounding memory usage (default: never stream)""",
+        )
+        parser.add_argument(
+            "--prepare-mode",
+            choices=["thread", "process"],
+            default="thread",
+            help="""Where files are decoded and validated: in the worker threads, or in
+             a pool of --max-workers processes to use multiple cores (default: thread)""",
+        )
+        parser.add_argument(
+            "--max-queued-mb",
+            type=check_positive_int,
+            default=QUEUE_BUDGET_SIZE // (1024 * 1024),
+            help="""Size in MB of the files that can be read and not yet committed to the
+             database. Workers wait for the database when it is reached (default: %(default)s)""",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            type=str,
+            help="""Path of a file where the ingestion metrics are written in the
+             Prometheus text format, e.g. for the node_exporter textfile collector""",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=check_positive_int,
+            help="Port to serve the ingestion metrics on, in the Prometheus text format",
+        )
+        parser.add_argument(
+            "--metrics-host",
+            type=str,
+            default=DEFAULT_METRICS_HOST,
+            help="""Address the metrics server binds to, e.g. 0.0.0.0 to serve them on
+             every interface (default: %(default)s)""",
         )
         parser.add_argument(
             "--trees-file",
@@ -54,24 +120,100 @@ class Command(BaseCommand):
         *args,
         spool_dir: str,
         max_workers: int,
+        db_writers: int,
         interval: int,
+        watch: bool,
+        stream_threshold: Optional[int],
+        prepare_mode: str,
+        max_queued_mb: int,
+        metrics_file: Optional[str],
+        metrics_port: Optional[int],
+        metrics_host: str,
         trees_file: str,
         **options,
     ):
         self.stdout.write(f"Monitoring folder: {spool_dir}")
         self.stdout.write(f"Check interval: {interval} seconds")
         self.stdout.write(f"Using {max_workers} workers")
+        self.stdout.write(f"Using {db_writers} database writers")
+        self.stdout.write(f"Preparing files in {prepare_mode} mode")
+        if stream_threshold is not None:
+            self.stdout.write(f"Streaming files larger than {stream_threshold} MB")
+            stream_threshold = stream_threshold * 1024 * 1024
+        self.stdout.write(f"Holding at most {max_queued_mb} MB of files in memory")
+        queue_budget_size = max_queued_mb * 1024 * 1024
+
+        if metrics_port is not None:
+            start_metrics_server(metrics_port, metrics_host)
+            self.stdout.write(f"Serving metrics on {metrics_host}:{metrics_port}")
 
         verify_spool_dirs(spool_dir)
         trees_name = load_trees_name(trees_file_override=trees_file)
 
+        # Kept alive for the whole command, spawning processes is expensive
+        prepare_pool = (
+            create_prepare_pool(max_workers) if prepare_mode == "process" else None
+        )
+
         self.stdout.write("Starting file monitoring... (Press Ctrl+C to stop)")
 
+        try:
+            if watch:
+                self.watch_spool(
+                    spool_dir=spool_dir,
+                    trees_name=trees_name,
+                    max_workers=max_workers,
+                    db_writers=db_writers,
+                    interval=interval,
+                    stream_threshold=stream_threshold,
+                    prepare_pool=prepare_pool,
+                    queue_budget_size=queue_budget_size,
+                    metrics_file=metrics_file,
+                )
+            else:
+                self.poll_spool(
+                    spool_dir=spool_dir,
+                    trees_name=trees_name,
+                    max_workers=max_workers,
+                    db_writers=db_writers,
+                    interval=interval,
+                    stream_threshold=stream_threshold,
+                    prepare_pool=prepare_pool,
+                    queue_budget_size=queue_budget_size,
+                    metrics_file=metrics_file,
+                )
+        finally:
+            if prepare_pool is not None:
+                prepare_pool.shutdown()
+
+    def poll_spool(
+        self,
+        *,
+        spool_dir: str,
+        trees_name: dict[str, str],
+        max_workers: int,
+        db_writers: int,
+        interval: int,
+        stream_threshold: Optional[int],
+        prepare_pool: Optional[ProcessPoolExecutor],
+        queue_budget_size: int,
+        metrics_file: Optional[str],
+    ) -> None:
         try:
             while True:
                 # TODO: retry failed files every x cycles
-                ingest_submissions_parallel(spool_dir, trees_name, max_workers)
+                ingest_submissions_parallel(
+                    spool_dir,
+                    trees_name,
+                    max_workers,
+                    db_writers,
+                    stream_threshold,
+                    prepare_pool,
+                    queue_budget_size,
+                )
                 cache_logs_maintenance()
+                if metrics_file:
+                    write_metrics_file(metrics_file)
 
                 time.sleep(interval)
 
@@ -80,3 +222,65 @@ class Command(BaseCommand):
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}")
             raise
+
+    def watch_spool(
+        self,
+        *,
+        spool_dir: str,
+        trees_name: dict[str, str],
+        max_workers: int,
+        db_writers: int,
+        interval: int,
+        stream_threshold: Optional[int],
+        prepare_pool: Optional[ProcessPoolExecutor],
+        queue_budget_size: int,
+        metrics_file: Optional[str],
+    ) -> None:
+        pipeline = IngestionPipeline(
+            spool_dir,
+            trees_name,
+            max_workers,
+            db_writers,
+            stream_threshold,
+            prepare_pool,
+            queue_budget_size,
+        )
+        watcher = create_spool_watcher(spool_dir, poll_interval=interval)
+
+        try:
+            # Files written before the watcher started don't generate events
+            for filename in list_spool_files(spool_dir):
+                pipeline.submit(filename)
+
+            last_report = time.monotonic()
+            last_metrics_write = time.monotonic()
+            while True:
+                for filename in watcher.get_new_files(timeout=interval):
+                    pipeline.submit(filename)
+
+                if (
+                    metrics_file
+                    and time.monotonic() - last_metrics_write >= METRICS_WRITE_INTERVAL
+                ):
+                    last_metrics_write = time.monotonic()
+                    write_metrics_file(metrics_file)
+
+                if time.monotonic() - last_report >= WATCH_REPORT_INTERVAL:
+                    last_report = time.monotonic()
+                    cache_logs_maintenance()
+                    stats = pipeline.get_stats()
+                    logger.info(
+                        "Ingestion pipeline: %d files waiting, %d in flight (%.1f MB)",
+                        stats["waiting"],
+                        stats["in_flight"],
+                        stats["queued_bytes"] / (1024 * 1024),
+                    )
+
+        except KeyboardInterrupt:
+            logger.info("File monitoring stopped by user")
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}")
+            raise
+        finally:
+            watcher.close()
+            pipeline.close()
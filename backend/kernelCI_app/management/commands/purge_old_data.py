@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = """Deletes the tests and builds received before a cutoff, along with their
+    incidents. The rows are picked by their _timestamp, which the BRIN indexes serve
+    with a scan of the old blocks only, and deleted in batches, each one in its own
+    transaction, so the command can be stopped and run again at any time."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            required=True,
+            help="Deletes the rows received more than this many days ago",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Dashboard database to purge (default: default)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Rows deleted per transaction (default: {DEFAULT_BATCH_SIZE})",
+        )
+
+    def handle(
+        self,
+        *args,
+        older_than_days: int,
+        database: str,
+        batch_size: int,
+        **options,
+    ):
+        if older_than_days <= 0:
+            raise CommandError("--older-than-days must be positive")
+
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        self.stdout.write(f"Deleting the tests and builds received before {cutoff}")
+
+        # The tests go first so that no test is left pointing to a deleted build,
+        # builds that still have tests (e.g. a late retry) are kept
+        tests_query = """
+            DELETE FROM tests
+            WHERE id IN (
+                SELECT id FROM tests
+                WHERE _timestamp < %(cutoff)s
+                LIMIT %(batch_size)s
+            )
+            RETURNING id
+        """
+        builds_query = """
+            DELETE FROM builds
+            WHERE id IN (
+                SELECT id FROM builds
+                WHERE _timestamp < %(cutoff)s
+                    AND NOT EXISTS (
+                        SELECT 1 FROM tests WHERE tests.build_id = builds.id
+                    )
+                LIMIT %(batch_size)s
+            )
+            RETURNING id
+        """
+
+        for table, query, incident_column in (
+            ("tests", tests_query, "test_id"),
+            ("builds", builds_query, "build_id"),
+        ):
+            total_deleted = 0
+            while True:
+                with transaction.atomic(using=database), connections[
+                    database
+                ].cursor() as cursor:
+                    cursor.execute(query, {"cutoff": cutoff, "batch_size": batch_size})
+                    deleted_ids = [row_id for (row_id,) in cursor.fetchall()]
+                    if not deleted_ids:
+                        break
+                    cursor.execute(
+                        f"DELETE FROM incidents WHERE {incident_column} = ANY(%s)",
+                        [deleted_ids],
+                    )
+                total_deleted += len(deleted_ids)
+                self.stdout.write(f"Deleted {total_deleted} {table}")
+
+        self.stdout.write("Purge completed")
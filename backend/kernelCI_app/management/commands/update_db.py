@@ -4,6 +4,9 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import connections, models
 import logging
 from django.conf import settings
+from kernelCI_app.management.commands.helpers.process_submissions import (
+    set_test_series,
+)
 from kernelCI_app.models import Issues, Checkouts, Builds, Tests, Incidents
 from datetime import datetime, timedelta
 from django.utils import timezone
@@ -470,6 +473,11 @@ class Command(BaseCommand):
             batch_size=TEST_BATCH_SIZE,
         )
         total_inserted = len(migrated_tests)
+        # Their builds and checkouts were copied before them
+        set_test_series(
+            test_ids=[test.id for test in original_tests],
+            using=self.dashboard_conn_name,
+        )
 
         self.stdout.write(f"Processed {total_inserted} Tests records")
         return total_inserted
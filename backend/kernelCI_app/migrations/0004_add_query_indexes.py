@@ -0,0 +1,56 @@
+import django.contrib.postgres.indexes
+import django.db.models.fields.json
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction, but doesn't lock
+    # the tables against the ingester's writes while the indexes are built
+    atomic = False
+
+    dependencies = [
+        ("kernelCI_app", "0003_add_build_series_field"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="checkouts",
+            index=models.Index(
+                fields=["origin", "start_time"], name="checkouts_origin_start_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="checkouts",
+            index=models.Index(
+                fields=["git_commit_hash"], name="checkouts_commit_hash_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="checkouts",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["git_commit_tags"], name="checkouts_commit_tags_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=models.Index(
+                fields=["origin", "start_time"], name="tests_origin_start_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=models.Index(
+                django.db.models.fields.json.KeyTextTransform(
+                    "platform", "environment_misc"
+                ),
+                name="tests_platform_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["environment_compatible"], name="tests_compatible_idx"
+            ),
+        ),
+    ]
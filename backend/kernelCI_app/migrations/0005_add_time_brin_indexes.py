@@ -0,0 +1,47 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("kernelCI_app", "0004_add_query_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="builds",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True,
+                fields=["start_time"],
+                name="builds_start_time_brin_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="builds",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True,
+                fields=["field_timestamp"],
+                name="builds_timestamp_brin_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True,
+                fields=["start_time"],
+                name="tests_start_time_brin_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True,
+                fields=["field_timestamp"],
+                name="tests_timestamp_brin_idx",
+            ),
+        ),
+    ]
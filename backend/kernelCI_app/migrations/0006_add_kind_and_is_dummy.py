@@ -0,0 +1,63 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction. Adding the
+    # stored columns rewrites the tables, so that part does lock them.
+    atomic = False
+
+    dependencies = [
+        ("kernelCI_app", "0005_add_time_brin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="builds",
+            name="is_dummy",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.ExpressionWrapper(
+                    models.Q(("id__startswith", "maestro:dummy_")),
+                    output_field=models.BooleanField(),
+                ),
+                output_field=models.BooleanField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name="tests",
+            name="kind",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(
+                        models.Q(
+                            ("path", "boot"),
+                            ("path__startswith", "boot."),
+                            _connector="OR",
+                        ),
+                        then=models.Value("boot"),
+                    ),
+                    models.When(path__isnull=False, then=models.Value("test")),
+                    default=None,
+                ),
+                output_field=models.TextField(blank=True, null=True),
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="builds",
+            index=models.Index(
+                condition=models.Q(("is_dummy", False)),
+                fields=["checkout"],
+                name="builds_real_checkout_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=models.Index(
+                condition=models.Q(("kind", "boot")),
+                fields=["build"],
+                name="tests_boot_build_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction. The column is
+    # nullable without a default, so adding it doesn't rewrite the table.
+    # The existing tests get their series from the backfill_test_series command.
+    atomic = False
+
+    dependencies = [
+        ("kernelCI_app", "0006_add_kind_and_is_dummy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tests",
+            name="series",
+            field=models.TextField(blank=True, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=models.Index(
+                fields=["series", "start_time"], name="tests_series_start_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tests",
+            index=models.Index(
+                fields=["series", "field_timestamp"],
+                name="tests_series_timestamp_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction. The checkouts
+    # are much fewer than the builds and tests, so they are backfilled here
+    # in a single statement, and the index is built on the filled column.
+    atomic = False
+
+    dependencies = [
+        ("kernelCI_app", "0007_add_test_series"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Trees",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("tree_name", models.TextField(blank=True, null=True)),
+                ("git_repository_branch", models.TextField(blank=True, null=True)),
+                ("git_repository_url", models.TextField(blank=True, null=True)),
+                ("origin", models.TextField()),
+            ],
+            options={
+                "db_table": "trees",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "tree_name",
+                            "git_repository_branch",
+                            "git_repository_url",
+                            "origin",
+                        ),
+                        name="trees_identity_unique",
+                        nulls_distinct=False,
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="checkouts",
+            name="tree",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                to="kernelCI_app.trees",
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO trees (tree_name, git_repository_branch, git_repository_url, origin)
+                SELECT DISTINCT tree_name, git_repository_branch, git_repository_url, origin
+                FROM checkouts
+                ORDER BY 1, 2, 3, 4
+                ON CONFLICT DO NOTHING;
+
+                UPDATE checkouts
+                SET tree_id = trees.id
+                FROM trees
+                WHERE trees.tree_name IS NOT DISTINCT FROM checkouts.tree_name
+                    AND trees.git_repository_branch IS NOT DISTINCT FROM checkouts.git_repository_branch
+                    AND trees.git_repository_url IS NOT DISTINCT FROM checkouts.git_repository_url
+                    AND trees.origin = checkouts.origin;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        AddIndexConcurrently(
+            model_name="checkouts",
+            index=models.Index(
+                fields=["tree", "start_time"], name="checkouts_tree_start_idx"
+            ),
+        ),
+    ]
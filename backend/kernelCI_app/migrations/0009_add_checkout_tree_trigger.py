@@ -0,0 +1,74 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The trigger sets the tree_id of every checkout written, by the ingester,
+    # update_db or anything else, so that the queries grouping the checkouts by
+    # tree_id never miss one. The checkouts written since the trees were added
+    # without getting their tree_id are filled in here as well.
+
+    dependencies = [
+        ("kernelCI_app", "0008_add_trees"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                -- The lookups match NULLs like the NULLS NOT DISTINCT trees_identity_unique
+                -- index does. With custom plans, the NULL checks on NEW are folded before
+                -- planning, leaving an equality or IS NULL on each column that the index serves
+                CREATE FUNCTION checkouts_set_tree_id() RETURNS trigger
+                SET plan_cache_mode = force_custom_plan
+                AS $$
+                BEGIN
+                    SELECT trees.id INTO NEW.tree_id
+                    FROM trees
+                    WHERE (trees.tree_name = NEW.tree_name
+                            OR (trees.tree_name IS NULL AND NEW.tree_name IS NULL))
+                        AND (trees.git_repository_branch = NEW.git_repository_branch
+                            OR (trees.git_repository_branch IS NULL AND NEW.git_repository_branch IS NULL))
+                        AND (trees.git_repository_url = NEW.git_repository_url
+                            OR (trees.git_repository_url IS NULL AND NEW.git_repository_url IS NULL))
+                        AND trees.origin = NEW.origin;
+                    IF NEW.tree_id IS NOT NULL THEN
+                        RETURN NEW;
+                    END IF;
+
+                    -- A concurrent insert of the same tree makes this one wait for it and do
+                    -- nothing, the tree is then read back instead of raising a unique violation
+                    INSERT INTO trees (tree_name, git_repository_branch, git_repository_url, origin)
+                    VALUES (NEW.tree_name, NEW.git_repository_branch, NEW.git_repository_url, NEW.origin)
+                    ON CONFLICT (tree_name, git_repository_branch, git_repository_url, origin) DO NOTHING
+                    RETURNING trees.id INTO NEW.tree_id;
+                    IF NEW.tree_id IS NULL THEN
+                        SELECT trees.id INTO NEW.tree_id
+                        FROM trees
+                        WHERE (trees.tree_name = NEW.tree_name
+                                OR (trees.tree_name IS NULL AND NEW.tree_name IS NULL))
+                            AND (trees.git_repository_branch = NEW.git_repository_branch
+                                OR (trees.git_repository_branch IS NULL
+                                    AND NEW.git_repository_branch IS NULL))
+                            AND (trees.git_repository_url = NEW.git_repository_url
+                                OR (trees.git_repository_url IS NULL AND NEW.git_repository_url IS NULL))
+                            AND trees.origin = NEW.origin;
+                    END IF;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER checkouts_set_tree_id
+                BEFORE INSERT OR UPDATE OF tree_name, git_repository_branch, git_repository_url, origin
+                ON checkouts
+                FOR EACH ROW EXECUTE FUNCTION checkouts_set_tree_id();
+
+                -- Fires the trigger on the checkouts left without a tree
+                UPDATE checkouts
+                SET origin = origin
+                WHERE tree_id IS NULL;
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS checkouts_set_tree_id ON checkouts;
+                DROP FUNCTION IF EXISTS checkouts_set_tree_id();
+            """,
+        ),
+    ]
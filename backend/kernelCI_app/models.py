@@ -1,8 +1,12 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
-from django.db.models import F
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.db.models import Case, ExpressionWrapper, F, Q, Value, When
+from django.db.models.fields.json import KeyTextTransform
 from django.db.models.functions import Concat, MD5
 
+from kernelCI_app.constants.general import MAESTRO_DUMMY_BUILD_PREFIX
+
 
 class StatusChoices(models.TextChoices):
     PASS = "PASS"
@@ -34,6 +38,34 @@ class Issues(models.Model):
         unique_together = (("id", "version"),)
 
 
+class Trees(models.Model):
+    """
+    The trees the checkouts belong to, numbered so that the queries can group
+    the checkouts by an integer instead of the identity columns.
+    """
+
+    id = models.AutoField(primary_key=True)
+    tree_name = models.TextField(blank=True, null=True)
+    git_repository_branch = models.TextField(blank=True, null=True)
+    git_repository_url = models.TextField(blank=True, null=True)
+    origin = models.TextField()
+
+    class Meta:
+        db_table = "trees"
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "tree_name",
+                    "git_repository_branch",
+                    "git_repository_url",
+                    "origin",
+                ],
+                name="trees_identity_unique",
+                nulls_distinct=False,
+            )
+        ]
+
+
 class Checkouts(models.Model):
     field_timestamp = models.DateTimeField(
         db_column="_timestamp", blank=True, null=True
@@ -59,9 +91,28 @@ class Checkouts(models.Model):
     git_commit_tags = ArrayField(models.TextField(), blank=True, null=True)
     origin_builds_finish_time = models.DateTimeField(blank=True, null=True)
     origin_tests_finish_time = models.DateTimeField(blank=True, null=True)
+    tree = models.ForeignKey(
+        Trees,
+        db_constraint=False,
+        db_index=False,
+        on_delete=models.DO_NOTHING,
+        blank=True,
+        null=True,
+    )
+    """Set by the checkouts_set_tree_id trigger on every write of the identity columns"""
 
     class Meta:
         db_table = "checkouts"
+        indexes = [
+            models.Index(
+                fields=["tree", "start_time"], name="checkouts_tree_start_idx"
+            ),
+            models.Index(
+                fields=["origin", "start_time"], name="checkouts_origin_start_idx"
+            ),
+            models.Index(fields=["git_commit_hash"], name="checkouts_commit_hash_idx"),
+            GinIndex(fields=["git_commit_tags"], name="checkouts_commit_tags_idx"),
+        ]
 
 
 class Builds(models.Model):
@@ -100,11 +151,34 @@ class Builds(models.Model):
         output_field=models.TextField(blank=True, null=True),
         db_persist=True,
     )
+    is_dummy = models.GeneratedField(
+        expression=ExpressionWrapper(
+            Q(id__startswith=MAESTRO_DUMMY_BUILD_PREFIX),
+            output_field=models.BooleanField(),
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = "builds"
         indexes = [
             models.Index(fields=["series"], name="builds_series_idx"),
+            models.Index(
+                fields=["checkout"],
+                condition=Q(is_dummy=False),
+                name="builds_real_checkout_idx",
+            ),
+            BrinIndex(
+                fields=["start_time"],
+                name="builds_start_time_brin_idx",
+                autosummarize=True,
+            ),
+            BrinIndex(
+                fields=["field_timestamp"],
+                name="builds_timestamp_brin_idx",
+                autosummarize=True,
+            ),
         ]
 
 
@@ -139,9 +213,53 @@ class Tests(models.Model):
     )
     number_unit = models.TextField(blank=True, null=True)
     input_files = models.JSONField(blank=True, null=True)
+    kind = models.GeneratedField(
+        expression=Case(
+            When(Q(path="boot") | Q(path__startswith="boot."), then=Value("boot")),
+            When(path__isnull=False, then=Value("test")),
+            default=None,
+        ),
+        output_field=models.TextField(blank=True, null=True),
+        db_persist=True,
+    )
+    """'boot' for the boots, 'test' for the other tests, NULL without a path"""
+    series = models.TextField(blank=True, null=True)
+    """md5 of the tree, build config, path and platform, see TEST_SERIES_VALUES.
+    Set by the ingester after writing the tests, as it depends on their build and checkout"""
 
     class Meta:
         db_table = "tests"
+        indexes = [
+            models.Index(
+                fields=["build"],
+                condition=Q(kind="boot"),
+                name="tests_boot_build_idx",
+            ),
+            models.Index(
+                fields=["origin", "start_time"], name="tests_origin_start_idx"
+            ),
+            models.Index(
+                fields=["series", "start_time"], name="tests_series_start_idx"
+            ),
+            models.Index(
+                fields=["series", "field_timestamp"], name="tests_series_timestamp_idx"
+            ),
+            models.Index(
+                KeyTextTransform("platform", "environment_misc"),
+                name="tests_platform_idx",
+            ),
+            GinIndex(fields=["environment_compatible"], name="tests_compatible_idx"),
+            BrinIndex(
+                fields=["start_time"],
+                name="tests_start_time_brin_idx",
+                autosummarize=True,
+            ),
+            BrinIndex(
+                fields=["field_timestamp"],
+                name="tests_timestamp_brin_idx",
+                autosummarize=True,
+            ),
+        ]
 
 
 class Incidents(models.Model):
@@ -2,8 +2,14 @@ from typing import TypedDict
 from datetime import datetime
 from django.db import connection
 
-from kernelCI_app.helpers.database import dict_fetchall
-from kernelCI_app.cache import get_query_cache, set_query_cache
+from kernelCI_app.helpers.database import (
+    dict_fetchall,
+    get_build_is_dummy_column,
+    get_checkout_tree_columns,
+    get_checkout_tree_join,
+    get_test_kind_column,
+)
+from kernelCI_app.cache import get_or_set_query_cache, make_cache_tags
 from kernelCI_app.typeModels.hardwareDetails import CommitHead, Tree
 
 
@@ -26,13 +32,10 @@ def _get_hardware_tree_heads_clause(*, id_only: bool) -> str:
                     C.git_commit_hash,
                     C.git_commit_tags"""
 
+    tree_columns = get_checkout_tree_columns("C")
+
     return f"""SELECT DISTINCT
-                    ON (
-                        C.tree_name,
-                        C.git_repository_branch,
-                        C.git_repository_url,
-                        C.origin
-                    )
+                    ON ({tree_columns})
                     {fields}
                 FROM
                     checkouts C
@@ -40,63 +43,48 @@ def _get_hardware_tree_heads_clause(*, id_only: bool) -> str:
                     C.start_time >= %(start_date)s
                     AND C.start_time <= %(end_date)s
                 ORDER BY
-                    C.tree_name ASC,
-                    C.git_repository_branch ASC,
-                    C.git_repository_url ASC,
-                    C.origin ASC,
+                    {tree_columns},
                     C.start_time DESC"""
 
 
 def _get_hardware_listing_count_clauses() -> str:
     build_count_clause = """
-    COUNT(DISTINCT CASE WHEN "build_status" = 'PASS' AND build_id
-        NOT LIKE 'maestro:dummy_%%' THEN build_id END) AS pass_builds,
-    COUNT(DISTINCT CASE WHEN "build_status" = 'FAIL' AND build_id
-        NOT LIKE 'maestro:dummy_%%' THEN build_id END) AS fail_builds,
+    COUNT(DISTINCT CASE WHEN "build_status" = 'PASS' AND NOT build_is_dummy
+        THEN build_id END) AS pass_builds,
+    COUNT(DISTINCT CASE WHEN "build_status" = 'FAIL' AND NOT build_is_dummy
+        THEN build_id END) AS fail_builds,
     COUNT(DISTINCT CASE WHEN "build_status" IS NULL AND build_id IS
-        NOT NULL AND build_id NOT LIKE 'maestro:dummy_%%' THEN build_id END)
+        NOT NULL AND NOT build_is_dummy THEN build_id END)
         AS null_builds,
-    COUNT(DISTINCT CASE WHEN "build_status" = 'ERROR' AND build_id
-        NOT LIKE 'maestro:dummy_%%' THEN build_id END) AS error_builds,
-    COUNT(DISTINCT CASE WHEN "build_status" = 'MISS' AND build_id
-        NOT LIKE 'maestro:dummy_%%' THEN build_id END) AS miss_builds,
-    COUNT(DISTINCT CASE WHEN "build_status" = 'DONE' AND build_id
-        NOT LIKE 'maestro:dummy_%%' THEN build_id END) AS done_builds,
-    COUNT(DISTINCT CASE WHEN "build_status" = 'SKIP' AND build_id
-        NOT LIKE 'maestro:dummy_%%' THEN build_id END) AS skip_builds,
+    COUNT(DISTINCT CASE WHEN "build_status" = 'ERROR' AND NOT build_is_dummy
+        THEN build_id END) AS error_builds,
+    COUNT(DISTINCT CASE WHEN "build_status" = 'MISS' AND NOT build_is_dummy
+        THEN build_id END) AS miss_builds,
+    COUNT(DISTINCT CASE WHEN "build_status" = 'DONE' AND NOT build_is_dummy
+        THEN build_id END) AS done_builds,
+    COUNT(DISTINCT CASE WHEN "build_status" = 'SKIP' AND NOT build_is_dummy
+        THEN build_id END) AS skip_builds,
     """
 
     boot_count_clause = """
-    COUNT(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
-                    AND "status" = 'FAIL' THEN 1 END) AS fail_boots,
-    COUNT(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
-                    AND "status" = 'ERROR' THEN 1 END) AS error_boots,
-    COUNT(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
-                    AND "status" = 'MISS' THEN 1 END) AS miss_boots,
-    COUNT(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
-                    AND "status" = 'PASS' THEN 1 END) AS pass_boots,
-    COUNT(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
-                    AND "status" = 'DONE' THEN 1 END) AS done_boots,
-    COUNT(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
-                    AND "status" = 'SKIP' THEN 1 END) AS skip_boots,
-    SUM(CASE WHEN ("path" = 'boot' OR "path" LIKE 'boot.%%')
+    COUNT(CASE WHEN kind = 'boot' AND "status" = 'FAIL' THEN 1 END) AS fail_boots,
+    COUNT(CASE WHEN kind = 'boot' AND "status" = 'ERROR' THEN 1 END) AS error_boots,
+    COUNT(CASE WHEN kind = 'boot' AND "status" = 'MISS' THEN 1 END) AS miss_boots,
+    COUNT(CASE WHEN kind = 'boot' AND "status" = 'PASS' THEN 1 END) AS pass_boots,
+    COUNT(CASE WHEN kind = 'boot' AND "status" = 'DONE' THEN 1 END) AS done_boots,
+    COUNT(CASE WHEN kind = 'boot' AND "status" = 'SKIP' THEN 1 END) AS skip_boots,
+    SUM(CASE WHEN kind = 'boot'
                     AND "status" IS NULL AND id IS NOT NULL THEN 1 ELSE 0 END) AS null_boots,
     """
 
     test_count_clause = """
-    COUNT(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
-                    AND "status" = 'FAIL' THEN 1 END) AS fail_tests,
-    COUNT(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
-                    AND "status" = 'ERROR' THEN 1 END) AS error_tests,
-    COUNT(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
-                    AND "status" = 'MISS' THEN 1 END) AS miss_tests,
-    COUNT(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
-                    AND "status" = 'PASS' THEN 1 END) AS pass_tests,
-    COUNT(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
-                    AND "status" = 'DONE' THEN 1 END) AS done_tests,
-    COUNT(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
-                    AND "status" = 'SKIP' THEN 1 END) AS skip_tests,
-    SUM(CASE WHEN ("path" <> 'boot' AND "path" NOT LIKE 'boot.%%')
+    COUNT(CASE WHEN kind = 'test' AND "status" = 'FAIL' THEN 1 END) AS fail_tests,
+    COUNT(CASE WHEN kind = 'test' AND "status" = 'ERROR' THEN 1 END) AS error_tests,
+    COUNT(CASE WHEN kind = 'test' AND "status" = 'MISS' THEN 1 END) AS miss_tests,
+    COUNT(CASE WHEN kind = 'test' AND "status" = 'PASS' THEN 1 END) AS pass_tests,
+    COUNT(CASE WHEN kind = 'test' AND "status" = 'DONE' THEN 1 END) AS done_tests,
+    COUNT(CASE WHEN kind = 'test' AND "status" = 'SKIP' THEN 1 END) AS skip_tests,
+    SUM(CASE WHEN kind = 'test'
                     AND "status" IS NULL AND id IS NOT NULL THEN 1 ELSE 0 END) AS null_tests
     """
 
@@ -134,11 +122,12 @@ def get_hardware_listing_data(
                     "tests"."environment_compatible" AS hardware,
                     "tests"."environment_misc" ->> 'platform' AS platform,
                     "tests"."status",
-                    "tests"."path",
+                    {get_test_kind_column()} AS kind,
                     "tests"."origin",
                     "tests"."id",
                     b.id AS build_id,
-                    b.status AS build_status
+                    b.status AS build_status,
+                    {get_build_is_dummy_column("b")} AS build_is_dummy
                 FROM
                     tests
                     INNER JOIN builds b ON tests.build_id = b.id
@@ -183,19 +172,19 @@ def get_hardware_details_data(
         "end_date": end_datetime,
     }
 
-    records = get_query_cache(cache_key, tests_cache_params)
-
-    if not records:
-        records = query_records(
+    return get_or_set_query_cache(
+        key=cache_key,
+        params=tests_cache_params,
+        compute=lambda: query_records(
             hardware_id=hardware_id,
             origin=origin,
             trees=trees_with_selected_commits,
             start_date=start_datetime,
             end_date=end_datetime,
-        )
-        set_query_cache(key=cache_key, params=tests_cache_params, rows=records)
-
-    return records
+        ),
+        cacheable=bool,
+        tags=make_cache_tags(hardware_id=hardware_id),
+    )
 
 
 def query_records(
@@ -285,6 +274,75 @@ def query_records(
         return dict_fetchall(cursor)
 
 
+def _query_hardware_trees_data(params: dict) -> list[Tree]:
+    tree_head_clause = _get_hardware_tree_heads_clause(id_only=False)
+
+    # We need a subquery because if we filter by any hardware, it will get the
+    # last head that has that hardware, but not the real head of the trees
+    query = f"""
+    WITH
+        -- Selects the data of the latest checkout of all trees in the given period
+        tree_heads AS (
+            {tree_head_clause}
+        )
+    SELECT DISTINCT
+        ON (
+            TH.tree_name,
+            TH.git_repository_branch,
+            TH.git_repository_url,
+            TH.git_commit_hash
+        ) TH.tree_name,
+        TH.origin,
+        TH.git_repository_branch,
+        TH.git_repository_url,
+        TH.git_commit_name,
+        TH.git_commit_hash,
+        TH.git_commit_tags
+    FROM
+        tests
+        INNER JOIN builds ON tests.build_id = builds.id
+        INNER JOIN tree_heads TH ON builds.checkout_id = TH.id
+    WHERE
+        (
+            (
+                tests.environment_compatible @> ARRAY[%(hardware)s]::TEXT[]
+                OR tests.environment_misc ->> 'platform' = %(hardware)s
+            )
+            AND tests.origin = %(origin)s
+            AND TH.start_time >= %(start_date)s
+            AND TH.start_time <= %(end_date)s
+        )
+    ORDER BY
+        TH.tree_name ASC,
+        TH.git_repository_branch ASC,
+        TH.git_repository_url ASC,
+        TH.git_commit_hash ASC,
+        TH.start_time DESC
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        tree_records = dict_fetchall(cursor)
+
+    trees = []
+    for idx, tree in enumerate(tree_records):
+        trees.append(
+            Tree(
+                index=str(idx),
+                tree_name=tree["tree_name"],
+                origin=tree["origin"],
+                git_repository_branch=tree["git_repository_branch"],
+                git_repository_url=tree["git_repository_url"],
+                head_git_commit_name=tree["git_commit_name"],
+                head_git_commit_hash=tree["git_commit_hash"],
+                head_git_commit_tag=tree["git_commit_tags"],
+                selected_commit_status=None,
+                is_selected=None,
+            )
+        )
+
+    return trees
+
+
 def get_hardware_trees_data(
     *,
     hardware_id: str,
@@ -301,77 +359,13 @@ def get_hardware_trees_data(
         "end_date": end_datetime,
     }
 
-    trees: list[Tree] = get_query_cache(cache_key, params)
-
-    tree_head_clause = _get_hardware_tree_heads_clause(id_only=False)
-
-    if not trees:
-        # We need a subquery because if we filter by any hardware, it will get the
-        # last head that has that hardware, but not the real head of the trees
-        query = f"""
-        WITH
-            -- Selects the data of the latest checkout of all trees in the given period
-            tree_heads AS (
-                {tree_head_clause}
-            )
-        SELECT DISTINCT
-            ON (
-                TH.tree_name,
-                TH.git_repository_branch,
-                TH.git_repository_url,
-                TH.git_commit_hash
-            ) TH.tree_name,
-            TH.origin,
-            TH.git_repository_branch,
-            TH.git_repository_url,
-            TH.git_commit_name,
-            TH.git_commit_hash,
-            TH.git_commit_tags
-        FROM
-            tests
-            INNER JOIN builds ON tests.build_id = builds.id
-            INNER JOIN tree_heads TH ON builds.checkout_id = TH.id
-        WHERE
-            (
-                (
-                    tests.environment_compatible @> ARRAY[%(hardware)s]::TEXT[]
-                    OR tests.environment_misc ->> 'platform' = %(hardware)s
-                )
-                AND tests.origin = %(origin)s
-                AND TH.start_time >= %(start_date)s
-                AND TH.start_time <= %(end_date)s
-            )
-        ORDER BY
-            TH.tree_name ASC,
-            TH.git_repository_branch ASC,
-            TH.git_repository_url ASC,
-            TH.git_commit_hash ASC,
-            TH.start_time DESC
-        """
-        with connection.cursor() as cursor:
-            cursor.execute(query, params)
-            tree_records = dict_fetchall(cursor)
-
-        trees = []
-        for idx, tree in enumerate(tree_records):
-            trees.append(
-                Tree(
-                    index=str(idx),
-                    tree_name=tree["tree_name"],
-                    origin=tree["origin"],
-                    git_repository_branch=tree["git_repository_branch"],
-                    git_repository_url=tree["git_repository_url"],
-                    head_git_commit_name=tree["git_commit_name"],
-                    head_git_commit_hash=tree["git_commit_hash"],
-                    head_git_commit_tag=tree["git_commit_tags"],
-                    selected_commit_status=None,
-                    is_selected=None,
-                )
-            )
-
-        set_query_cache(key=cache_key, params=params, rows=trees)
-
-    return trees
+    return get_or_set_query_cache(
+        key=cache_key,
+        params=params,
+        compute=lambda: _query_hardware_trees_data(params),
+        cacheable=bool,
+        tags=make_cache_tags(hardware_id=hardware_id),
+    )
 
 
 class CommitHeadsQueryParams(TypedDict):
@@ -429,21 +423,20 @@ def get_hardware_commit_history(
         "start_date": start_date,
         "end_date": end_date,
     }
+    tree_columns = get_checkout_tree_columns("c")
 
+    # The commit heads come as text from the request, so the trees are only
+    # looked up by their identity columns here, and by their tree columns after
     raw_query = f"""
         -- Selects the start_time of the latest checkout for the selected trees (+identifier fields)
         WITH filtered_checkouts AS (
             SELECT DISTINCT
-                ON (
-                    tree_name,
-                    git_repository_url,
-                    git_repository_branch,
-                    origin
-                )
-                tree_name,
-                git_repository_url,
-                git_repository_branch,
-                start_time
+                ON ({tree_columns})
+                {tree_columns},
+                c.tree_name AS head_tree_name,
+                c.git_repository_url AS head_git_repository_url,
+                c.git_repository_branch AS head_git_repository_branch,
+                c.start_time
             FROM
                 checkouts c
             WHERE
@@ -455,18 +448,15 @@ def get_hardware_commit_history(
                 ) IN {commit_heads_params['tuple_str']}
                 AND c.origin = %(origin)s
             ORDER BY
-                tree_name,
-                git_repository_url,
-                git_repository_branch,
-                origin,
+                {tree_columns},
                 c.start_time
         )
         -- Selects the data from all checkouts prior to the "head checkout" of
         -- the selected trees (while also limiting by the queried timestamps)
         SELECT
-            fc.tree_name AS tree_name,
-            fc.git_repository_url AS git_repository_url,
-            fc.git_repository_branch AS git_repository_branch,
+            fc.head_tree_name AS tree_name,
+            fc.head_git_repository_url AS git_repository_url,
+            fc.head_git_repository_branch AS git_repository_branch,
             lateralus.git_commit_tags AS git_commit_tags,
             lateralus.git_commit_name AS git_commit_name,
             lateralus.git_commit_hash AS git_commit_hash,
@@ -483,9 +473,7 @@ def get_hardware_commit_history(
                 FROM
                     checkouts c
                 WHERE
-                    c.tree_name = fc.tree_name
-                    AND c.git_repository_branch = fc.git_repository_branch
-                    AND c.git_repository_url = fc.git_repository_url
+                    {get_checkout_tree_join("c", "fc")}
                     AND c.start_time <= fc.start_time
                     AND c.start_time >= %(start_date)s
                     AND c.start_time <= %(end_date)s
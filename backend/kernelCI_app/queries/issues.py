@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any, Optional
 from django.db import connection, connections
-from kernelCI_app.cache import get_query_cache, set_query_cache
+from kernelCI_app.cache import get_or_set_query_cache_many, make_cache_tags
 from kernelCI_app.helpers.database import dict_fetchall
 from kernelCI_app.models import Issues
 
@@ -222,92 +222,86 @@ def get_test_issues(*, test_id: str) -> list[dict]:
     return rows
 
 
-def get_issue_first_seen_data(*, issue_id_list: list[str]) -> list[dict]:
-    """
-    Retrieves the incident and checkout data
-    of the first incident of a list of issues
-    through a list of `issue_id`s.
-    """
-
-    if not issue_id_list:
-        return []
+def _query_issue_first_seen_data(issue_id_list: list[str]) -> list[dict]:
+    if len(issue_id_list) == 1:
+        comparison = "= %s"
+    else:
+        placeholders = ", ".join(["%s"] * len(issue_id_list))
+        comparison = f"IN ({placeholders})"
 
-    cache_key = "issue_first_seen"
-    params = {"issue_id_list": issue_id_list}
-    records = get_query_cache(key=cache_key, params=params)
-
-    if records is None:
-        if len(issue_id_list) == 1:
-            comparison = "= %s"
-        else:
-            placeholders = ", ".join(["%s"] * len(issue_id_list))
-            comparison = f"IN ({placeholders})"
-
-        query = f"""
-            WITH first_incident AS (
-                SELECT DISTINCT
-                    ON (IC.issue_id) IC.id
-                FROM
-                    incidents IC
-                WHERE
-                    IC.issue_id {comparison}
-                ORDER BY
-                    IC.issue_id,
-                    IC.issue_version ASC,
-                    IC._timestamp ASC
-            )
-            SELECT
-                IC.id,
-                IC.issue_id,
-                IC._timestamp AS first_seen,
-                IC.issue_version,
-                C.git_commit_hash,
-                C.git_repository_url,
-                C.git_repository_branch,
-                C.git_commit_name,
-                C.tree_name,
-                C.id as checkout_id
+    query = f"""
+        WITH first_incident AS (
+            SELECT DISTINCT
+                ON (IC.issue_id) IC.id
             FROM
                 incidents IC
-            LEFT JOIN tests T ON IC.test_id = T.id
-            LEFT JOIN builds B ON (
-                IC.build_id = B.id
-                OR T.build_id = B.id
-            )
-            LEFT JOIN checkouts C ON B.checkout_id = C.id
-            JOIN first_incident FI ON IC.id = FI.id
-        """
+            WHERE
+                IC.issue_id {comparison}
+            ORDER BY
+                IC.issue_id,
+                IC.issue_version ASC,
+                IC._timestamp ASC
+        )
+        SELECT
+            IC.id,
+            IC.issue_id,
+            IC._timestamp AS first_seen,
+            IC.issue_version,
+            C.git_commit_hash,
+            C.git_repository_url,
+            C.git_repository_branch,
+            C.git_commit_name,
+            C.tree_name,
+            C.id as checkout_id
+        FROM
+            incidents IC
+        LEFT JOIN tests T ON IC.test_id = T.id
+        LEFT JOIN builds B ON (
+            IC.build_id = B.id
+            OR T.build_id = B.id
+        )
+        LEFT JOIN checkouts C ON B.checkout_id = C.id
+        JOIN first_incident FI ON IC.id = FI.id
+    """
 
-        with connection.cursor() as cursor:
-            cursor.execute(query, issue_id_list)
-            records = dict_fetchall(cursor)
+    with connection.cursor() as cursor:
+        cursor.execute(query, issue_id_list)
+        return dict_fetchall(cursor)
 
-        set_query_cache(key=cache_key, params=params, rows=records)
 
-    return records
+def _query_issue_first_seen_per_issue(
+    issue_id_list: list[str],
+) -> dict[str, list[dict]]:
+    records_per_issue: dict[str, list[dict]] = {
+        issue_id: [] for issue_id in issue_id_list
+    }
+    for record in _query_issue_first_seen_data(issue_id_list):
+        records_per_issue[record["issue_id"]].append(record)
+    return records_per_issue
 
 
-def get_issue_trees_data(
-    *, issue_key_list: list[tuple[str, int]]
-) -> list[dict[str, Any]]:
+def get_issue_first_seen_data(*, issue_id_list: list[str]) -> list[dict]:
     """
-    Retrieves the list of trees in which a list of issues appears
-    through a list of tuples `issue_id, issue_version`.
-
-    If an `(issue_id, issue_version)` doesn't exist,
-    the entry for that won't be returned.
-
-    However, if an (issue_id, issue_version) exists but has no incidents,
-    a row with the issue_id will be returned but the incident_issue_id will be null
-
-    Returns:
-        - A list of entries with the issue_id, issue_version, checkout data,
-          and incident_issue_id and incident_issue_version
+    Retrieves the incident and checkout data
+    of the first incident of a list of issues
+    through a list of `issue_id`s.
     """
 
-    if not issue_key_list:
+    if not issue_id_list:
         return []
 
+    records_per_issue = get_or_set_query_cache_many(
+        key="issue_first_seen",
+        items=issue_id_list,
+        compute=_query_issue_first_seen_per_issue,
+        get_tags=lambda issue_id: make_cache_tags(issue_id=issue_id),
+    )
+    return [record for records in records_per_issue.values() for record in records]
+
+
+def _query_issue_trees_data(
+    issue_key_list: list[tuple[str, int]],
+) -> list[dict[str, Any]]:
     tuple_param_list = []
     params = {}
 
@@ -361,6 +355,46 @@ def get_issue_trees_data(
 
     with connections["default"].cursor() as cursor:
         cursor.execute(query, params)
-        records = dict_fetchall(cursor)
+        return dict_fetchall(cursor)
+
+
+def _query_issue_trees_per_issue(
+    issue_key_list: list[tuple[str, int]],
+) -> dict[tuple[str, int], list[dict[str, Any]]]:
+    records_per_issue: dict[tuple[str, int], list[dict[str, Any]]] = {
+        issue_key: [] for issue_key in issue_key_list
+    }
+    for record in _query_issue_trees_data(issue_key_list):
+        issue_key = (record["issue_id"], record["issue_version"])
+        records_per_issue.setdefault(issue_key, []).append(record)
+    return records_per_issue
+
+
+def get_issue_trees_data(
+    *, issue_key_list: list[tuple[str, int]]
+) -> list[dict[str, Any]]:
+    """
+    Retrieves the list of trees in which a list of issues appears
+    through a list of tuples `issue_id, issue_version`.
+
+    If an `(issue_id, issue_version)` doesn't exist,
+    the entry for that won't be returned.
+
+    However, if an (issue_id, issue_version) exists but has no incidents,
+    a row with the issue_id will be returned but the incident_issue_id will be null
 
-    return records
+    Returns:
+        - A list of entries with the issue_id, issue_version, checkout data,
+          and incident_issue_id and incident_issue_version
+    """
+
+    if not issue_key_list:
+        return []
+
+    records_per_issue = get_or_set_query_cache_many(
+        key="issue_trees",
+        items=[(issue_id, issue_version) for issue_id, issue_version in issue_key_list],
+        compute=_query_issue_trees_per_issue,
+        get_tags=lambda issue_key: make_cache_tags(issue_id=issue_key[0]),
+    )
+    return [record for records in records_per_issue.values() for record in records]
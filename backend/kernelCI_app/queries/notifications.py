@@ -4,7 +4,11 @@
 import sys
 from django.db import connection, connections
 
-from kernelCI_app.helpers.database import dict_fetchall
+from kernelCI_app.helpers.database import (
+    dict_fetchall,
+    get_checkout_tree_columns,
+    get_checkout_tree_join,
+)
 from kernelCI_app.queries.tree import get_tree_listing_query
 
 
@@ -380,18 +384,17 @@ def get_checkout_summary_data(
     if not tuple_params:
         return []
 
+    tree_columns = get_checkout_tree_columns("C")
+
     with_clause = f"""
             WITH
                 ORDERED_CHECKOUTS_BY_TREE AS (
                     SELECT
-                        C.GIT_REPOSITORY_BRANCH,
-                        C.GIT_REPOSITORY_URL,
+                        {tree_columns},
                         C.GIT_COMMIT_HASH,
-                        C.ORIGIN,
                         ROW_NUMBER() OVER (
                             PARTITION BY
-                                C.GIT_REPOSITORY_BRANCH,
-                                C.GIT_REPOSITORY_URL
+                                {tree_columns}
                             ORDER BY
                                 C.START_TIME DESC
                         ) AS TIME_ORDER
@@ -412,10 +415,7 @@ def get_checkout_summary_data(
                 ),
                 FIRST_TREE_CHECKOUT AS (
                     SELECT
-                        GIT_REPOSITORY_BRANCH,
-                        GIT_REPOSITORY_URL,
-                        GIT_COMMIT_HASH,
-                        ORIGIN
+                        *
                     FROM
                         ORDERED_CHECKOUTS_BY_TREE
                     WHERE
@@ -423,12 +423,10 @@ def get_checkout_summary_data(
                 )
     """
 
-    join_clause = """
+    join_clause = f"""
                 JOIN FIRST_TREE_CHECKOUT FTC ON (
-                    checkouts.git_repository_branch IS NOT DISTINCT FROM FTC.GIT_REPOSITORY_BRANCH
-                    AND checkouts.git_repository_url IS NOT DISTINCT FROM FTC.GIT_REPOSITORY_URL
+                    {get_checkout_tree_join("checkouts", "FTC")}
                     AND checkouts.git_commit_hash = FTC.GIT_COMMIT_HASH
-                    AND checkouts.origin = FTC.ORIGIN
                 )
     """
 
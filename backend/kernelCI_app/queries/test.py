@@ -1,7 +1,9 @@
 from typing import Optional
 
+from django.conf import settings
 from django.db import connection
-from kernelCI_app.helpers.database import dict_fetchall
+from django.db.models.expressions import RawSQL
+from kernelCI_app.helpers.database import dict_fetchall, get_test_series_query
 from kernelCI_app.models import Tests
 from kernelCI_app.typeModels.databases import (
     Origin,
@@ -63,24 +65,41 @@ def get_test_status_history(
     field_timestamp: Timestamp,
     group_size: int,
 ):
-    query = Tests.objects.filter(
-        path=path,
-        build__checkout__origin=origin,
-        build__checkout__git_repository_url=git_repository_url,
-        build__checkout__git_repository_branch=git_repository_branch,
-        build__config_name=config_name,
-    ).values(
+    if settings.USE_DASHBOARD_DB and settings.USE_TEST_SERIES:
+        # The series stands for all the filters of the else branch, so the history
+        # is a single range of the (series, start_time) index, without filtering the
+        # joined builds and checkouts
+        series_params = (
+            origin,
+            git_repository_url,
+            git_repository_branch,
+            config_name,
+            path,
+            platform,
+        )
+        query = Tests.objects.filter(
+            series=RawSQL(get_test_series_query(), series_params)
+        )
+    else:
+        query = Tests.objects.filter(
+            path=path,
+            build__checkout__origin=origin,
+            build__checkout__git_repository_url=git_repository_url,
+            build__checkout__git_repository_branch=git_repository_branch,
+            build__config_name=config_name,
+        )
+        if platform is None:
+            query = query.filter(environment_misc__platform__isnull=True)
+        else:
+            query = query.filter(environment_misc__platform=platform)
+
+    query = query.values(
         "start_time",
         "id",
         "status",
         "build__checkout__git_commit_hash",
     )
 
-    if platform is None:
-        query = query.filter(environment_misc__platform__isnull=True)
-    else:
-        query = query.filter(environment_misc__platform=platform)
-
     if test_start_time is None:
         if field_timestamp is None:
             query = query.filter(
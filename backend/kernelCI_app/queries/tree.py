@@ -2,62 +2,59 @@ from typing import Optional
 from django.db import connection
 from django.db.models import Q
 
-from kernelCI_app.helpers.database import dict_fetchall
+from kernelCI_app.helpers.database import (
+    dict_fetchall,
+    get_build_is_dummy_column,
+    get_checkout_tree_columns,
+    get_checkout_tree_join,
+    get_test_kind_column,
+)
 from kernelCI_app.models import Checkouts
 from kernelCI_app.utils import get_query_time_interval
-from kernelCI_app.cache import get_query_cache, set_query_cache
+from kernelCI_app.cache import get_or_set_query_cache, make_cache_tags
 from kernelCI_app.helpers.treeDetails import create_checkouts_where_clauses
 
 
 def _get_tree_listing_count_clause() -> str:
-    build_count_clause = """
-        COUNT(DISTINCT CASE WHEN (builds.status = 'PASS' AND builds.id NOT LIKE 'maestro:dummy_%%')
+    not_dummy = f"NOT {get_build_is_dummy_column()}"
+    kind = get_test_kind_column()
+
+    build_count_clause = f"""
+        COUNT(DISTINCT CASE WHEN (builds.status = 'PASS' AND {not_dummy})
             THEN builds.id END) AS pass_builds,
-        COUNT(DISTINCT CASE WHEN (builds.status = 'FAIL' AND builds.id NOT LIKE 'maestro:dummy_%%')
+        COUNT(DISTINCT CASE WHEN (builds.status = 'FAIL' AND {not_dummy})
             THEN builds.id END) AS fail_builds,
         COUNT(DISTINCT CASE WHEN (builds.status IS NULL AND builds.id IS NOT NULL
-            AND builds.id NOT LIKE 'maestro:dummy_%%') THEN builds.id END) AS null_builds,
-        COUNT(DISTINCT CASE WHEN (builds.status = 'ERROR' AND builds.id NOT LIKE 'maestro:dummy_%%')
+            AND {not_dummy}) THEN builds.id END) AS null_builds,
+        COUNT(DISTINCT CASE WHEN (builds.status = 'ERROR' AND {not_dummy})
             THEN builds.id END) AS error_builds,
-        COUNT(DISTINCT CASE WHEN (builds.status = 'MISS' AND builds.id NOT LIKE 'maestro:dummy_%%')
+        COUNT(DISTINCT CASE WHEN (builds.status = 'MISS' AND {not_dummy})
             THEN builds.id END) AS miss_builds,
-        COUNT(DISTINCT CASE WHEN (builds.status = 'DONE' AND builds.id NOT LIKE 'maestro:dummy_%%')
+        COUNT(DISTINCT CASE WHEN (builds.status = 'DONE' AND {not_dummy})
             THEN builds.id END) AS done_builds,
-        COUNT(DISTINCT CASE WHEN (builds.status = 'SKIP' AND builds.id NOT LIKE 'maestro:dummy_%%')
+        COUNT(DISTINCT CASE WHEN (builds.status = 'SKIP' AND {not_dummy})
             THEN builds.id END) AS skip_builds,
     """
 
-    test_count_clause = """
-        COUNT(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
-            AND tests.status = 'FAIL' THEN 1 END) AS fail_tests,
-        COUNT(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
-            AND tests.status = 'ERROR' THEN 1 END) AS error_tests,
-        COUNT(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
-            AND tests.status = 'MISS' THEN 1 END) AS miss_tests,
-        COUNT(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
-            AND tests.status = 'PASS' THEN 1 END) AS pass_tests,
-        COUNT(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
-            AND tests.status = 'DONE' THEN 1 END) AS done_tests,
-        COUNT(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
-            AND tests.status = 'SKIP' THEN 1 END) AS skip_tests,
-        SUM(CASE WHEN (tests.path <> 'boot' AND tests.path NOT LIKE 'boot.%%')
+    test_count_clause = f"""
+        COUNT(CASE WHEN {kind} = 'test' AND tests.status = 'FAIL' THEN 1 END) AS fail_tests,
+        COUNT(CASE WHEN {kind} = 'test' AND tests.status = 'ERROR' THEN 1 END) AS error_tests,
+        COUNT(CASE WHEN {kind} = 'test' AND tests.status = 'MISS' THEN 1 END) AS miss_tests,
+        COUNT(CASE WHEN {kind} = 'test' AND tests.status = 'PASS' THEN 1 END) AS pass_tests,
+        COUNT(CASE WHEN {kind} = 'test' AND tests.status = 'DONE' THEN 1 END) AS done_tests,
+        COUNT(CASE WHEN {kind} = 'test' AND tests.status = 'SKIP' THEN 1 END) AS skip_tests,
+        SUM(CASE WHEN {kind} = 'test'
             AND tests.status IS NULL AND tests.id IS NOT NULL THEN 1 ELSE 0 END) AS null_tests,
     """
 
-    boot_count_clause = """
-        COUNT(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
-            AND tests.status = 'FAIL' THEN 1 END) AS fail_boots,
-        COUNT(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
-            AND tests.status = 'ERROR' THEN 1 END) AS error_boots,
-        COUNT(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
-            AND tests.status = 'MISS' THEN 1 END) AS miss_boots,
-        COUNT(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
-            AND tests.status = 'PASS' THEN 1 END) AS pass_boots,
-        COUNT(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
-            AND tests.status = 'DONE' THEN 1 END) AS done_boots,
-        COUNT(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
-            AND tests.status = 'SKIP' THEN 1 END) AS skip_boots,
-        SUM(CASE WHEN (tests.path = 'boot' OR tests.path LIKE 'boot.%%')
+    boot_count_clause = f"""
+        COUNT(CASE WHEN {kind} = 'boot' AND tests.status = 'FAIL' THEN 1 END) AS fail_boots,
+        COUNT(CASE WHEN {kind} = 'boot' AND tests.status = 'ERROR' THEN 1 END) AS error_boots,
+        COUNT(CASE WHEN {kind} = 'boot' AND tests.status = 'MISS' THEN 1 END) AS miss_boots,
+        COUNT(CASE WHEN {kind} = 'boot' AND tests.status = 'PASS' THEN 1 END) AS pass_boots,
+        COUNT(CASE WHEN {kind} = 'boot' AND tests.status = 'DONE' THEN 1 END) AS done_boots,
+        COUNT(CASE WHEN {kind} = 'boot' AND tests.status = 'SKIP' THEN 1 END) AS skip_boots,
+        SUM(CASE WHEN {kind} = 'boot'
             AND tests.status IS NULL AND tests.id IS NOT NULL THEN 1 ELSE 0 END) AS null_boots,
     """
 
@@ -121,18 +118,18 @@ def get_tree_listing_data(origin: str, interval_in_days: int) -> Optional[list[d
         "interval_param": interval_in_days,
     }
 
+    tree_columns = get_checkout_tree_columns()
+
     # TODO: reuse the FIRST_TREE_CHECKOUT query
-    with_clause = """
+    with_clause = f"""
             WITH
                 ORDERED_CHECKOUTS_BY_TREE AS (
                     SELECT
-                        GIT_REPOSITORY_BRANCH,
-                        GIT_REPOSITORY_URL,
+                        {tree_columns},
                         GIT_COMMIT_HASH,
                         ROW_NUMBER() OVER (
                             PARTITION BY
-                                GIT_REPOSITORY_BRANCH,
-                                GIT_REPOSITORY_URL
+                                {tree_columns}
                             ORDER BY
                                 START_TIME DESC
                         ) AS TIME_ORDER
@@ -144,9 +141,7 @@ def get_tree_listing_data(origin: str, interval_in_days: int) -> Optional[list[d
                 ),
                 FIRST_TREE_CHECKOUT AS (
                     SELECT
-                        GIT_REPOSITORY_BRANCH,
-                        GIT_REPOSITORY_URL,
-                        GIT_COMMIT_HASH
+                        *
                     FROM
                         ORDERED_CHECKOUTS_BY_TREE
                     WHERE
@@ -154,13 +149,9 @@ def get_tree_listing_data(origin: str, interval_in_days: int) -> Optional[list[d
                 )
     """
 
-    # The JOIN FTC with IS NOT DISTINCT FROM is necessary because the fields can be NULL,
-    # in which case a simple `WHERE (git_branch, git_url, git_hash) IN FTC` wouldn't work
-    # since the NULL comparison would return UNKNOWN
-    join_clause = """
+    join_clause = f"""
                 JOIN FIRST_TREE_CHECKOUT FTC ON (
-                    checkouts.git_repository_branch IS NOT DISTINCT FROM FTC.GIT_REPOSITORY_BRANCH
-                    AND checkouts.git_repository_url IS NOT DISTINCT FROM FTC.GIT_REPOSITORY_URL
+                    {get_checkout_tree_join("checkouts", "FTC")}
                     AND checkouts.git_commit_hash = FTC.GIT_COMMIT_HASH
                 )
     """
@@ -212,10 +203,7 @@ def get_tree_listing_fast(
                 origin_builds_finish_time,
                 origin_tests_finish_time,
                 ROW_NUMBER() OVER (
-                    PARTITION BY
-                        git_repository_branch,
-                        git_repository_url,
-                        origin
+                    PARTITION BY {get_checkout_tree_columns()}
                     ORDER BY start_time DESC
                 ) AS time_order
             FROM
@@ -290,6 +278,116 @@ def get_tree_listing_data_by_checkout_id(*, checkout_ids: list[str]):
         return dict_fetchall(cursor=cursor)
 
 
+def _query_tree_details_data(
+    *,
+    params: dict[str, Optional[str]],
+    git_url_param: Optional[str],
+    git_branch_param: Optional[str],
+    tree_name: Optional[str],
+) -> list[tuple]:
+    checkout_clauses = create_checkouts_where_clauses(
+        git_url=git_url_param,
+        git_branch=git_branch_param,
+        tree_name=tree_name,
+    )
+
+    git_branch_clause = checkout_clauses.get("git_branch_clause")
+    tree_name_clause = checkout_clauses.get("tree_name_clause")
+    git_url_clause = checkout_clauses.get("git_url_clause")
+    tree_name_full_clause = "AND " + tree_name_clause if tree_name_clause else ""
+    git_url_full_clause = "AND " + git_url_clause if git_url_clause else ""
+
+    query = f"""
+    WITH RELEVANT_HASH AS (
+        SELECT
+            c.git_commit_hash
+        FROM
+            checkouts c
+        WHERE
+            c.git_commit_hash = %(commit_hash)s
+            OR c.git_commit_tags @> ARRAY[%(commit_hash)s]::TEXT[]
+        ORDER BY
+            c._timestamp DESC
+        LIMIT 1
+    )
+    SELECT
+            tests.id AS tests_id,
+            tests.origin,
+            tests.environment_comment AS tests_environment_comment,
+            tests.environment_misc AS tests_environment_misc,
+            tests.path AS tests_path,
+            tests.comment AS tests_comment,
+            tests.log_url AS tests_log_url,
+            tests.status AS tests_status,
+            tests.start_time AS tests_start_time,
+            tests.duration AS tests_duration,
+            tests.number_value AS tests_number_value,
+            tests.misc AS tests_misc,
+            tests.environment_compatible AS tests_environment_compatible,
+            builds_filter.*,
+            incidents.id AS incidents_id,
+            incidents.test_id AS incidents_test_id,
+            incidents.present AS incidents_present,
+            issues.id AS issues_id,
+            issues.version AS issues_version,
+            issues.comment AS issues_comment,
+            issues.report_url AS issues_report_url
+    FROM
+        (
+            SELECT
+                builds.id AS builds_id,
+                builds.origin,
+                builds.comment AS builds_comment,
+                builds.start_time AS builds_start_time,
+                builds.duration AS builds_duration,
+                builds.architecture AS builds_architecture,
+                builds.command AS builds_command,
+                builds.compiler AS builds_compiler,
+                builds.config_name AS builds_config_name,
+                builds.config_url AS builds_config_url,
+                builds.log_url AS builds_log_url,
+                builds.status AS builds_valid,
+                builds.misc AS builds_misc,
+                tree_head.*
+            FROM
+                (
+                    SELECT
+                        checkouts.id AS checkout_id,
+                        checkouts.git_repository_url AS checkouts_git_repository_url,
+                        checkouts.git_repository_branch AS checkouts_git_repository_branch,
+                        checkouts.git_commit_tags,
+                        checkouts.origin as checkouts_origin
+                    FROM
+                        checkouts
+                    WHERE
+                        checkouts.git_commit_hash = (
+                            SELECT git_commit_hash FROM RELEVANT_HASH
+                        )
+                        {git_url_full_clause}
+                        {tree_name_full_clause}
+                        AND {git_branch_clause}
+                        AND checkouts.origin = %(origin_param)s
+                ) AS tree_head
+            LEFT JOIN builds
+                ON tree_head.checkout_id = builds.checkout_id
+        ) AS builds_filter
+    LEFT JOIN tests
+        ON builds_filter.builds_id = tests.build_id
+    LEFT JOIN incidents
+        ON tests.id = incidents.test_id OR
+           builds_filter.builds_id = incidents.build_id
+    LEFT JOIN issues
+        ON incidents.issue_id = issues.id
+        AND incidents.issue_version = issues.version
+    ORDER BY
+        issues."_timestamp" DESC
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
 def get_tree_details_data(
     *,
     origin_param: str,
@@ -308,112 +406,19 @@ def get_tree_details_data(
         "git_branch_param": git_branch_param,
     }
 
-    rows = get_query_cache(cache_key, params)
-    if rows is None:
-        checkout_clauses = create_checkouts_where_clauses(
-            git_url=git_url_param,
-            git_branch=git_branch_param,
+    return get_or_set_query_cache(
+        key=cache_key,
+        params=params,
+        compute=lambda: _query_tree_details_data(
+            params=params,
+            git_url_param=git_url_param,
+            git_branch_param=git_branch_param,
             tree_name=tree_name,
-        )
-
-        git_branch_clause = checkout_clauses.get("git_branch_clause")
-        tree_name_clause = checkout_clauses.get("tree_name_clause")
-        git_url_clause = checkout_clauses.get("git_url_clause")
-        tree_name_full_clause = "AND " + tree_name_clause if tree_name_clause else ""
-        git_url_full_clause = "AND " + git_url_clause if git_url_clause else ""
-
-        query = f"""
-        WITH RELEVANT_HASH AS (
-            SELECT
-                c.git_commit_hash
-            FROM
-                checkouts c
-            WHERE
-                c.git_commit_hash = %(commit_hash)s
-                OR %(commit_hash)s = ANY (c.git_commit_tags)
-            ORDER BY
-                c._timestamp DESC
-            LIMIT 1
-        )
-        SELECT
-                tests.id AS tests_id,
-                tests.origin,
-                tests.environment_comment AS tests_environment_comment,
-                tests.environment_misc AS tests_environment_misc,
-                tests.path AS tests_path,
-                tests.comment AS tests_comment,
-                tests.log_url AS tests_log_url,
-                tests.status AS tests_status,
-                tests.start_time AS tests_start_time,
-                tests.duration AS tests_duration,
-                tests.number_value AS tests_number_value,
-                tests.misc AS tests_misc,
-                tests.environment_compatible AS tests_environment_compatible,
-                builds_filter.*,
-                incidents.id AS incidents_id,
-                incidents.test_id AS incidents_test_id,
-                incidents.present AS incidents_present,
-                issues.id AS issues_id,
-                issues.version AS issues_version,
-                issues.comment AS issues_comment,
-                issues.report_url AS issues_report_url
-        FROM
-            (
-                SELECT
-                    builds.id AS builds_id,
-                    builds.origin,
-                    builds.comment AS builds_comment,
-                    builds.start_time AS builds_start_time,
-                    builds.duration AS builds_duration,
-                    builds.architecture AS builds_architecture,
-                    builds.command AS builds_command,
-                    builds.compiler AS builds_compiler,
-                    builds.config_name AS builds_config_name,
-                    builds.config_url AS builds_config_url,
-                    builds.log_url AS builds_log_url,
-                    builds.status AS builds_valid,
-                    builds.misc AS builds_misc,
-                    tree_head.*
-                FROM
-                    (
-                        SELECT
-                            checkouts.id AS checkout_id,
-                            checkouts.git_repository_url AS checkouts_git_repository_url,
-                            checkouts.git_repository_branch AS checkouts_git_repository_branch,
-                            checkouts.git_commit_tags,
-                            checkouts.origin as checkouts_origin
-                        FROM
-                            checkouts
-                        WHERE
-                            checkouts.git_commit_hash = (
-                                SELECT git_commit_hash FROM RELEVANT_HASH
-                            )
-                            {git_url_full_clause}
-                            {tree_name_full_clause}
-                            AND {git_branch_clause}
-                            AND checkouts.origin = %(origin_param)s
-                    ) AS tree_head
-                LEFT JOIN builds
-                    ON tree_head.checkout_id = builds.checkout_id
-            ) AS builds_filter
-        LEFT JOIN tests
-            ON builds_filter.builds_id = tests.build_id
-        LEFT JOIN incidents
-            ON tests.id = incidents.test_id OR
-               builds_filter.builds_id = incidents.build_id
-        LEFT JOIN issues
-            ON incidents.issue_id = issues.id
-            AND incidents.issue_version = issues.version
-        ORDER BY
-            issues."_timestamp" DESC
-        """
-
-        with connection.cursor() as cursor:
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            set_query_cache(key=cache_key, params=params, rows=rows)
-
-    return rows
+        ),
+        # The commit may be given by one of its git tags, which the ingester
+        # invalidates along with the hash
+        tags=make_cache_tags(commit_hash=commit_hash),
+    )
 
 
 GIT_BRANCH_FIELD = "git_repository_branch"
@@ -500,7 +505,7 @@ def get_tree_commit_history(
             checkouts
         WHERE
             (git_commit_hash = %(commit_hash)s
-            OR %(commit_hash)s = ANY(checkouts.git_commit_tags))
+            OR checkouts.git_commit_tags @> ARRAY[%(commit_hash)s]::TEXT[])
             AND origin = %(origin_param)s
             AND {git_branch_clause}
             {git_url_full_clause}
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from kernelCI_app.management.commands.helpers import cache_invalidation
+from kernelCI_app.management.commands.helpers.cache_invalidation import (
+    collect_submission_ids,
+    get_queued_ids,
+    get_submission_cache_tags,
+    invalidate_submission_caches,
+)
+
+
+class TestCollectSubmissionIds:
+    def test_collects_ids_from_raw_and_filtered_submissions(self):
+        raw = {
+            "checkouts": [
+                {
+                    "id": "maestro:c1",
+                    "git_commit_hash": "abc",
+                    "git_commit_tags": ["v6.15"],
+                }
+            ],
+            "tests": [
+                {
+                    "id": "maestro:t1",
+                    "build_id": "maestro:b1",
+                    "environment": {"misc": {"platform": "rpi4"}},
+                }
+            ],
+        }
+        filtered = {
+            "builds": [{"id": "maestro:b2", "checkout_id": "maestro:c2"}],
+            "tests": [
+                {
+                    "id": "maestro:t2",
+                    "build_id": "maestro:b2",
+                    "environment_misc": None,
+                    "environment_compatible": ["juno"],
+                }
+            ],
+            "incidents": [
+                {"id": "maestro:i1", "issue_id": "maestro:x", "test_id": "maestro:t3"}
+            ],
+        }
+
+        ids = collect_submission_ids([raw, filtered])
+
+        assert ids["commit_hashes"] == {"abc", "v6.15"}
+        assert ids["checkout_ids"] == {"maestro:c1", "maestro:c2"}
+        assert ids["build_ids"] == {"maestro:b1", "maestro:b2"}
+        assert ids["hardware_ids"] == {"rpi4", "juno"}
+        assert ids["issue_ids"] == {"maestro:x"}
+        assert ids["incident_test_ids"] == {"maestro:t3"}
+
+
+class TestGetSubmissionCacheTags:
+    def test_only_tags_the_kinds_queries_are_cached_under(self):
+        ids = collect_submission_ids(
+            [{"issues": [{"id": "maestro:x"}], "tests": [{"id": "maestro:t1"}]}]
+        )
+
+        with patch.object(cache_invalidation, "query_related_ids") as query:
+            tags = get_submission_cache_tags(ids)
+
+        query.assert_not_called()
+        assert tags == {"issue:maestro:x"}
+
+
+class TestInvalidateSubmissionCaches:
+    def test_queues_the_ids_without_invalidating(self):
+        submission = {"checkouts": [{"id": "maestro:c1", "git_commit_hash": "abc"}]}
+
+        with patch.object(
+            cache_invalidation, "start_invalidation_thread"
+        ), patch.object(cache_invalidation, "invalidate_cache_tags") as invalidate:
+            invalidate_submission_caches([submission])
+            invalidate_submission_caches([{"issues": [{"id": "maestro:x"}]}])
+            ids = get_queued_ids()
+
+        invalidate.assert_not_called()
+        assert ids["commit_hashes"] == {"abc"}
+        assert ids["checkout_ids"] == {"maestro:c1"}
+        assert ids["issue_ids"] == {"maestro:x"}
+        assert cache_invalidation.invalidation_queue.empty()
@@ -0,0 +1,491 @@
+from datetime import datetime, timezone
+import gzip
+import hashlib
+import json
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.test import RequestFactory
+import pytest
+
+from kernelCI_app import cache as cache_module
+from kernelCI_app.cache import (
+    CACHE_KEY_PREFIX,
+    cache_view,
+    get_cache_key,
+    get_or_set_query_cache,
+    get_or_set_query_cache_many,
+    invalidate_cache_tags,
+    make_cache_tags,
+)
+from kernelCI_app.helpers.cacheValues import (
+    ColumnarRows,
+    decode_cache_value,
+    encode_cache_value,
+    to_columnar,
+)
+from kernelCI_app.helpers.hardwareDetails import get_hardware_details_cache_params
+from kernelCI_app.helpers.localCache import LocalCache
+from kernelCI_app.typeModels.hardwareDetails import Tree
+from kernelCI_app.utils import quantize_time_window
+
+TREE = Tree(
+    index="0",
+    origin="maestro",
+    tree_name="mainline",
+    git_repository_branch="master",
+    git_repository_url="https://git.kernel.org/torvalds/linux.git",
+    head_git_commit_name="v6.15",
+    head_git_commit_hash="abc",
+    head_git_commit_tag=[],
+    selected_commit_status=None,
+    is_selected=True,
+)
+
+
+class TestGetCacheKey:
+    def test_key_has_version_prefix_and_family(self):
+        assert get_cache_key("origins_query") == f"{CACHE_KEY_PREFIX}:origins_query"
+        assert get_cache_key("treeDetails", {"a": 1}).startswith(
+            f"{CACHE_KEY_PREFIX}:treeDetails:"
+        )
+
+    def test_key_is_deterministic_and_ignores_params_order(self):
+        params = {
+            "hardware_id": "rpi4",
+            "trees": [TREE],
+            "start_date": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        }
+        reordered = dict(reversed(list(params.items())))
+
+        assert get_cache_key("hardware", params) == get_cache_key("hardware", reordered)
+        assert get_cache_key("hardware", params) == get_cache_key(
+            "hardware", {**params, "trees": [TREE.model_copy()]}
+        )
+
+    def test_key_depends_on_param_names_and_values(self):
+        assert get_cache_key("tree", {"a": 1, "b": 2}) != get_cache_key(
+            "tree", {"a": 2, "b": 1}
+        )
+        assert get_cache_key("tree", {"a": 1}) != get_cache_key("tree", {"b": 1})
+        modified_tree = TREE.model_copy(update={"head_git_commit_hash": "def"})
+        assert get_cache_key("hardware", {"trees": [TREE]}) != get_cache_key(
+            "hardware", {"trees": [modified_tree]}
+        )
+
+    def test_key_does_not_depend_on_the_process(self):
+        digest = hashlib.sha256(b'{"a":"x","b":1}').hexdigest()
+
+        assert get_cache_key("tree", {"b": 1, "a": "x"}) == (
+            f"{CACHE_KEY_PREFIX}:tree:{digest}"
+        )
+
+
+class TestMakeCacheTags:
+    def test_accepts_single_values_and_collections(self):
+        assert make_cache_tags(
+            commit_hash="abc", hardware_id=["rpi4", "juno", None], build_id=None
+        ) == {"commit:abc", "hardware:rpi4", "hardware:juno"}
+
+
+class FakeLock:
+    def release(self):
+        pass
+
+
+class FakeRedis:
+    """The commands of the redis client used by the cache."""
+
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+
+    def set(self, name, value, *, nx=False, xx=False, **kwargs):
+        if (nx and name in self.values) or (xx and name not in self.values):
+            return None
+        self.values[name] = value.encode("utf-8")
+        return True
+
+    def expire(self, name, *args, **kwargs):
+        return name in self.values
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def exists(self, *names):
+        # The recompute locks are held by other workers in these tests
+        return len(names)
+
+    def mget(self, names):
+        return [self.values.get(name) for name in names]
+
+    def publish(self, channel, message):
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [
+            getattr(self.client, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+@pytest.fixture
+def local_cache(monkeypatch):
+    local_cache = LocMemCache("cache_test", {})
+    # The storage is shared by the instances with the same name
+    local_cache.clear()
+    monkeypatch.setattr(cache_module, "cache", local_cache)
+    monkeypatch.setattr(cache_module, "_record_cache_lookup", lambda *args: None)
+    monkeypatch.setattr(cache_module, "_record_cache_stats", lambda *args: None)
+    monkeypatch.setattr(cache_module, "_get_local_cache", lambda: None)
+    redis_client = FakeRedis()
+    monkeypatch.setattr(cache_module, "get_redis_client", lambda: redis_client)
+    return local_cache
+
+
+def make_stale_entry(value):
+    return {
+        "payload": encode_cache_value(value, compress_min_size=1024).payload,
+        "chunks": 0,
+        "chunk_id": None,
+        "fresh_until": time.time() - 1,
+        "tags": {},
+    }
+
+
+class TestGetOrSetQueryCache:
+    def test_computes_once_while_fresh(self, local_cache, monkeypatch):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ["row"]
+
+        for _ in range(2):
+            assert get_or_set_query_cache(key="tree", compute=compute) == ["row"]
+        assert len(calls) == 1
+
+    def test_serves_stale_value_while_another_worker_recomputes(
+        self, local_cache, monkeypatch
+    ):
+        local_cache.set(get_cache_key("tree"), make_stale_entry("old"))
+        # The lock is held by another worker
+        monkeypatch.setattr(cache_module, "_acquire_recompute_lock", lambda key: None)
+
+        assert get_or_set_query_cache(key="tree", compute=lambda: "new") == "old"
+
+    def test_invalidated_value_is_served_stale_until_recomputed(
+        self, local_cache, monkeypatch
+    ):
+        tags = make_cache_tags(hardware_id="rpi4")
+        lock = FakeLock()
+        monkeypatch.setattr(cache_module, "_acquire_recompute_lock", lambda key: lock)
+        get_or_set_query_cache(key="tree", compute=lambda: "old", tags=tags)
+
+        assert invalidate_cache_tags([*tags, "hardware:juno"]) == 1
+        assert local_cache.get(get_cache_key("tree")) is not None
+
+        # The lock is held by another worker
+        lock = None
+        assert get_or_set_query_cache(key="tree", compute=lambda: "new") == "old"
+        lock = FakeLock()
+        assert get_or_set_query_cache(key="tree", compute=lambda: "new") == "new"
+        assert get_or_set_query_cache(key="tree", compute=lambda: "newer") == "new"
+
+    def test_computes_after_waiting_for_another_worker(self, local_cache, monkeypatch):
+        # The lock is held by another worker, which never stores the entry
+        monkeypatch.setattr(cache_module, "_acquire_recompute_lock", lambda key: None)
+        monkeypatch.setattr(cache_module, "RECOMPUTE_WAIT_TIMEOUT", 0.2)
+
+        assert get_or_set_query_cache(key="tree", compute=lambda: "new") == "new"
+
+    def test_lock_holder_recomputes_stale_value(self, local_cache, monkeypatch):
+        local_cache.set(get_cache_key("tree"), make_stale_entry("old"))
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+
+        assert get_or_set_query_cache(key="tree", compute=lambda: "new") == "new"
+        assert get_or_set_query_cache(key="tree", compute=lambda: "newer") == "new"
+
+
+class TestHardwareDetailsCacheParams:
+    def test_equivalent_bodies_share_params(self):
+        body = {
+            "origin": "maestro",
+            "startTimestampInSeconds": "1700000000",
+            "endTimestampInSeconds": 1700086400,
+            "selectedCommits": {"1": "abc", "0": "head"},
+            "filter": {"filter_architecture": ["x86_64", "arm64", "arm64"]},
+        }
+        equivalent_body = {
+            "filter": {"filter_architecture": ["arm64", "x86_64"]},
+            "selectedCommits": {"0": "head", "1": "abc"},
+            "endTimestampInSeconds": "1700086400",
+            "startTimestampInSeconds": 1700000000,
+            "origin": "maestro",
+        }
+
+        params = get_hardware_details_cache_params(json.dumps(body).encode())
+
+        assert params == get_hardware_details_cache_params(
+            json.dumps(equivalent_body).encode()
+        )
+        assert get_cache_key("hardware", params) == get_cache_key(
+            "hardware",
+            get_hardware_details_cache_params(json.dumps(equivalent_body).encode()),
+        )
+
+    def test_invalid_body_is_not_cached(self):
+        assert get_hardware_details_cache_params(b"not json") is None
+        assert get_hardware_details_cache_params(b'{"origin": "maestro"}') is None
+
+    def test_nearby_time_windows_share_params(self):
+        def make_body(start: int, end: int) -> bytes:
+            return json.dumps(
+                {
+                    "startTimestampInSeconds": start,
+                    "endTimestampInSeconds": end,
+                    "selectedCommits": {},
+                }
+            ).encode()
+
+        params = get_hardware_details_cache_params(make_body(1800, 3600 + 1800))
+
+        assert params == get_hardware_details_cache_params(make_body(1810, 3600 + 1790))
+        assert (params["start_timestamp"], params["end_timestamp"]) == (1800, 5400)
+
+
+class TestQuantizeTimeWindow:
+    def test_widens_window_to_whole_buckets(self):
+        assert quantize_time_window(1000, 2000, 900) == (900, 2700)
+        assert quantize_time_window(900, 1800, 900) == (900, 1800)
+
+    def test_zero_bucket_keeps_window(self):
+        assert quantize_time_window(1000, 2000, 0) == (1000, 2000)
+
+
+class TestGetOrSetQueryCacheMany:
+    def test_only_computes_missing_items(self, local_cache):
+        computed = []
+
+        def compute(items):
+            computed.append(items)
+            return {item: [item.upper()] if item != "c" else [] for item in items}
+
+        first = get_or_set_query_cache_many(
+            key="issue", items=["a", "c"], compute=compute
+        )
+        second = get_or_set_query_cache_many(
+            key="issue", items=["a", "b", "c"], compute=compute
+        )
+
+        assert first == {"a": ["A"], "c": []}
+        assert second == {"a": ["A"], "b": ["B"], "c": []}
+        assert computed == [["a", "c"], ["b"]]
+
+
+class TestCacheValues:
+    def test_dict_rows_are_stored_as_columns(self):
+        rows = [{"id": "a", "status": "PASS"}, {"id": "b", "status": "FAIL"}]
+
+        assert to_columnar(rows) == ColumnarRows(
+            ("id", "status"), [("a", "PASS"), ("b", "FAIL")]
+        )
+        assert to_columnar([*rows, {"id": "c"}]) == [*rows, {"id": "c"}]
+
+    def test_large_values_are_compressed(self):
+        rows = [{"id": str(i), "status": "PASS"} for i in range(1000)]
+
+        small = encode_cache_value(rows[:1], compress_min_size=1024)
+        large = encode_cache_value(rows, compress_min_size=1024)
+
+        assert small.payload[:1] == b"r"
+        assert large.payload[:1] == b"z"
+        assert len(large.payload) < large.raw_size
+        assert decode_cache_value(small.payload) == rows[:1]
+        assert decode_cache_value(large.payload) == rows
+
+    def test_large_values_are_split_in_chunks(self, local_cache, monkeypatch):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+        monkeypatch.setattr(cache_module, "CACHE_CHUNK_SIZE", 64)
+        rows = [(str(i), "PASS") for i in range(100)]
+
+        assert get_or_set_query_cache(key="tree", compute=lambda: rows) == rows
+        entry = local_cache.get(get_cache_key("tree"))
+        assert entry["chunks"] > 1
+        assert get_or_set_query_cache(key="tree", compute=lambda: None) == rows
+
+        # An entry missing one of its chunks is recomputed
+        local_cache.delete(f"{get_cache_key('tree')}:chunk:{entry['chunk_id']}:0")
+        assert get_or_set_query_cache(key="tree", compute=lambda: ["new"]) == ["new"]
+
+    def test_undecodable_values_are_recomputed(self, local_cache, monkeypatch):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+        entry = make_stale_entry("old")
+        for payload in [b"z" + b"x" * 10, entry["payload"][:-2], b"?"]:
+            local_cache.set(
+                get_cache_key("tree"),
+                {**entry, "payload": payload, "fresh_until": None},
+            )
+
+            assert get_or_set_query_cache(key="tree", compute=lambda: "new") == "new"
+
+    def test_values_over_the_max_size_are_not_cached(
+        self, local_cache, monkeypatch, settings
+    ):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+        settings.CACHE_MAX_VALUE_SIZE = 16
+
+        get_or_set_query_cache(key="tree", compute=lambda: ["row"] * 100)
+        assert local_cache.get(get_cache_key("tree")) is None
+
+
+class TestLocalCache:
+    def test_evicts_least_recently_used_over_max_size(self):
+        local_cache = LocalCache(max_size=10, timeout=60)
+        local_cache.set("a", 1, size=4)
+        local_cache.set("b", 2, size=4)
+        local_cache.get("a")
+        local_cache.set("c", 3, size=4)
+
+        assert local_cache.get("a") == 1
+        assert local_cache.get("b") is None
+        assert local_cache.get("c") == 3
+
+    def test_invalidates_by_tag(self):
+        local_cache = LocalCache(max_size=10, timeout=60)
+        local_cache.set("a", 1, size=1, tags=["hardware:rpi4"])
+        local_cache.set("b", 2, size=1, tags=["hardware:juno"])
+
+        assert local_cache.invalidate_tags(["hardware:rpi4"]) == 1
+        assert local_cache.get("a") is None
+        assert local_cache.get("b") == 2
+
+    def test_serves_values_in_front_of_the_shared_cache(self, local_cache, monkeypatch):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+        process_cache = LocalCache(max_size=1024, timeout=60)
+        monkeypatch.setattr(cache_module, "_get_local_cache", lambda: process_cache)
+        tags = make_cache_tags(hardware_id="rpi4")
+
+        get_or_set_query_cache(key="tree", compute=lambda: ["row"], tags=tags)
+        local_cache.clear()
+        assert get_or_set_query_cache(key="tree", compute=lambda: ["new"]) == ["row"]
+
+        process_cache.invalidate_tags(tags)
+        assert get_or_set_query_cache(key="tree", compute=lambda: ["new"]) == ["new"]
+
+
+class TestCacheView:
+    @pytest.fixture
+    def cached_view(self, local_cache, monkeypatch):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+
+        self.calls = 0
+
+        def view(request):
+            self.calls += 1
+            return HttpResponse(b'{"rows": []}' * 200, content_type="application/json")
+
+        return cache_view(view, timeout=60)
+
+    def test_serves_gzip_to_requests_accepting_it(self, cached_view):
+        for _ in range(2):
+            response = cached_view(
+                RequestFactory().get("/tree/", HTTP_ACCEPT_ENCODING="br, gzip")
+            )
+
+            assert response["Content-Encoding"] == "gzip"
+            assert gzip.decompress(response.content) == b'{"rows": []}' * 200
+            assert "Accept-Encoding" in response["Vary"]
+
+    def test_serves_raw_content_otherwise(self, cached_view):
+        for accept_encoding in ["", "gzip;q=0, br"]:
+            response = cached_view(
+                RequestFactory().get("/tree/", HTTP_ACCEPT_ENCODING=accept_encoding)
+            )
+
+            assert not response.has_header("Content-Encoding")
+            assert response.content == b'{"rows": []}' * 200
+
+    def test_returns_not_modified_for_current_etag(self, cached_view, local_cache):
+        etag = cached_view(RequestFactory().get("/tree/"))["ETag"]
+        # Checked against the version entry alone
+        assert local_cache.delete(
+            get_cache_key("view:view", {"path": "/tree/", "accept": ""})
+        )
+
+        response = cached_view(RequestFactory().get("/tree/", HTTP_IF_NONE_MATCH=etag))
+
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert self.calls == 1
+
+    def test_invalidation_during_the_view_makes_the_etag_stale(
+        self, local_cache, monkeypatch
+    ):
+        monkeypatch.setattr(
+            cache_module, "_acquire_recompute_lock", lambda hash_key: FakeLock()
+        )
+        tags = make_cache_tags(hardware_id="rpi4")
+        calls = []
+
+        def view(request):
+            if not calls:
+                # Data ingested while the first response is computed
+                invalidate_cache_tags(tags)
+            calls.append(1)
+            return HttpResponse(b'{"rows": []}', content_type="application/json")
+
+        tagged_view = cache_view(view, timeout=60, get_tags=lambda: tags)
+        etag = tagged_view(RequestFactory().get("/tree/"))["ETag"]
+        tagged_view(RequestFactory().get("/tree/", HTTP_IF_NONE_MATCH=etag))
+
+        assert len(calls) == 2
+
+    def test_head_requests_share_the_get_entry(self, cached_view):
+        cached_view(RequestFactory().get("/tree/"))
+        response = cached_view(RequestFactory().head("/tree/"))
+
+        assert response.status_code == 200
+        assert self.calls == 1
+
+    def test_etag_depends_on_encoding(self, cached_view):
+        etag = cached_view(RequestFactory().get("/tree/"))["ETag"]
+
+        response = cached_view(
+            RequestFactory().get(
+                "/tree/", HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING="gzip"
+            )
+        )
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
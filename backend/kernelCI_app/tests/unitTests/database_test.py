@@ -0,0 +1,87 @@
+from kernelCI_app.helpers.database import (
+    TEST_SERIES_VALUES,
+    get_build_is_dummy_column,
+    get_checkout_tree_columns,
+    get_checkout_tree_join,
+    get_test_kind_column,
+    get_test_series_column,
+    get_test_series_query,
+)
+from kernelCI_app.queries.test import get_test_status_history
+
+
+class TestGeneratedColumns:
+    def test_uses_generated_columns_in_the_dashboard_database(self, settings):
+        settings.USE_DASHBOARD_DB = True
+
+        assert get_test_kind_column("t") == "t.kind"
+        assert get_build_is_dummy_column("b") == "b.is_dummy"
+
+    def test_computes_them_in_the_kcidb_database(self, settings):
+        settings.USE_DASHBOARD_DB = False
+
+        assert "t.path LIKE 'boot.%%'" in get_test_kind_column("t")
+        assert get_build_is_dummy_column("b") == "(b.id LIKE 'maestro:dummy_%%')"
+
+
+class TestSeries:
+    def test_hashes_the_columns_and_the_params_the_same_way(self):
+        column = get_test_series_column("t", "b", "c")
+        query = get_test_series_query()
+
+        assert column.startswith("md5(json_build_array(c.origin, ")
+        assert "t.environment_misc ->> 'platform'" in column
+        assert query.count("%s::text") == len(TEST_SERIES_VALUES)
+        assert column.count(", ") == query.count(", ")
+
+
+class TestTreeColumns:
+    def test_uses_the_tree_id_in_the_dashboard_database(self, settings):
+        settings.USE_DASHBOARD_DB = True
+
+        assert get_checkout_tree_columns("c") == "c.tree_id"
+        assert get_checkout_tree_join("c", "ftc") == "c.tree_id = ftc.tree_id"
+
+    def test_uses_the_identity_columns_in_the_kcidb_database(self, settings):
+        settings.USE_DASHBOARD_DB = False
+
+        assert get_checkout_tree_columns("c") == (
+            "c.tree_name, c.git_repository_branch, c.git_repository_url, c.origin"
+        )
+        join = get_checkout_tree_join("c", "ftc")
+        assert join.count("IS NOT DISTINCT FROM") == 4
+        assert "c.origin IS NOT DISTINCT FROM ftc.origin" in join
+
+
+class TestStatusHistorySeries:
+    def get_history_sql(self) -> str:
+        return str(
+            get_test_status_history(
+                path="boot",
+                origin="maestro",
+                git_repository_url="https://git.kernel.org/torvalds/linux.git",
+                git_repository_branch="master",
+                platform="rpi4",
+                test_start_time=None,
+                config_name="defconfig",
+                field_timestamp=None,
+                group_size=10,
+            ).query
+        )
+
+    def test_filters_on_the_series_alone(self, settings):
+        settings.USE_DASHBOARD_DB = True
+        settings.USE_TEST_SERIES = True
+
+        sql = self.get_history_sql()
+
+        assert '"tests"."series" = (md5(' in sql
+        assert 'series" IS NULL' not in sql
+        assert '"tests"."path"' not in sql
+        assert '"checkouts"."origin"' not in sql
+
+    def test_is_skipped_until_enabled(self, settings):
+        settings.USE_DASHBOARD_DB = True
+        settings.USE_TEST_SERIES = False
+
+        assert "series" not in self.get_history_sql()
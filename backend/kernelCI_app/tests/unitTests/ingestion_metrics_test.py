@@ -0,0 +1,41 @@
+from kernelCI_app.management.commands.helpers.ingestion_metrics import (
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    write_metrics_file,
+)
+
+
+class TestMetricsRegistry:
+    def test_renders_counters_with_labels(self):
+        registry = MetricsRegistry()
+        rows = registry.register(Counter("rows_total", "Rows written"))
+        rows.inc(3, table="tests", result="inserted")
+        rows.inc(2, table="tests", result="inserted")
+
+        assert registry.render() == (
+            "# HELP kcidb_ingest_rows_total Rows written\n"
+            "# TYPE kcidb_ingest_rows_total counter\n"
+            'kcidb_ingest_rows_total{result="inserted",table="tests"} 5\n'
+        )
+
+    def test_renders_cumulative_histogram_buckets(self):
+        registry = MetricsRegistry()
+        latency = registry.register(Histogram("seconds", "Latency", (0.1, 1)))
+        latency.observe(0.05, stage="parse")
+        latency.observe(0.5, stage="parse")
+        latency.observe(5, stage="parse")
+
+        lines = registry.render().splitlines()
+
+        assert 'kcidb_ingest_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+        assert 'kcidb_ingest_seconds_bucket{stage="parse",le="1"} 2' in lines
+        assert 'kcidb_ingest_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+        assert 'kcidb_ingest_seconds_sum{stage="parse"} 5.55' in lines
+        assert 'kcidb_ingest_seconds_count{stage="parse"} 3' in lines
+
+    def test_writes_metrics_file(self, tmp_path):
+        path = tmp_path / "ingester.prom"
+        write_metrics_file(str(path))
+
+        assert "# TYPE kcidb_ingest_files_total counter" in path.read_text()
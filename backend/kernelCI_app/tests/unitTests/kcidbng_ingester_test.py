@@ -0,0 +1,226 @@
+from concurrent.futures import Future
+import contextlib
+import json
+import threading
+
+from kernelCI_app.management.commands.helpers import kcidbng_ingester
+from kernelCI_app.management.commands.helpers.kcidbng_ingester import (
+    QueueBudget,
+    create_prepare_pool,
+    db_queue,
+    db_worker,
+    get_prepare_options,
+    get_queue_batch,
+    process_file,
+    start_file,
+    stream_file,
+    write_queue_items,
+)
+
+SUBMISSION = {
+    "version": {"major": 5, "minor": 3},
+    "checkouts": [{"id": "maestro:checkout_1", "origin": "maestro"}],
+}
+
+
+def make_spool(tmp_path):
+    for subdir in ("archive", "failed"):
+        (tmp_path / subdir).mkdir()
+    (tmp_path / "submission.json").write_text(json.dumps(SUBMISSION))
+    return str(tmp_path)
+
+
+def run_with_db_worker(function, *args):
+    stop_event = threading.Event()
+    thread = threading.Thread(target=db_worker, args=(stop_event,))
+    thread.start()
+    try:
+        return function(*args)
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+class TestQueueBudget:
+    def test_blocks_until_released(self):
+        budget = QueueBudget(capacity=10)
+        budget.acquire(8)
+
+        acquired = threading.Event()
+
+        def acquire():
+            budget.acquire(5)
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        assert not acquired.wait(timeout=0.1)
+
+        budget.release(8)
+        assert acquired.wait(timeout=1)
+        thread.join()
+        assert budget.used == 5
+
+    def test_item_larger_than_budget_goes_alone(self):
+        budget = QueueBudget(capacity=10)
+        budget.acquire(100)
+
+        assert budget.used == 100
+
+
+class TestPreparePool:
+    def test_processes_get_the_options_set_at_runtime(self, monkeypatch):
+        monkeypatch.setattr(kcidbng_ingester, "VERBOSE", 1)
+        monkeypatch.setattr(kcidbng_ingester, "TREES_FILE", "/tmp/trees.yaml")
+
+        with create_prepare_pool(1) as pool:
+            options = pool.submit(get_prepare_options).result(timeout=60)
+
+        assert options == get_prepare_options()
+
+
+class TestProcessFile:
+    def test_archives_file_after_commit(self, tmp_path, monkeypatch):
+        spool_dir = make_spool(tmp_path)
+        committed = []
+
+        def fake_process_submission_item(data, metadata):
+            assert (tmp_path / "submission.json").exists()
+            committed.append(data)
+
+        monkeypatch.setattr(
+            kcidbng_ingester, "process_submission_item", fake_process_submission_item
+        )
+
+        result = run_with_db_worker(process_file, "submission.json", {}, spool_dir)
+
+        assert result
+        assert len(committed) == 1
+        assert (tmp_path / "archive" / "submission.json").exists()
+
+    def test_write_error_moves_file_to_failed(self, tmp_path, monkeypatch):
+        spool_dir = make_spool(tmp_path)
+
+        def failing_process_submission_item(data, metadata):
+            raise RuntimeError("database is gone")
+
+        monkeypatch.setattr(
+            kcidbng_ingester,
+            "process_submission_item",
+            failing_process_submission_item,
+        )
+
+        result = run_with_db_worker(process_file, "submission.json", {}, spool_dir)
+
+        assert not result
+        assert (tmp_path / "failed" / "submission.json").exists()
+        assert not (tmp_path / "archive" / "submission.json").exists()
+
+    def test_returns_once_queued_and_archives_after_commit(self, tmp_path, monkeypatch):
+        spool_dir = make_spool(tmp_path)
+        monkeypatch.setattr(
+            kcidbng_ingester, "process_submission_item", lambda data, metadata: None
+        )
+        budget = QueueBudget(capacity=None)
+
+        # No writer is running, the file can only be queued
+        done = start_file("submission.json", {}, spool_dir, None, None, budget)
+
+        assert not done.done()
+        assert db_queue.qsize() == 1
+        assert budget.used > 0
+        assert (tmp_path / "submission.json").exists()
+
+        run_with_db_worker(done.result)
+
+        assert done.result()
+        assert budget.used == 0
+        assert (tmp_path / "archive" / "submission.json").exists()
+
+    def test_file_already_archived_is_skipped(self, tmp_path):
+        spool_dir = make_spool(tmp_path)
+        (tmp_path / "submission.json").rename(tmp_path / "archive" / "submission.json")
+
+        result = process_file("submission.json", {}, spool_dir)
+
+        assert result
+        assert not (tmp_path / "failed" / "submission.json").exists()
+
+    def test_stream_failure_keeps_committed_chunks(self, tmp_path, monkeypatch):
+        spool_dir = make_spool(tmp_path)
+        submission = {
+            **SUBMISSION,
+            "builds": [
+                {
+                    "id": "maestro:build_1",
+                    "checkout_id": "maestro:checkout_1",
+                    "origin": "maestro",
+                }
+            ],
+        }
+        (tmp_path / "submission.json").write_text(json.dumps(submission))
+        committed = []
+
+        def fake_process_submission_item(data, metadata):
+            if "builds" in data:
+                raise RuntimeError("database is gone")
+            committed.append(data)
+
+        monkeypatch.setattr(
+            kcidbng_ingester, "process_submission_item", fake_process_submission_item
+        )
+
+        result = run_with_db_worker(
+            stream_file, "submission.json", {}, spool_dir, QueueBudget(capacity=None)
+        )
+
+        # The checkouts chunk stays committed, a retry of the file upserts it again
+        assert not result
+        assert [list(data) for data in committed] == [["checkouts"]]
+        assert (tmp_path / "failed" / "submission.json").exists()
+
+
+class TestMicroBatches:
+    def _item(self, filename: str, tests: int):
+        data = {"tests": [{"id": f"maestro:{filename}_{i}"} for i in range(tests)]}
+        return data, {"filename": filename, "committed": Future()}
+
+    def test_collects_queued_items_up_to_row_limit(self, monkeypatch):
+        monkeypatch.setattr(kcidbng_ingester, "MICRO_BATCH_ROWS", 5)
+        for filename in ("b", "c", "d"):
+            db_queue.put(self._item(filename, 2))
+
+        batch, stop = get_queue_batch(self._item("a", 2))
+
+        assert [metadata["filename"] for _, metadata in batch] == ["a", "b", "c"]
+        assert not stop
+
+        # Leaves the queue as it was for the other tests
+        db_queue.get()
+        for _ in range(3):
+            db_queue.task_done()
+
+    def test_failed_batch_only_rejects_the_bad_file(self, monkeypatch):
+        written = []
+
+        def fake_process_submission_item(data, metadata):
+            if any(test["id"].startswith("maestro:bad") for test in data["tests"]):
+                raise ValueError("bad file")
+            written.append(metadata["filename"])
+
+        monkeypatch.setattr(
+            kcidbng_ingester, "process_submission_item", fake_process_submission_item
+        )
+        monkeypatch.setattr(
+            kcidbng_ingester.transaction, "atomic", contextlib.nullcontext
+        )
+
+        items = [self._item(filename, 1) for filename in ("good1", "bad", "good2")]
+        write_queue_items(items)
+
+        assert written == ["good1", "good2"]
+        assert [metadata["committed"].exception() is None for _, metadata in items] == [
+            True,
+            False,
+            True,
+        ]
@@ -0,0 +1,54 @@
+import gzip
+import threading
+
+from kernelCI_app.management.commands.helpers.log_excerpt_store import (
+    LogExcerptStore,
+    LogExcerptUploader,
+)
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+
+class TestLogExcerptStore:
+    def test_evicts_least_recently_used(self, tmp_path):
+        store = LogExcerptStore(str(tmp_path / "logs.sqlite3"), max_entries=2)
+        store.set("a", "url_a")
+        store.set("b", "url_b")
+        store.get("a")
+        store.set("c", "url_c")
+
+        assert store.evict() == 1
+        assert store.get("b") is None
+        assert store.get("a") == "url_a"
+        assert store.get("c") == "url_c"
+
+    def test_survives_restarts(self, tmp_path):
+        path = str(tmp_path / "logs.sqlite3")
+        LogExcerptStore(path, max_entries=10).set("a", "url_a")
+
+        assert LogExcerptStore(path, max_entries=10).get("a") == "url_a"
+
+
+class TestLogExcerptUploader:
+    def test_uploads_each_excerpt_once(self, monkeypatch):
+        uploader = LogExcerptUploader("https://storage", "token", max_workers=2)
+        release = threading.Event()
+        posts = []
+
+        def fake_post(url, headers, files, timeout):
+            release.wait(timeout=1)
+            posts.append(gzip.decompress(files["file0"][1]).decode("utf-8"))
+            return FakeResponse()
+
+        monkeypatch.setattr(uploader.session, "post", fake_post)
+
+        first = uploader.submit("excerpt", "hash")
+        second = uploader.submit("excerpt", "hash")
+        release.set()
+
+        assert first is second
+        assert first.result() == "https://storage/logexcerpt/hash/logexcerpt.txt.gz"
+        assert posts == ["excerpt"]
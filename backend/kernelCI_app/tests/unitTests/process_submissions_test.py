@@ -0,0 +1,151 @@
+from django.db import OperationalError
+from psycopg import errors
+
+from kernelCI_app.management.commands.helpers import process_submissions
+from kernelCI_app.management.commands.helpers.process_submissions import (
+    get_upsert_fields,
+    get_upsert_query,
+    insert_items,
+    is_retryable_error,
+    filter_submission_data,
+    filter_test,
+)
+from kernelCI_app.models import Builds, Checkouts, Tests
+
+
+class TestFilterItems:
+    def test_filter_test_flattens_and_filters_fields(self):
+        test = filter_test(
+            {
+                "id": "test_1",
+                "build_id": "build_1",
+                "origin": "maestro",
+                "environment": {"comment": "foo", "misc": {"platform": "bar"}},
+                "number": {"value": 1.5, "unit": "s"},
+                "unknown_field": "ignored",
+            }
+        )
+
+        assert test == {
+            "id": "test_1",
+            "build_id": "build_1",
+            "origin": "maestro",
+            "environment_comment": "foo",
+            "environment_misc": {"platform": "bar"},
+            "number_value": 1.5,
+            "number_unit": "s",
+        }
+
+    def test_filter_submission_data_keeps_only_tables(self):
+        filtered = filter_submission_data(
+            {
+                "version": {"major": 5, "minor": 3},
+                "checkouts": [{"id": "c1", "origin": "maestro", "extra": 1}, "bad"],
+                "builds": [],
+            }
+        )
+
+        assert filtered == {"checkouts": [{"id": "c1", "origin": "maestro"}, "bad"]}
+
+    def test_upsert_fields_skip_generated_columns(self):
+        columns = [field.column for field in get_upsert_fields(Builds)]
+
+        assert "series" not in columns
+        assert "checkout_id" in columns
+        assert "_timestamp" in columns
+
+    def test_upsert_fields_skip_derived_columns(self):
+        columns = [field.column for field in get_upsert_fields(Tests)]
+
+        assert "series" not in columns
+        assert "kind" not in columns
+        assert "build_id" in columns
+
+        checkout_columns = [field.column for field in get_upsert_fields(Checkouts)]
+        assert "tree_id" not in checkout_columns
+
+
+class TestUpsertQuery:
+    def test_query_has_one_placeholder_group_per_row(self):
+        fields = get_upsert_fields(Tests)
+        query = get_upsert_query(Tests, fields, 3)
+
+        assert query.count("%s") == 3 * len(fields)
+        assert 'ON CONFLICT ("id")' in query
+        assert '"id" = EXCLUDED."id"' not in query
+        assert "RETURNING (xmax = 0)" in query
+
+
+class TestIsRetryableError:
+    def _wrap(self, cause: Exception) -> OperationalError:
+        error = OperationalError(str(cause))
+        error.__cause__ = cause
+        return error
+
+    def test_deadlocks_and_serialization_failures_are_retried(self):
+        assert is_retryable_error(self._wrap(errors.DeadlockDetected()))
+        assert is_retryable_error(self._wrap(errors.SerializationFailure()))
+
+    def test_other_errors_are_not_retried(self):
+        assert not is_retryable_error(self._wrap(errors.StringDataRightTruncation()))
+        assert not is_retryable_error(OperationalError("no cause"))
+
+
+class TestInsertItems:
+    def test_counts_rejected_and_duplicated_items(self, monkeypatch):
+        written_batches = []
+
+        def fake_upsert_batch(item_type, model, fields, rows, counts):
+            written_batches.append(rows)
+            counts["inserted"] += len(rows)
+
+        monkeypatch.setattr(process_submissions, "upsert_batch", fake_upsert_batch)
+
+        counts = insert_items(
+            "builds",
+            [
+                {"id": "build_1", "checkout_id": "c1", "origin": "maestro"},
+                {"id": "build_2", "checkout_id": "c1", "origin": "maestro"},
+                {"id": "build_1", "checkout_id": "c2", "origin": "maestro"},
+                {"checkout_id": "c1", "origin": "maestro"},
+                "not a dict",
+            ],
+        )
+
+        assert counts == {"inserted": 2, "updated": 1, "rejected": 2}
+        assert len(written_batches) == 1
+        assert len(written_batches[0]) == 2
+
+    def test_splits_rows_into_batches(self, monkeypatch):
+        written_batches = []
+
+        def fake_upsert_batch(item_type, model, fields, rows, counts):
+            written_batches.append(rows)
+            counts["inserted"] += len(rows)
+
+        monkeypatch.setattr(process_submissions, "upsert_batch", fake_upsert_batch)
+        monkeypatch.setattr(process_submissions, "INSERT_BATCH_SIZE", 2)
+
+        counts = insert_items(
+            "checkouts",
+            [{"id": f"checkout_{i}", "origin": "maestro"} for i in range(5)],
+        )
+
+        assert counts["inserted"] == 5
+        assert [len(batch) for batch in written_batches] == [2, 2, 1]
+
+    def test_writes_rows_sorted_by_id(self, monkeypatch):
+        written_ids = []
+
+        def fake_upsert_batch(item_type, model, fields, rows, counts):
+            pk_index = fields.index(model._meta.pk)
+            written_ids.extend(row[pk_index] for row in rows)
+
+        monkeypatch.setattr(process_submissions, "upsert_batch", fake_upsert_batch)
+
+        insert_items(
+            "checkouts",
+            [{"id": checkout_id, "origin": "maestro"} for checkout_id in "cab"],
+        )
+
+        assert written_ids == ["a", "b", "c"]
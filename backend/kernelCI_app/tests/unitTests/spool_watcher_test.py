@@ -0,0 +1,36 @@
+import os
+
+from kernelCI_app.management.commands.helpers.spool_watcher import (
+    InotifySpoolWatcher,
+    PollingSpoolWatcher,
+    list_spool_files,
+)
+
+
+class TestSpoolWatcher:
+    def test_list_spool_files_only_lists_json_files(self, tmp_path):
+        (tmp_path / "a.json").write_text("{}")
+        (tmp_path / "b.txt").write_text("")
+        (tmp_path / "archive").mkdir()
+
+        assert list_spool_files(str(tmp_path)) == ["a.json"]
+
+    def test_polling_watcher_lists_directory(self, tmp_path):
+        (tmp_path / "a.json").write_text("{}")
+        watcher = PollingSpoolWatcher(str(tmp_path), interval=0)
+
+        assert watcher.get_new_files(timeout=0) == ["a.json"]
+
+    def test_inotify_watcher_reports_closed_and_moved_files(self, tmp_path):
+        watcher = InotifySpoolWatcher(str(tmp_path))
+        try:
+            (tmp_path / "written.json").write_text("{}")
+            (tmp_path / "ignored.txt").write_text("")
+            outside_file = tmp_path.parent / f"{tmp_path.name}-moved.json"
+            outside_file.write_text("{}")
+            os.rename(outside_file, tmp_path / "moved.json")
+
+            assert watcher.get_new_files(timeout=1) == ["written.json", "moved.json"]
+            assert watcher.get_new_files(timeout=0) == []
+        finally:
+            watcher.close()
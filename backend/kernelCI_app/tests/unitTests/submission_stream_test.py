@@ -0,0 +1,112 @@
+import io
+import json
+
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from kernelCI_app.management.commands.helpers.submission_stream import (
+    JsonStreamReader,
+    StreamingNotSupportedError,
+    iter_submission_chunks,
+    scan_submission,
+)
+
+SUBMISSION = {
+    "version": {"major": 5, "minor": 3},
+    "tests": [
+        {
+            "id": f"maestro:test_{i}",
+            "build_id": "maestro:build_1",
+            "origin": "maestro",
+            "comment": "ü",
+        }
+        for i in range(5)
+    ],
+    "builds": [
+        {
+            "id": "maestro:build_1",
+            "checkout_id": "maestro:checkout_1",
+            "origin": "maestro",
+        }
+    ],
+    "checkouts": [
+        {"id": "maestro:checkout_1", "origin": "maestro", "tree_name": "mainline"}
+    ],
+}
+
+
+def write_submission(tmp_path, data) -> str:
+    path = tmp_path / "submission.json"
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+class TestJsonStreamReader:
+    def test_reads_values_across_read_boundaries(self):
+        document = '{"a": 12345, "b": [1, {"c": "ü"}, [2]], "d": []}'
+        reader = JsonStreamReader(io.BytesIO(document.encode("utf-8")), read_size=3)
+
+        values = {}
+        for key in reader.iter_object():
+            if key == "b":
+                values[key] = list(reader.iter_array())
+            else:
+                values[key] = reader.decode_value()
+
+        assert values == json.loads(document)
+
+    def test_tell_and_seek_use_byte_offsets(self):
+        document = '{"ü": "ü", "a": [1, 2]}'
+        reader = JsonStreamReader(io.BytesIO(document.encode("utf-8")), read_size=4)
+
+        offset = None
+        for key in reader.iter_object():
+            if key == "a":
+                offset = reader.tell()
+            reader.decode_value()
+
+        reader.seek(offset)
+        assert list(reader.iter_array()) == [1, 2]
+
+    def test_malformed_document_raises(self):
+        reader = JsonStreamReader(io.BytesIO(b'{"a": [1, 2'), read_size=4)
+
+        with pytest.raises(ValueError):
+            for key in reader.iter_object():
+                list(reader.iter_array())
+
+
+class TestStreamSubmission:
+    def test_chunks_match_whole_file_in_dependency_order(self, tmp_path):
+        filename = write_submission(tmp_path, SUBMISSION)
+
+        table_offsets = scan_submission(filename, chunk_size=2)
+        chunks = list(iter_submission_chunks(filename, table_offsets, chunk_size=2))
+
+        assert [table for table, _, _ in chunks] == [
+            "checkouts",
+            "builds",
+            "tests",
+            "tests",
+            "tests",
+        ]
+        assert [
+            row for table, rows, _ in chunks if table == "tests" for row in rows
+        ] == SUBMISSION["tests"]
+        assert all(size > 0 for _, _, size in chunks)
+
+    def test_invalid_item_rejects_file(self, tmp_path):
+        invalid = {**SUBMISSION, "builds": [{"id": "maestro:build_without_checkout"}]}
+        filename = write_submission(tmp_path, invalid)
+
+        with pytest.raises(ValidationError):
+            scan_submission(filename)
+
+    def test_version_after_tables_is_not_streamed(self, tmp_path):
+        tables_first = {"checkouts": SUBMISSION["checkouts"], **SUBMISSION}
+        del tables_first["version"]
+        tables_first["version"] = SUBMISSION["version"]
+        filename = write_submission(tmp_path, tables_first)
+
+        with pytest.raises(StreamingNotSupportedError):
+            scan_submission(filename)
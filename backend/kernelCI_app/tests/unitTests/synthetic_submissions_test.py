@@ -0,0 +1,79 @@
+import argparse
+
+import kcidb_io
+import pytest
+
+from kernelCI_app.management.commands.helpers.synthetic_submissions import (
+    DEFAULT_TREE_URLS,
+    SyntheticSpoolConfig,
+    add_generation_arguments,
+    count_rows,
+    generate_submission,
+)
+
+CONFIG: SyntheticSpoolConfig = {
+    "files": 2,
+    "checkouts": 2,
+    "builds": 3,
+    "tests": 4,
+    "incidents": 2,
+    "excerpt_size": 512,
+    "duplicate_ratio": 0,
+    "tree_urls": DEFAULT_TREE_URLS,
+    "seed": 0,
+}
+
+
+def count_submission_rows(submission) -> int:
+    return sum(len(value) for value in submission.values() if isinstance(value, list))
+
+
+class TestGenerateSubmission:
+    def test_generates_valid_submissions(self):
+        submissions = [generate_submission(index, CONFIG) for index in range(2)]
+
+        for submission in submissions:
+            kcidb_io.schema.V5_3.validate(submission)
+        assert sum(map(count_submission_rows, submissions)) == count_rows(CONFIG)
+
+    def test_same_seed_generates_same_submission(self):
+        assert generate_submission(1, CONFIG) == generate_submission(1, CONFIG)
+        assert generate_submission(1, CONFIG) != generate_submission(
+            1, {**CONFIG, "seed": 1}
+        )
+
+    def test_duplicated_items_reuse_ids_of_previous_file(self):
+        config: SyntheticSpoolConfig = {**CONFIG, "duplicate_ratio": 1}
+        first = generate_submission(0, config)
+        second = generate_submission(1, config)
+
+        assert [test["id"] for test in second["tests"]] == [
+            test["id"] for test in first["tests"]
+        ]
+
+
+class TestGenerationArguments:
+    def _parse(self, *args: str) -> argparse.Namespace:
+        parser = argparse.ArgumentParser(exit_on_error=False)
+        add_generation_arguments(parser)
+        return parser.parse_args(args)
+
+    def test_accepts_zero_tests_and_excerpts(self):
+        args = self._parse("--tests", "0", "--excerpt-size", "0")
+
+        assert args.tests == 0
+        assert args.excerpt_size == 0
+
+    @pytest.mark.parametrize(
+        "args",
+        [
+            ("--tests", "-1"),
+            ("--incidents", "-1"),
+            ("--excerpt-size", "-1"),
+            ("--duplicate-ratio", "1.5"),
+            ("--duplicate-ratio", "-0.1"),
+        ],
+    )
+    def test_rejects_out_of_range_values(self, args):
+        with pytest.raises(argparse.ArgumentError):
+            self._parse(*args)
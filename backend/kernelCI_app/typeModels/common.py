@@ -35,6 +35,13 @@ class StatusCount(BaseModel):
         )
 
 
+class TimeWindow(BaseModel):
+    """The time window actually queried, after quantization"""
+
+    start_timestamp_in_seconds: int
+    end_timestamp_in_seconds: int
+
+
 class GroupedStatus(TypedDict):
     success: int
     failed: int
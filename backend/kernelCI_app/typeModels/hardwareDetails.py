@@ -3,7 +3,7 @@ from typing import Annotated, Dict, List, Literal, Optional, Union
 from kernelCI_app.constants.general import DEFAULT_ORIGIN
 from kernelCI_app.constants.localization import DocStrings
 
-from kernelCI_app.typeModels.common import make_default_validator
+from kernelCI_app.typeModels.common import TimeWindow, make_default_validator
 from kernelCI_app.typeModels.commonDetails import (
     BuildHistoryItem,
     GlobalFilters,
@@ -119,24 +119,29 @@ class HardwareDetailsFullResponse(BaseModel):
     summary: Summary
     filters: HardwareDetailsFilters
     common: HardwareCommon
+    time_window: TimeWindow
 
 
 class HardwareDetailsSummaryResponse(BaseModel):
     summary: Summary
     filters: HardwareDetailsFilters
     common: HardwareCommon
+    time_window: TimeWindow
 
 
 class HardwareDetailsBuildsResponse(BaseModel):
     builds: List[HardwareBuildHistoryItem]
+    time_window: TimeWindow
 
 
 class HardwareDetailsBootsResponse(BaseModel):
     boots: List[HardwareTestHistoryItem]
+    time_window: TimeWindow
 
 
 class HardwareDetailsTestsResponse(BaseModel):
     tests: List[HardwareTestHistoryItem]
+    time_window: TimeWindow
 
 
 class HardwareCommitHistoryResponse(BaseModel):
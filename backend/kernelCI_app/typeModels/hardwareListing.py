@@ -3,7 +3,7 @@ from pydantic import BaseModel, BeforeValidator, Field
 from typing import Annotated, Optional, Union
 
 from kernelCI_app.constants.general import DEFAULT_ORIGIN
-from kernelCI_app.typeModels.common import StatusCount
+from kernelCI_app.typeModels.common import StatusCount, TimeWindow
 from kernelCI_app.constants.localization import DocStrings
 
 
@@ -17,6 +17,7 @@ class HardwareItem(BaseModel):
 
 class HardwareListingResponse(BaseModel):
     hardware: list[HardwareItem]
+    time_window: TimeWindow
 
 
 # Since OpenAPI does not support timestamp as datetime we add an extra model just for
@@ -1,7 +1,13 @@
+from typing import Optional
 from django.urls import path
-from django.views.decorators.cache import cache_page
 from django.conf import settings
 from kernelCI_app import views
+from kernelCI_app.cache import cache_view
+from kernelCI_app.helpers.hardwareDetails import (
+    get_hardware_details_cache_params,
+    get_hardware_details_cache_tags,
+)
+from kernelCI_app.views.hardwareView import get_hardware_listing_cache_params
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -9,11 +15,21 @@ from drf_spectacular.views import (
 )
 
 timeout = settings.CACHE_TIMEOUT
-cache = cache_page(timeout)
 
 
-def view_cache(view):
-    return cache(view.as_view())
+def view_cache(view, timeout=timeout, hard_timeout: Optional[int] = None, **kwargs):
+    return cache_view(
+        view.as_view(), timeout=timeout, hard_timeout=hard_timeout, **kwargs
+    )
+
+
+def hardware_details_cache(view):
+    """Caches the responses of the hardware details views, which take a post body."""
+    return view_cache(
+        view,
+        get_body_params=get_hardware_details_cache_params,
+        get_tags=get_hardware_details_cache_tags,
+    )
 
 
 urlpatterns = [
@@ -105,12 +121,12 @@ urlpatterns = [
     path("log-downloader/", view_cache(views.LogDownloaderView), name="logDownloader"),
     path(
         "hardware/<str:hardware_id>",
-        view_cache(views.HardwareDetails),
+        hardware_details_cache(views.HardwareDetails),
         name="hardwareDetails",
     ),
     path(
         "hardware/<str:hardware_id>/builds",
-        view_cache(views.HardwareDetailsBuilds),
+        hardware_details_cache(views.HardwareDetailsBuilds),
         name="hardwareDetailsBuilds",
     ),
     path(
@@ -120,20 +136,26 @@ urlpatterns = [
     ),
     path(
         "hardware/<str:hardware_id>/boots",
-        views.HardwareDetailsBoots.as_view(),
+        hardware_details_cache(views.HardwareDetailsBoots),
         name="hardwareDetailsBoots",
     ),
     path(
         "hardware/<str:hardware_id>/summary",
-        views.HardwareDetailsSummary.as_view(),
+        hardware_details_cache(views.HardwareDetailsSummary),
         name="hardwareDetailsSummary",
     ),
     path(
         "hardware/<str:hardware_id>/tests",
-        views.HardwareDetailsTests.as_view(),
+        hardware_details_cache(views.HardwareDetailsTests),
         name="hardwareDetailsTests",
     ),
-    path("hardware/", view_cache(views.HardwareView), name="hardware"),
+    path(
+        "hardware/",
+        view_cache(
+            views.HardwareView, get_query_params=get_hardware_listing_cache_params
+        ),
+        name="hardware",
+    ),
     path("issue/", view_cache(views.IssueView), name="issue"),
     path(
         "issue/extras/", view_cache(views.IssueExtraDetails), name="issueExtraDetails"
@@ -1,4 +1,5 @@
 import json
+import math
 import os
 from typing import Union, List, Optional
 from django.utils import timezone
@@ -74,6 +75,21 @@ def get_query_time_interval(**kwargs):
     return timezone.now() - timedelta(**kwargs)
 
 
+def quantize_time_window(
+    start_timestamp: int, end_timestamp: int, bucket_seconds: int
+) -> tuple[int, int]:
+    """
+    Widens a time window to whole buckets, moving the start down and the end up to
+    a multiple of `bucket_seconds`, so that windows a few seconds apart become the
+    same one. The window never shrinks, so no data in it is left out.
+    """
+    if bucket_seconds <= 0:
+        return start_timestamp, end_timestamp
+    start = math.floor(start_timestamp / bucket_seconds) * bucket_seconds
+    end = math.ceil(end_timestamp / bucket_seconds) * bucket_seconds
+    return start, end
+
+
 def get_error_body_response(reason: str) -> bytes:
     return json.dumps({"error": True, "reason": reason}).encode("utf-8")
 
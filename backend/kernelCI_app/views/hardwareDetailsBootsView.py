@@ -18,6 +18,7 @@ from kernelCI_app.queries.hardware import (
     get_hardware_details_data,
     get_hardware_trees_data,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.hardwareDetails import (
     HardwareDetailsPostBody,
     HardwareTestHistoryItem,
@@ -47,6 +48,7 @@ class HardwareDetailsBoots(APIView):
         self.origin: str = None
         self.start_datetime: datetime = None
         self.end_datetime: datetime = None
+        self.time_window: TimeWindow = None
         self.selected_commits: Dict[str, str] = None
 
         self.processed_tests = set()
@@ -161,6 +163,7 @@ class HardwareDetailsBoots(APIView):
 
         try:
             valid_response = HardwareDetailsBootsResponse(
+                time_window=self.time_window,
                 boots=self.boots,
             )
         except ValidationError as e:
@@ -28,6 +28,7 @@ from kernelCI_app.queries.hardware import (
 from kernelCI_app.typeModels.commonOpenApiParameters import (
     HARDWARE_ID_PATH_PARAM,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.hardwareDetails import (
     HardwareBuildHistoryItem,
     HardwareDetailsBuildsResponse,
@@ -49,6 +50,7 @@ class HardwareDetailsBuilds(APIView):
         self.origin: str = None
         self.start_datetime: datetime = None
         self.end_datetime: datetime = None
+        self.time_window: TimeWindow = None
         self.selected_commits: Dict[str, str] = None
 
         self.filters: FilterParams = None
@@ -161,6 +163,7 @@ class HardwareDetailsBuilds(APIView):
             )
 
             valid_response = HardwareDetailsBuildsResponse(
+                time_window=self.time_window,
                 builds=self.builds,
             )
         except ValidationError as e:
@@ -43,6 +43,7 @@ from kernelCI_app.typeModels.commonDetails import (
 from kernelCI_app.typeModels.commonOpenApiParameters import (
     HARDWARE_ID_PATH_PARAM,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.hardwareDetails import (
     HardwareCommon,
     HardwareDetailsFilters,
@@ -71,6 +72,7 @@ class HardwareDetailsSummary(APIView):
         self.origin: str = None
         self.start_datetime: datetime = None
         self.end_datetime: datetime = None
+        self.time_window: TimeWindow = None
         self.selected_commits: Dict[str, str] = None
 
         self.processed_builds = set()
@@ -327,6 +329,7 @@ class HardwareDetailsSummary(APIView):
             )
 
             valid_response = HardwareDetailsSummaryResponse(
+                time_window=self.time_window,
                 summary=Summary(
                     builds=self.builds_summary,
                     boots=self.boots_summary,
@@ -21,6 +21,7 @@ from kernelCI_app.queries.hardware import (
 from kernelCI_app.typeModels.commonOpenApiParameters import (
     HARDWARE_ID_PATH_PARAM,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.hardwareDetails import (
     HardwareDetailsPostBody,
     HardwareTestHistoryItem,
@@ -47,6 +48,7 @@ class HardwareDetailsTests(APIView):
         self.origin: str = None
         self.start_datetime: datetime = None
         self.end_datetime: datetime = None
+        self.time_window: TimeWindow = None
         self.selected_commits: Dict[str, str] = None
 
         self.processed_tests = set()
@@ -161,6 +163,7 @@ class HardwareDetailsTests(APIView):
 
         try:
             valid_response = HardwareDetailsTestsResponse(
+                time_window=self.time_window,
                 tests=self.tests,
             )
         except ValidationError as e:
@@ -45,6 +45,7 @@ from kernelCI_app.typeModels.commonDetails import (
 from kernelCI_app.typeModels.commonOpenApiParameters import (
     HARDWARE_ID_PATH_PARAM,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.hardwareDetails import (
     HardwareCommon,
     HardwareDetailsFilters,
@@ -74,6 +75,7 @@ class HardwareDetails(APIView):
         self.origin: str = None
         self.start_datetime: datetime = None
         self.end_datetime: datetime = None
+        self.time_window: TimeWindow = None
         self.selected_commits: Dict[str, str] = None
 
         self.filters: FilterParams = None
@@ -302,6 +304,7 @@ class HardwareDetails(APIView):
 
         try:
             valid_response = HardwareDetailsFullResponse(
+                time_window=self.time_window,
                 builds=self.builds["items"],
                 boots=self.boots["history"],
                 tests=self.tests["history"],
@@ -1,5 +1,9 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from http import HTTPStatus
+from typing import Optional
+
+from django.conf import settings
+from django.http import QueryDict
 
 from drf_spectacular.utils import extend_schema
 from pydantic import ValidationError
@@ -9,6 +13,7 @@ from rest_framework.views import APIView
 from kernelCI_app.helpers.errorHandling import (
     create_api_error_response,
 )
+from kernelCI_app.typeModels.common import TimeWindow
 from kernelCI_app.typeModels.hardwareListing import (
     HardwareItem,
     HardwareQueryParams,
@@ -17,6 +22,35 @@ from kernelCI_app.typeModels.hardwareListing import (
 )
 from kernelCI_app.queries.hardware import get_hardware_listing_data
 from kernelCI_app.constants.localization import ClientStrings
+from kernelCI_app.utils import quantize_time_window
+
+
+def get_hardware_listing_params(query: QueryDict) -> HardwareQueryParams:
+    """Parses the query params, widening the time window to whole buckets."""
+    query_params = HardwareQueryParams(
+        start_date=query.get("startTimestampInSeconds"),
+        end_date=query.get("endTimestampInSeconds"),
+        origin=query.get("origin"),
+    )
+    start_timestamp, end_timestamp = quantize_time_window(
+        int(query_params.start_date.timestamp()),
+        int(query_params.end_date.timestamp()),
+        settings.HARDWARE_TIME_BUCKET_SECONDS,
+    )
+    return query_params.model_copy(
+        update={
+            "start_date": datetime.fromtimestamp(start_timestamp, timezone.utc),
+            "end_date": datetime.fromtimestamp(end_timestamp, timezone.utc),
+        }
+    )
+
+
+def get_hardware_listing_cache_params(query: QueryDict) -> Optional[dict]:
+    """Canonical query params for the response cache, None if they are invalid."""
+    try:
+        return get_hardware_listing_params(query).model_dump()
+    except ValidationError:
+        return None
 
 
 class HardwareView(APIView):
@@ -65,11 +99,7 @@ class HardwareView(APIView):
     )
     def get(self, request: Request):
         try:
-            query_params = HardwareQueryParams(
-                start_date=request.GET.get("startTimestampInSeconds"),
-                end_date=request.GET.get("endTimestampInSeconds"),
-                origin=request.GET.get("origin"),
-            )
+            query_params = get_hardware_listing_params(request.GET)
 
             start_date: datetime = query_params.start_date
             end_date: datetime = query_params.end_date
@@ -85,7 +115,13 @@ class HardwareView(APIView):
 
         try:
             sanitized_records = self._sanitize_records(hardwares_raw=hardwares_raw)
-            result = HardwareListingResponse(hardware=sanitized_records)
+            result = HardwareListingResponse(
+                hardware=sanitized_records,
+                time_window=TimeWindow(
+                    start_timestamp_in_seconds=int(start_date.timestamp()),
+                    end_timestamp_in_seconds=int(end_date.timestamp()),
+                ),
+            )
 
             if len(result.hardware) < 1:
                 return create_api_error_response(